@@ -1,2 +1,4 @@
 from .u2net import U2NET
 from .u2net import U2NETP
+from .u2net import U2NETInference
+from .u2net import U2NETPInference
@@ -523,3 +523,88 @@ class U2NETP(nn.Module):
         d0 = self.outconv(torch.cat((d1,d2,d3,d4,d5,d6),1))
 
         return F.sigmoid(d0), F.sigmoid(d1), F.sigmoid(d2), F.sigmoid(d3), F.sigmoid(d4), F.sigmoid(d5), F.sigmoid(d6)
+
+### U^2-Net inference-only ###
+def _fused_forward(net,x):
+    # Same graph as U2NET.forward/U2NETP.forward, but only the fused output d0
+    # is returned: sigmoid is skipped on the six side outputs and encoder/decoder
+    # features are released as soon as they are consumed to lower peak memory.
+
+    #stage 1
+    hx1 = net.stage1(x)
+    hx = net.pool12(hx1)
+
+    #stage 2
+    hx2 = net.stage2(hx)
+    hx = net.pool23(hx2)
+
+    #stage 3
+    hx3 = net.stage3(hx)
+    hx = net.pool34(hx3)
+
+    #stage 4
+    hx4 = net.stage4(hx)
+    hx = net.pool45(hx4)
+
+    #stage 5
+    hx5 = net.stage5(hx)
+    hx = net.pool56(hx5)
+
+    #stage 6
+    hx6 = net.stage6(hx)
+    del hx
+    d6 = net.side6(hx6)
+    hx6up = _upsample_like(hx6,hx5)
+    del hx6
+
+    #decoder
+    hx5d = net.stage5d(torch.cat((hx6up,hx5),1))
+    del hx6up, hx5
+    d5 = net.side5(hx5d)
+    hx5dup = _upsample_like(hx5d,hx4)
+    del hx5d
+
+    hx4d = net.stage4d(torch.cat((hx5dup,hx4),1))
+    del hx5dup, hx4
+    d4 = net.side4(hx4d)
+    hx4dup = _upsample_like(hx4d,hx3)
+    del hx4d
+
+    hx3d = net.stage3d(torch.cat((hx4dup,hx3),1))
+    del hx4dup, hx3
+    d3 = net.side3(hx3d)
+    hx3dup = _upsample_like(hx3d,hx2)
+    del hx3d
+
+    hx2d = net.stage2d(torch.cat((hx3dup,hx2),1))
+    del hx3dup, hx2
+    d2 = net.side2(hx2d)
+    hx2dup = _upsample_like(hx2d,hx1)
+    del hx2d
+
+    hx1d = net.stage1d(torch.cat((hx2dup,hx1),1))
+    del hx2dup, hx1
+    d1 = net.side1(hx1d)
+    del hx1d
+
+    #fused output (the side maps are still needed by outconv)
+    d0 = net.outconv(torch.cat((d1,
+                                _upsample_like(d2,d1),
+                                _upsample_like(d3,d1),
+                                _upsample_like(d4,d1),
+                                _upsample_like(d5,d1),
+                                _upsample_like(d6,d1)),1))
+
+    return torch.sigmoid(d0)
+
+class U2NETInference(U2NET):
+    # Loads the same state dict as U2NET; forward returns only sigmoid(d0)
+
+    def forward(self,x):
+        return _fused_forward(self,x)
+
+class U2NETPInference(U2NETP):
+    # Loads the same state dict as U2NETP; forward returns only sigmoid(d0)
+
+    def forward(self,x):
+        return _fused_forward(self,x)
@@ -0,0 +1,85 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+from torchvision import transforms
+
+from model import U2NET # full size version 173.6 MB
+from model import U2NETP # small version u2net 4.7 MB
+from model import U2NETInference
+from model import U2NETPInference
+
+# Checks that the inference-only networks return exactly the fused output (d0)
+# of the original networks, on sample images or on random inputs.
+
+def load_inputs(image_dir, num_random):
+
+    if image_dir:
+        transform = transforms.Compose([transforms.Resize((320, 320)),
+                                        transforms.ToTensor(),
+                                        transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                                                             std=[0.229, 0.224, 0.225])])
+        names = sorted(glob.glob(image_dir + os.sep + '*'))
+        return [transform(Image.open(name).convert('RGB')).unsqueeze(0) for name in names]
+
+    generator = torch.Generator().manual_seed(0)
+    return [torch.randn(1, 3, 320, 320, generator=generator) for _ in range(num_random)]
+
+def timed(net, x):
+
+    start = time.perf_counter()
+    with torch.no_grad():
+        out = net(x)
+    return out, time.perf_counter() - start
+
+def main():
+
+    parser = argparse.ArgumentParser(description='U2Net inference-only parity check')
+    parser.add_argument('--model_path', type=str, default=os.path.join(os.getcwd(), 'saved_models', 'u2net', 'u2net.pth'),
+                        help='Path to model file')
+    parser.add_argument('--model_name', type=str, default='u2net', choices=['u2net', 'u2netp'],
+                        help='Model name: u2net or u2netp')
+    parser.add_argument('--image_path', type=str, default=None,
+                        help='Directory with sample images (random inputs if omitted)')
+    parser.add_argument('--num_random', type=int, default=3,
+                        help='Number of random inputs when no image directory is given')
+    parser.add_argument('--atol', type=float, default=1e-5,
+                        help='Maximum absolute difference allowed')
+    args = parser.parse_args()
+
+    if args.model_name == 'u2net':
+        net, net_inference = U2NET(3,1), U2NETInference(3,1)
+    else:
+        net, net_inference = U2NETP(3,1), U2NETPInference(3,1)
+
+    state_dict = torch.load(args.model_path, map_location='cpu')
+    net.load_state_dict(state_dict)
+    net_inference.load_state_dict(state_dict)
+    net.eval()
+    net_inference.eval()
+
+    max_diff = 0.0
+    time_full = 0.0
+    time_inference = 0.0
+    for x in load_inputs(args.image_path, args.num_random):
+        outputs, elapsed_full = timed(net, x)
+        d0, elapsed_inference = timed(net_inference, x)
+        time_full += elapsed_full
+        time_inference += elapsed_inference
+        max_diff = max(max_diff, (outputs[0] - d0).abs().max().item())
+
+    print("max |d0 - d0_inference|: %.3e (atol %.1e)" % (max_diff, args.atol))
+    print("forward time: full %.3fs, inference-only %.3fs" % (time_full, time_inference))
+
+    if not np.isfinite(max_diff) or max_diff > args.atol:
+        print("parity check FAILED")
+        sys.exit(1)
+    print("parity check passed")
+
+if __name__ == "__main__":
+    main()
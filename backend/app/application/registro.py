@@ -0,0 +1,53 @@
+from typing import Any, Dict, List, Optional
+
+from app.domain.excecoes import ModeloIndisponivel
+
+
+class RegistroModelos:
+    """
+    Mantém em memória os segmentadores disponíveis, indexados pelo nível de
+    modelo (ex: "qualidade" -> U2NET, "rapido" -> U2NETP).
+    """
+
+    def __init__(self, segmentadores: Dict[str, Any], padrao: str):
+        """
+        Args:
+            segmentadores: Mapa nível -> segmentador já carregado
+            padrao: Nível usado quando a requisição não escolhe um modelo
+        """
+        if padrao not in segmentadores:
+            raise ValueError(
+                f"Modelo padrão '{padrao}' não está habilitado ({', '.join(segmentadores)})")
+
+        self.segmentadores = segmentadores
+        self.padrao = padrao
+
+    @property
+    def nomes(self) -> List[str]:
+        """Níveis de modelo habilitados."""
+        return list(self.segmentadores)
+
+    def obter(self, nome: Optional[str] = None) -> Any:
+        """
+        Retorna o segmentador do nível pedido (ou o padrão).
+
+        Raises:
+            ModeloIndisponivel: se o nível não estiver habilitado
+        """
+        nome = nome or self.padrao
+        if nome not in self.segmentadores:
+            raise ModeloIndisponivel(nome, self.nomes)
+        return self.segmentadores[nome]
+
+    def estatisticas(self) -> Dict:
+        """Estatísticas de cada modelo carregado."""
+        return {
+            "modelo_padrao": self.padrao,
+            "modelos": {
+                nome: segmentador.estatisticas()
+                for nome, segmentador in self.segmentadores.items()
+            }
+        }
+
+
+__all__ = ["RegistroModelos"]
@@ -1,28 +1,122 @@
-from typing import Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 from io import BytesIO
 
+from app.application.registro import RegistroModelos
+
 
 class RemocaoFundoService:
     """
     Serviço de aplicação responsável por orquestrar a remoção de fundo de imagens.
     Processa imagens em memória sem salvar arquivos localmente.
     """
-    def __init__(self, segmentador):
+    def __init__(self, registro: RegistroModelos):
         """
-        segmentador: instância de um serviço de segmentação (ex: U2NetService)
+        registro: registro com os segmentadores disponíveis (ex: U2NetService por nível de modelo)
         """
-        self.segmentador = segmentador
+        self.registro = registro
+
+    @property
+    def segmentador(self):
+        """Segmentador do modelo padrão."""
+        return self.registro.obter()
 
-    def remover_fundo(self, imagem_bytes: bytes, formato_saida: str = "PNG") -> Optional[BytesIO]:
+    def remover_fundo(
+        self,
+        imagem_bytes: bytes,
+        formato_saida: str = "PNG",
+        modelo: Optional[str] = None,
+        nivel: Optional[int] = None,
+        alta_resolucao: bool = False,
+        tamanho_entrada: Optional[int] = None
+    ) -> Optional[BytesIO]:
         """
         Orquestra a remoção de fundo da imagem processando em memória.
         
         Args:
             imagem_bytes: Bytes da imagem de entrada
-            formato_saida: Formato da imagem de saída (PNG, JPEG, etc.)
+            formato_saida: Formato da imagem de saída (png, webp, webp_sem_perda ou rgba)
+            modelo: Nível do modelo ("rapido" ou "qualidade"); None usa o padrão
+            nivel: Compressão/qualidade do formato; None usa o padrão configurado
+            alta_resolucao: Refina as bordas com blocos sobrepostos em resolução maior
+            tamanho_entrada: Lado da entrada do modelo (ex: 192 para prévias); None usa o padrão
         
         Returns:
             BytesIO contendo a imagem processada ou None se houver erro
+
+        Raises:
+            ModeloIndisponivel: se o modelo pedido não estiver habilitado
+            ImagemInvalida: se os pixels da imagem estiverem truncados ou corrompidos
+        """
+        segmentador = self.registro.obter(modelo)
+        resultado = segmentador.remover_fundo(
+            imagem_bytes, formato_saida, nivel, alta_resolucao, tamanho_entrada)
+        return resultado
+
+    def remover_fundo_lote(
+        self,
+        imagens: List[bytes],
+        formato_saida: str = "PNG",
+        modelo: Optional[str] = None,
+        nivel: Optional[int] = None
+    ) -> List[Optional[BytesIO]]:
+        """
+        Remove o fundo de várias imagens usando forwards em lote.
+
+        Args:
+            imagens: Bytes de cada imagem de entrada
+            formato_saida: Formato das imagens de saída
+            modelo: Nível do modelo ("rapido" ou "qualidade"); None usa o padrão
+            nivel: Compressão/qualidade do formato; None usa o padrão configurado
+
+        Returns:
+            Um BytesIO por imagem, na mesma ordem; None nas que falharem
+
+        Raises:
+            ModeloIndisponivel: se o modelo pedido não estiver habilitado
+        """
+        segmentador = self.registro.obter(modelo)
+        return segmentador.remover_fundo_lote(imagens, formato_saida, nivel)
+
+    def gerar_mascara(
+        self,
+        imagem_bytes: bytes,
+        tamanho: Optional[Tuple[int, int]] = None,
+        formato: str = "png",
+        modelo: Optional[str] = None,
+        tamanho_entrada: Optional[int] = None
+    ) -> Optional[BytesIO]:
         """
-        resultado = self.segmentador.remover_fundo(imagem_bytes, formato_saida)
-        return resultado
\ No newline at end of file
+        Gera apenas a máscara alfa da imagem, para composição no cliente.
+
+        Args:
+            imagem_bytes: Bytes da imagem de entrada
+            tamanho: (largura, altura) da máscara; None mantém a resolução do modelo
+            formato: "png" (escala de cinza) ou "bruto" (uint8 compactado)
+            modelo: Nível do modelo ("rapido" ou "qualidade"); None usa o padrão
+            tamanho_entrada: Lado da entrada do modelo; None usa o padrão
+
+        Returns:
+            BytesIO contendo a máscara ou None se houver erro
+
+        Raises:
+            ModeloIndisponivel: se o modelo pedido não estiver habilitado
+            ImagemInvalida: se os pixels da imagem estiverem truncados ou corrompidos
+        """
+        segmentador = self.registro.obter(modelo)
+        return segmentador.gerar_mascara(imagem_bytes, tamanho, formato, tamanho_entrada)
+
+    def aquecer(self, tamanhos: Sequence[int], lotes: Sequence[int], repeticoes: int = 1) -> float:
+        """
+        Aquece todos os modelos habilitados (ver `U2NetService.aquecer`).
+
+        Returns:
+            Duração total em segundos
+        """
+        return sum(
+            segmentador.aquecer(tamanhos, lotes, repeticoes)
+            for segmentador in self.registro.segmentadores.values()
+        )
+
+    def estatisticas(self) -> Dict:
+        """Estatísticas de execução de cada modelo (latência e histogramas de lote)."""
+        return self.registro.estatisticas()
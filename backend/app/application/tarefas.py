@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.domain.excecoes import FilaCheia, ImagemInvalida, TarefaNaoEncontrada
+from app.domain.tarefas import CONCLUIDA, PENDENTE, Tarefa
+
+
+logger = logging.getLogger(__name__)
+
+# Pausa de um worker após uma falha da fila, para não repetir o erro em laço
+ESPERA_APOS_ERRO_S = 1.0
+
+
+class ProcessadorTarefas:
+    """
+    Pool de workers assíncronos que consome a fila de tarefas e executa a
+    remoção de fundo de cada uma.
+
+    Os workers só reservam uma tarefa quando `tem_vaga()` indica que o
+    executor de inferência tem capacidade ociosa, então as requisições
+    síncronas (interativas) passam na frente das tarefas em segundo plano.
+    Entre as tarefas, a fila atende primeiro a maior prioridade.
+    """
+
+    def __init__(
+        self,
+        fila,
+        executar: Callable[..., Awaitable[Any]],
+        tem_vaga: Callable[[], bool],
+        workers: int = 1,
+        ttl_s: float = 3600.0,
+        max_pendentes: int = 1000,
+        prazo_s: float = 600.0,
+        intervalo_s: float = 0.5,
+    ):
+        """
+        Args:
+            fila: Implementação de `FilaTarefas` (memória ou SQLite)
+            executar: Corrotina `executar(metodo, *args, **kwargs)` do executor de inferência
+            tem_vaga: Indica se o executor de inferência tem capacidade livre
+            workers: Número de tarefas processadas ao mesmo tempo
+            ttl_s: Tempo que o resultado (ou o erro) fica disponível após a conclusão
+            max_pendentes: Limite de tarefas aguardando; acima dele `submeter` levanta FilaCheia
+            prazo_s: Tempo máximo de uma tarefa em "processando" sem renovar a
+                reserva (renovada a cada `prazo_s / 4` enquanto o worker
+                processa); depois dele, a tarefa é considerada interrompida e
+                volta para a fila
+            intervalo_s: Intervalo de consulta da fila quando não há tarefas
+        """
+        if workers < 1:
+            raise ValueError("workers deve ser pelo menos 1")
+
+        self.fila = fila
+        self.executar = executar
+        self.tem_vaga = tem_vaga
+        self.workers = workers
+        self.ttl_s = ttl_s
+        self.max_pendentes = max_pendentes
+        self.prazo_s = prazo_s
+        self.intervalo_s = intervalo_s
+
+        self._nova_tarefa: Optional[asyncio.Event] = None
+        self._tarefas_asyncio: List[asyncio.Task] = []
+
+    async def iniciar(self) -> None:
+        """
+        Devolve à fila as tarefas interrompidas há mais de `prazo_s` e inicia
+        os workers e a limpeza periódica (que também recupera as interrompidas
+        depois).
+        """
+        await self._recuperar_interrompidas()
+        self._nova_tarefa = asyncio.Event()
+        self._tarefas_asyncio = [
+            asyncio.ensure_future(self._worker()) for _ in range(self.workers)
+        ]
+        self._tarefas_asyncio.append(asyncio.ensure_future(self._limpar_expiradas()))
+
+    async def encerrar(self) -> None:
+        """
+        Cancela os workers; tarefas em andamento na fila SQLite ficam como
+        "processando" e voltam para a fila após `prazo_s`.
+        """
+        for tarefa in self._tarefas_asyncio:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas_asyncio, return_exceptions=True)
+        self._tarefas_asyncio = []
+
+    async def submeter(
+        self,
+        entrada: bytes,
+        formato_saida: str = "PNG",
+        modelo: Optional[str] = None,
+        prioridade: int = 1,
+    ) -> Tarefa:
+        """
+        Enfileira uma remoção de fundo.
+
+        Raises:
+            FilaCheia: se já houver `max_pendentes` tarefas aguardando
+        """
+        loop = asyncio.get_running_loop()
+        contagens = await loop.run_in_executor(None, self.fila.contagens)
+        if contagens[PENDENTE] >= self.max_pendentes:
+            raise FilaCheia(self.max_pendentes)
+
+        tarefa = Tarefa(
+            id=uuid.uuid4().hex,
+            prioridade=prioridade,
+            modelo=modelo,
+            formato_saida=formato_saida,
+            criada_em=time.time(),
+        )
+        await loop.run_in_executor(None, self.fila.enfileirar, tarefa, entrada)
+        if self._nova_tarefa is not None:
+            self._nova_tarefa.set()
+        return tarefa
+
+    async def obter(self, identificador: str) -> Tarefa:
+        """
+        Raises:
+            TarefaNaoEncontrada: se a tarefa não existir ou já tiver expirado
+        """
+        loop = asyncio.get_running_loop()
+        tarefa = await loop.run_in_executor(None, self.fila.obter, identificador)
+        if tarefa is None or (tarefa.expira_em is not None and tarefa.expira_em <= time.time()):
+            raise TarefaNaoEncontrada(identificador)
+        return tarefa
+
+    async def resultado(self, identificador: str) -> Optional[bytes]:
+        """
+        Bytes do resultado, ou None se a tarefa ainda não foi concluída com sucesso.
+
+        Raises:
+            TarefaNaoEncontrada: se a tarefa não existir ou já tiver expirado
+        """
+        tarefa = await self.obter(identificador)
+        if tarefa.status != CONCLUIDA:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.fila.resultado, identificador)
+
+    def estatisticas(self) -> Dict:
+        """Número de tarefas em cada estado e configuração do pool."""
+        return {
+            "workers": self.workers,
+            "ttl_s": self.ttl_s,
+            "tarefas": self.fila.contagens(),
+        }
+
+    async def _aguardar_nova_tarefa(self) -> None:
+        """Espera até uma submissão local ou até o intervalo de consulta (tarefas de outros workers)."""
+        try:
+            await asyncio.wait_for(self._nova_tarefa.wait(), timeout=self.intervalo_s)
+        except asyncio.TimeoutError:
+            pass
+        self._nova_tarefa.clear()
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.tem_vaga():
+                await asyncio.sleep(0.05)
+                continue
+
+            # Uma falha da fila (ex: SQLite "database is locked", disco cheio)
+            # não pode encerrar o worker: ninguém aguarda a task até `encerrar`
+            try:
+                reservada = await loop.run_in_executor(None, self.fila.reservar)
+                if reservada is None:
+                    await self._aguardar_nova_tarefa()
+                    continue
+
+                tarefa, entrada = reservada
+                await self._processar(tarefa, entrada)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Erro no worker de tarefas")
+                await asyncio.sleep(ESPERA_APOS_ERRO_S)
+
+    async def _renovar_reserva(self, identificador: str) -> None:
+        """Renova a reserva enquanto a tarefa processa, para ela não ser dada como interrompida."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.prazo_s / 4)
+            try:
+                await loop.run_in_executor(None, self.fila.renovar, identificador)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Tenta de novo no próximo intervalo, ainda dentro do prazo
+                logger.exception("Erro ao renovar a reserva da tarefa %s", identificador)
+
+    async def _processar(self, tarefa: Tarefa, entrada: bytes) -> None:
+        loop = asyncio.get_running_loop()
+        erro = None
+        resultado = None
+        renovacao = asyncio.ensure_future(self._renovar_reserva(tarefa.id))
+        try:
+            while True:
+                try:
+                    resultado = await self.executar(
+                        "remover_fundo", entrada, formato_saida=tarefa.formato_saida, modelo=tarefa.modelo)
+                    break
+                except FilaCheia:
+                    await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            raise
+        except ImagemInvalida as e:
+            erro = str(e)
+        except Exception as e:
+            logger.exception("Erro ao processar a tarefa %s", tarefa.id)
+            erro = str(e)
+        finally:
+            renovacao.cancel()
+
+        expira_em = time.time() + self.ttl_s
+        if resultado is not None:
+            await loop.run_in_executor(
+                None, self.fila.concluir, tarefa.id, resultado.getvalue(), expira_em)
+        else:
+            await loop.run_in_executor(
+                None, self.fila.falhar, tarefa.id, erro or "Falha ao processar a imagem", expira_em)
+
+    async def _recuperar_interrompidas(self) -> None:
+        loop = asyncio.get_running_loop()
+        agora = time.time()
+        devolvidas, falhas = await loop.run_in_executor(
+            None, self.fila.recuperar_interrompidas, agora - self.prazo_s, agora + self.ttl_s)
+        if devolvidas or falhas:
+            logger.warning(
+                "Tarefas interrompidas: %d devolvida(s) à fila, %d marcada(s) com erro", devolvidas, falhas)
+
+    async def _limpar_expiradas(self) -> None:
+        loop = asyncio.get_running_loop()
+        intervalo = max(1.0, min(60.0, self.ttl_s / 4, self.prazo_s / 4))
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                removidas = await loop.run_in_executor(None, self.fila.remover_expiradas, time.time())
+                if removidas:
+                    logger.info("%d tarefa(s) expirada(s) removida(s)", removidas)
+                await self._recuperar_interrompidas()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Tenta de novo no próximo intervalo
+                logger.exception("Erro na limpeza das tarefas expiradas")
+
+
+__all__ = ["ProcessadorTarefas"]
@@ -0,0 +1,127 @@
+"""
+Configuração da aplicação lida de variáveis de ambiente na inicialização.
+"""
+import os
+
+
+def _ler_str(nome: str, padrao: str) -> str:
+    """Lê uma variável de ambiente como texto."""
+    return os.environ.get(nome, padrao).strip()
+
+
+def _ler_float(nome: str, padrao: float) -> float:
+    """Lê uma variável de ambiente como número real."""
+    valor = os.environ.get(nome)
+    if valor is None or not valor.strip():
+        return padrao
+    return float(valor)
+
+
+def _ler_int(nome: str, padrao: int) -> int:
+    """Lê uma variável de ambiente como inteiro."""
+    valor = os.environ.get(nome)
+    if valor is None or not valor.strip():
+        return padrao
+    return int(valor)
+
+
+def _ler_lista_int(nome: str, padrao: str) -> list:
+    """Lê uma variável de ambiente como lista de inteiros separados por vírgula."""
+    return [int(valor) for valor in _ler_str(nome, padrao).split(",") if valor.strip()]
+
+
+# Execução do pipeline de inferência fora do event loop
+INFERENCIA_EXECUTOR = _ler_str("INFERENCIA_EXECUTOR", "thread")  # thread | process
+INFERENCIA_MAX_CONCORRENCIA = _ler_int("INFERENCIA_MAX_CONCORRENCIA", 4)
+INFERENCIA_MAX_FILA = _ler_int("INFERENCIA_MAX_FILA", 8)
+INFERENCIA_RETRY_AFTER = _ler_int("INFERENCIA_RETRY_AFTER", 2)
+
+# Micro-batching: agrupa requisições simultâneas em um único forward do modelo
+LOTE_MAX = _ler_int("LOTE_MAX", 4)
+LOTE_JANELA_MS = _ler_float("LOTE_JANELA_MS", 10.0)
+# Requisições que o agendador reúne de fato: no modo "process" cada processo
+# recebe uma por vez (agendador desligado, sem esperar a janela); no "thread",
+# no máximo as INFERENCIA_MAX_CONCORRENCIA em execução
+LOTE_AGENDADOR = 1 if INFERENCIA_EXECUTOR == "process" else max(1, min(LOTE_MAX, INFERENCIA_MAX_CONCORRENCIA))
+
+# Modelo e backend de execução (eager | torchscript | onnx | quantizado)
+U2NET_BACKEND = _ler_str("U2NET_BACKEND", "eager")
+U2NET_CAMINHO_MODELO = _ler_str("U2NET_CAMINHO_MODELO", "") or None
+U2NET_CAMINHO_ARTEFATO = _ler_str("U2NET_CAMINHO_ARTEFATO", "") or None
+U2NETP_CAMINHO_MODELO = _ler_str("U2NETP_CAMINHO_MODELO", "") or None
+U2NETP_CAMINHO_ARTEFATO = _ler_str("U2NETP_CAMINHO_ARTEFATO", "") or None
+
+# Níveis de modelo carregados em memória (qualidade = U2NET, rapido = U2NETP)
+MODELOS_HABILITADOS = [
+    nome.strip() for nome in _ler_str("MODELOS_HABILITADOS", "qualidade").split(",") if nome.strip()
+]
+MODELO_PADRAO = _ler_str("MODELO_PADRAO", "qualidade")
+
+# Filtro usado para ampliar a máscara: bilinear | bicubic | lanczos | nearest | tensor
+MASCARA_FILTRO = _ler_str("MASCARA_FILTRO", "bilinear")
+
+# Codificação da imagem de saída: compress_level do PNG (0-9) e qualidade do WebP (0-100)
+PNG_NIVEL_COMPRESSAO = _ler_int("PNG_NIVEL_COMPRESSAO", 1)
+WEBP_QUALIDADE = _ler_int("WEBP_QUALIDADE", 80)
+
+# Entrada do modelo: esticada para um quadrado ou em letterbox (mantém a proporção,
+# completada até múltiplo de 32) e lado padrão em pixels
+ENTRADA_MODO = _ler_str("ENTRADA_MODO", "esticar")  # esticar | letterbox
+ENTRADA_TAMANHO = _ler_int("ENTRADA_TAMANHO", 320)
+
+# Aquecimento antes de /health/ready responder "pronto": forwards de teste em
+# cada modelo, lado de entrada e tamanho de lote (0 repetições desativa)
+AQUECIMENTO_REPETICOES = _ler_int("AQUECIMENTO_REPETICOES", 1)
+AQUECIMENTO_TAMANHOS = _ler_lista_int("AQUECIMENTO_TAMANHOS", str(ENTRADA_TAMANHO))
+AQUECIMENTO_LOTES = _ler_lista_int("AQUECIMENTO_LOTES", f"1,{LOTE_MAX}")
+
+# Modo de alta resolução: blocos sobrepostos que refinam as bordas incertas da máscara
+ALTA_RES_BLOCO = _ler_int("ALTA_RES_BLOCO", 320)
+ALTA_RES_SOBREPOSICAO = _ler_int("ALTA_RES_SOBREPOSICAO", 64)
+ALTA_RES_MAX_BLOCOS = _ler_int("ALTA_RES_MAX_BLOCOS", 16)
+ALTA_RES_LADO = _ler_int("ALTA_RES_LADO", 1280)
+
+# Cache de resultados: LRU em memória e camada opcional em disco (limites em MB)
+CACHE_MAX_MB = _ler_int("CACHE_MAX_MB", 256)
+CACHE_DIRETORIO = _ler_str("CACHE_DIRETORIO", "") or None
+CACHE_MAX_MB_DISCO = _ler_int("CACHE_MAX_MB_DISCO", 1024)
+
+# Limites de upload: rejeitados com 413 antes de decodificar a imagem
+UPLOAD_MAX_MB = _ler_float("UPLOAD_MAX_MB", 25.0)
+UPLOAD_MAX_MEGAPIXELS = _ler_float("UPLOAD_MAX_MEGAPIXELS", 50.0)
+
+# Endpoint de lote: tamanho total da requisição e número máximo de imagens
+LOTE_UPLOAD_MAX_MB = _ler_float("LOTE_UPLOAD_MAX_MB", 500.0)
+LOTE_MAX_IMAGENS = _ler_int("LOTE_MAX_IMAGENS", 200)
+# Espera máxima de cada bloco do lote por uma vaga no executor de inferência
+LOTE_ESPERA_VAGA_S = _ler_float("LOTE_ESPERA_VAGA_S", 30.0)
+
+# Servidor: workers que compartilham o modelo carregado antes do fork
+SERVIDOR_WORKERS = _ler_int("SERVIDOR_WORKERS", 1)
+
+# Threads do PyTorch por processo (0 = núcleos divididos entre os forwards
+# simultâneos / padrão do PyTorch) e núcleos de cada worker ("", "auto" ou "0-3;4-7")
+TORCH_NUM_THREADS = _ler_int("TORCH_NUM_THREADS", 0)
+TORCH_INTEROP_THREADS = _ler_int("TORCH_INTEROP_THREADS", 0)
+CPU_AFINIDADE = _ler_str("CPU_AFINIDADE", "")
+
+# Tarefas assíncronas (/jobs): fila em memória ou SQLite, workers e validade dos resultados
+TAREFAS_FILA = _ler_str("TAREFAS_FILA", "memoria")  # memoria | sqlite
+TAREFAS_SQLITE_CAMINHO = _ler_str("TAREFAS_SQLITE_CAMINHO", "tarefas.db")
+TAREFAS_WORKERS = _ler_int("TAREFAS_WORKERS", 1)
+TAREFAS_TTL_S = _ler_float("TAREFAS_TTL_S", 3600.0)
+TAREFAS_MAX_PENDENTES = _ler_int("TAREFAS_MAX_PENDENTES", 1000)
+# Tarefas "processando" sem renovar a reserva há mais que isso foram interrompidas (reinício, queda) e voltam para a fila
+TAREFAS_PRAZO_S = _ler_float("TAREFAS_PRAZO_S", 600.0)
+
+# Logs em JSON: nível mínimo e fração das requisições bem-sucedidas registradas (erros sempre)
+LOG_NIVEL = _ler_str("LOG_NIVEL", "INFO")
+LOG_AMOSTRAGEM = _ler_float("LOG_AMOSTRAGEM", 1.0)
+
+# Perfis por requisição (torch.profiler + cProfile): pedidos pelo cabeçalho
+# X-Perfil com o token de administração ("" desativa o cabeçalho) ou sorteados
+# com a fração PERFIL_AMOSTRAGEM; guarda os PERFIL_MAX_ARQUIVOS mais recentes
+PERFIL_TOKEN = _ler_str("PERFIL_TOKEN", "")
+PERFIL_AMOSTRAGEM = _ler_float("PERFIL_AMOSTRAGEM", 0.0)
+PERFIL_DIRETORIO = _ler_str("PERFIL_DIRETORIO", "perfis")
+PERFIL_MAX_ARQUIVOS = _ler_int("PERFIL_MAX_ARQUIVOS", 50)
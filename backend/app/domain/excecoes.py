@@ -0,0 +1,41 @@
+class FilaCheia(Exception):
+    """Levantada quando a fila de inferência atingiu o limite configurado."""
+
+    def __init__(self, capacidade: int):
+        super().__init__(f"Fila de inferência cheia ({capacidade} requisições pendentes)")
+        self.capacidade = capacidade
+
+
+class ModeloIndisponivel(Exception):
+    """Levantada quando a requisição pede um nível de modelo que não está habilitado."""
+
+    def __init__(self, nome: str, disponiveis: list):
+        super().__init__(
+            f"Modelo '{nome}' não está disponível (habilitados: {', '.join(disponiveis)})")
+        self.nome = nome
+        self.disponiveis = disponiveis
+
+
+class ImagemMuitoGrande(Exception):
+    """Levantada quando o upload excede o limite de bytes ou de megapixels."""
+
+
+class ImagemInvalida(Exception):
+    """Levantada quando o upload não é uma imagem que o Pillow consegue abrir."""
+
+
+class TarefaNaoEncontrada(Exception):
+    """Levantada quando a tarefa não existe ou o seu resultado já expirou."""
+
+    def __init__(self, identificador: str):
+        super().__init__(f"Tarefa '{identificador}' não encontrada ou expirada")
+        self.identificador = identificador
+
+
+__all__ = [
+    "FilaCheia",
+    "ModeloIndisponivel",
+    "ImagemMuitoGrande",
+    "ImagemInvalida",
+    "TarefaNaoEncontrada",
+]
@@ -0,0 +1,42 @@
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+
+# Estados de uma tarefa assíncrona
+PENDENTE = "pendente"
+PROCESSANDO = "processando"
+CONCLUIDA = "concluida"
+ERRO = "erro"
+
+# Prioridades aceitas pela API; valores menores são atendidos primeiro
+PRIORIDADES = {"alta": 0, "normal": 1, "baixa": 2}
+
+
+@dataclass
+class Tarefa:
+    """Remoção de fundo submetida para processamento assíncrono."""
+
+    id: str
+    prioridade: int
+    modelo: Optional[str]
+    formato_saida: str
+    criada_em: float
+    status: str = PENDENTE
+    iniciada_em: Optional[float] = None
+    concluida_em: Optional[float] = None
+    expira_em: Optional[float] = None
+    erro: Optional[str] = None
+
+    def para_dict(self) -> Dict:
+        """Representação para a API, com datas em ISO 8601 (UTC)."""
+        dados = asdict(self)
+        for campo in ("criada_em", "iniciada_em", "concluida_em", "expira_em"):
+            if dados[campo] is not None:
+                dados[campo] = datetime.fromtimestamp(dados[campo], timezone.utc).isoformat()
+        nomes = {valor: nome for nome, valor in PRIORIDADES.items()}
+        dados["prioridade"] = nomes.get(self.prioridade, self.prioridade)
+        return dados
+
+
+__all__ = ["Tarefa", "PRIORIDADES", "PENDENTE", "PROCESSANDO", "CONCLUIDA", "ERRO"]
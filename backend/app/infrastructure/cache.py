@@ -0,0 +1,178 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+
+class CacheResultados:
+    """
+    Cache de resultados indexado pelo hash do conteúdo enviado.
+
+    A camada em memória é um LRU limitado pelo total de bytes armazenados. A
+    camada opcional em disco guarda um arquivo por resultado em `diretorio`,
+    também limitada por bytes, e promove para a memória os itens lidos dela.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        diretorio: Optional[Union[str, Path]] = None,
+        max_bytes_disco: int = 0,
+    ):
+        """
+        Args:
+            max_bytes: Limite da camada em memória (0 desativa a camada)
+            diretorio: Pasta da camada em disco (None desativa a camada)
+            max_bytes_disco: Limite da camada em disco (0 = sem limite)
+        """
+        self.max_bytes = max_bytes
+        self.max_bytes_disco = max_bytes_disco
+        self.diretorio = Path(diretorio) if diretorio else None
+
+        self._memoria: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes_memoria = 0
+        self._disco: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes_disco = 0
+        self._lock = threading.Lock()
+
+        self._contadores = {
+            "acertos_memoria": 0,
+            "acertos_disco": 0,
+            "faltas": 0,
+            "remocoes_memoria": 0,
+            "remocoes_disco": 0,
+        }
+
+        if self.diretorio is not None:
+            self.diretorio.mkdir(parents=True, exist_ok=True)
+            self._indexar_disco()
+
+    @property
+    def ativo(self) -> bool:
+        """Se alguma das camadas está habilitada."""
+        return self.max_bytes > 0 or self.diretorio is not None
+
+    @staticmethod
+    def gerar_chave(conteudo: bytes, **parametros) -> str:
+        """
+        Chave do resultado: SHA-256 do conteúdo mais os parâmetros de saída.
+
+        Args:
+            conteudo: Bytes da imagem enviada
+            **parametros: Opções que alteram o resultado (formato, modelo, ...)
+        """
+        digest = hashlib.sha256(conteudo)
+        for nome in sorted(parametros):
+            digest.update(f"\0{nome}={parametros[nome]}".encode())
+        return digest.hexdigest()
+
+    def obter(self, chave: str) -> Optional[bytes]:
+        """Retorna o resultado guardado para a chave, ou None em caso de falta."""
+        with self._lock:
+            dados = self._memoria.get(chave)
+            if dados is not None:
+                self._memoria.move_to_end(chave)
+                self._contadores["acertos_memoria"] += 1
+                return dados
+
+        dados = self._ler_disco(chave)
+
+        with self._lock:
+            if dados is None:
+                self._contadores["faltas"] += 1
+                return None
+            self._contadores["acertos_disco"] += 1
+            self._guardar_memoria(chave, dados)
+        return dados
+
+    def guardar(self, chave: str, dados: bytes) -> None:
+        """Guarda o resultado nas camadas habilitadas."""
+        with self._lock:
+            self._guardar_memoria(chave, dados)
+        self._escrever_disco(chave, dados)
+
+    def estatisticas(self) -> Dict:
+        """Contadores de acertos, faltas e remoções e ocupação de cada camada."""
+        with self._lock:
+            return {
+                **self._contadores,
+                "itens_memoria": len(self._memoria),
+                "bytes_memoria": self._bytes_memoria,
+                "max_bytes_memoria": self.max_bytes,
+                "itens_disco": len(self._disco),
+                "bytes_disco": self._bytes_disco,
+                "max_bytes_disco": self.max_bytes_disco,
+            }
+
+    def _guardar_memoria(self, chave: str, dados: bytes) -> None:
+        """Insere na camada em memória e remove os itens menos usados (com o lock)."""
+        if len(dados) > self.max_bytes:
+            return
+
+        anterior = self._memoria.pop(chave, None)
+        if anterior is not None:
+            self._bytes_memoria -= len(anterior)
+
+        self._memoria[chave] = dados
+        self._bytes_memoria += len(dados)
+
+        while self._bytes_memoria > self.max_bytes:
+            _, removido = self._memoria.popitem(last=False)
+            self._bytes_memoria -= len(removido)
+            self._contadores["remocoes_memoria"] += 1
+
+    def _caminho(self, chave: str) -> Path:
+        return self.diretorio / chave[:2] / chave
+
+    def _indexar_disco(self) -> None:
+        """Reconstrói o índice LRU da camada em disco pela data de modificação."""
+        arquivos = [p for p in self.diretorio.glob("*/*") if p.is_file() and not p.name.endswith(".tmp")]
+        for caminho in sorted(arquivos, key=lambda p: p.stat().st_mtime):
+            tamanho = caminho.stat().st_size
+            self._disco[caminho.name] = tamanho
+            self._bytes_disco += tamanho
+
+    def _ler_disco(self, chave: str) -> Optional[bytes]:
+        if self.diretorio is None:
+            return None
+        try:
+            dados = self._caminho(chave).read_bytes()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if chave in self._disco:
+                self._disco.move_to_end(chave)
+        return dados
+
+    def _escrever_disco(self, chave: str, dados: bytes) -> None:
+        if self.diretorio is None:
+            return
+        if self.max_bytes_disco and len(dados) > self.max_bytes_disco:
+            return
+
+        caminho = self._caminho(chave)
+        caminho.parent.mkdir(exist_ok=True)
+        temporario = caminho.with_name(f"{chave}.{threading.get_ident()}.tmp")
+        temporario.write_bytes(dados)
+        os.replace(temporario, caminho)
+
+        remover = []
+        with self._lock:
+            self._bytes_disco += len(dados) - self._disco.pop(chave, 0)
+            self._disco[chave] = len(dados)
+            while self.max_bytes_disco and self._bytes_disco > self.max_bytes_disco:
+                antiga, tamanho = self._disco.popitem(last=False)
+                self._bytes_disco -= tamanho
+                self._contadores["remocoes_disco"] += 1
+                remover.append(antiga)
+
+        for antiga in remover:
+            try:
+                self._caminho(antiga).unlink()
+            except FileNotFoundError:
+                pass
+
+
+__all__ = ["CacheResultados"]
@@ -0,0 +1,143 @@
+"""
+Threads do PyTorch e afinidade de CPU dos processos de inferência.
+
+O plano de afinidade (`CPU_AFINIDADE`) é uma lista de conjuntos de núcleos,
+um por worker, separados por ";" (ex: "0-3;4-7"). Com "auto", os núcleos
+disponíveis são divididos em blocos contíguos iguais entre os workers.
+"""
+import logging
+import os
+from typing import List, Optional, Set
+
+import torch
+
+
+logger = logging.getLogger(__name__)
+
+
+def nucleos_disponiveis() -> Set[int]:
+    """Núcleos em que o processo pode rodar (respeita cpuset de contêineres)."""
+    if hasattr(os, "sched_getaffinity"):
+        return set(os.sched_getaffinity(0))
+    return set(range(os.cpu_count() or 1))
+
+
+def interpretar_nucleos(especificacao: str) -> Set[int]:
+    """Converte "0-3,6" em {0, 1, 2, 3, 6}."""
+    nucleos = set()
+    for parte in especificacao.split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        if "-" in parte:
+            inicio, fim = parte.split("-", 1)
+            nucleos.update(range(int(inicio), int(fim) + 1))
+        else:
+            nucleos.add(int(parte))
+    if not nucleos:
+        raise ValueError(f"Conjunto de núcleos vazio: '{especificacao}'")
+    return nucleos
+
+
+def plano_afinidade(especificacao: str, workers: int) -> List[Optional[Set[int]]]:
+    """
+    Núcleos de cada worker segundo `especificacao`.
+
+    Args:
+        especificacao: "" (sem afinidade), "auto" ou conjuntos separados por ";"
+        workers: Número de workers
+
+    Returns:
+        Lista com um conjunto por worker (None = sem afinidade)
+
+    Raises:
+        ValueError: se o plano explícito não tiver um conjunto por worker
+    """
+    especificacao = especificacao.strip()
+    if not especificacao:
+        return [None] * workers
+
+    if especificacao == "auto":
+        nucleos = sorted(nucleos_disponiveis())
+        bloco = max(1, len(nucleos) // workers)
+        return [
+            set(nucleos[(i * bloco) % len(nucleos):(i * bloco) % len(nucleos) + bloco])
+            for i in range(workers)
+        ]
+
+    conjuntos = [interpretar_nucleos(parte) for parte in especificacao.split(";") if parte.strip()]
+    if len(conjuntos) != workers:
+        raise ValueError(
+            f"CPU_AFINIDADE tem {len(conjuntos)} conjunto(s) de núcleos para {workers} worker(s)")
+    return conjuntos
+
+
+def threads_intra_op(
+    processos: int,
+    forwards_por_processo: int = 1,
+    configurado: int = 0,
+    nucleos: Optional[Set[int]] = None,
+) -> int:
+    """
+    Threads intra-op de cada processo.
+
+    Sem valor configurado, divide os núcleos entre todos os forwards que podem
+    rodar ao mesmo tempo, para que requisições simultâneas não disputem núcleos.
+
+    Args:
+        processos: Processos que dividem os núcleos (1 se `nucleos` já é exclusivo do processo)
+        forwards_por_processo: Forwards simultâneos em cada processo
+        configurado: Valor explícito (> 0 tem precedência)
+        nucleos: Núcleos do processo (padrão: todos os disponíveis)
+    """
+    if configurado > 0:
+        return configurado
+    total = len(nucleos) if nucleos else len(nucleos_disponiveis())
+    return max(1, total // max(1, processos * forwards_por_processo))
+
+
+def configurar_threads(intra_op: int, inter_op: int = 0) -> None:
+    """
+    Aplica o número de threads do PyTorch no processo atual.
+
+    `set_num_interop_threads` só pode ser chamado antes de qualquer trabalho
+    paralelo entre operadores; depois disso o valor atual é mantido.
+    """
+    if intra_op > 0:
+        torch.set_num_threads(intra_op)
+    if inter_op > 0 and torch.get_num_interop_threads() != inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError as e:
+            logger.warning("Não foi possível ajustar as threads inter-op: %s", e)
+
+
+def fixar_afinidade(nucleos: Optional[Set[int]]) -> None:
+    """Restringe o processo atual aos núcleos informados (Linux)."""
+    if not nucleos:
+        return
+    if not hasattr(os, "sched_setaffinity"):
+        logger.warning("Afinidade de CPU não suportada nesta plataforma")
+        return
+    os.sched_setaffinity(0, nucleos)
+
+
+def forwards_simultaneos(max_concorrencia: int, max_lote: int, modelos: int) -> int:
+    """
+    Forwards que um processo executa ao mesmo tempo.
+
+    Com o agendador de lotes, cada modelo tem uma única thread chamando o
+    modelo; sem ele, cada requisição em execução faz o seu forward.
+    """
+    return min(modelos, max_concorrencia) if max_lote > 1 else max_concorrencia
+
+
+__all__ = [
+    "nucleos_disponiveis",
+    "interpretar_nucleos",
+    "plano_afinidade",
+    "threads_intra_op",
+    "configurar_threads",
+    "fixar_afinidade",
+    "forwards_simultaneos",
+]
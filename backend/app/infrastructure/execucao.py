@@ -0,0 +1,268 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.domain.excecoes import FilaCheia
+
+
+logger = logging.getLogger(__name__)
+
+# Serviço usado pelos processos do pool (um por processo filho)
+_servico_processo = None
+
+
+def _inicializar_processo(
+    fabrica_servico: Callable[[], Any],
+    preparar_processo: Optional[Callable[[], None]] = None,
+    aquecimento: Optional[Callable[[Any], None]] = None,
+) -> None:
+    """Carrega (e aquece) o serviço uma única vez em cada processo do pool."""
+    global _servico_processo
+    if preparar_processo is not None:
+        preparar_processo()
+    servico = fabrica_servico()
+    if aquecimento is not None:
+        aquecimento(servico)
+    _servico_processo = servico
+
+
+def _chamar_no_processo(metodo: str, args: tuple, kwargs: dict) -> Any:
+    """Executa um método do serviço carregado no processo filho."""
+    return getattr(_servico_processo, metodo)(*args, **kwargs)
+
+
+def _servico_carregado() -> bool:
+    """Tarefa vazia: só retorna depois que o inicializador do processo terminou."""
+    return _servico_processo is not None
+
+
+# Estados da carga do modelo (ver `ExecutorInferencia.estado`)
+AQUECENDO = "aquecendo"
+PRONTO = "pronto"
+ERRO = "erro"
+
+
+class ExecutorInferencia:
+    """
+    Executa o pipeline de remoção de fundo (decodificação, inferência e
+    codificação) fora do event loop, em um pool de threads ou de processos.
+
+    O número de execuções simultâneas é limitado por `max_concorrencia` e o
+    número de requisições aguardando por `max_fila`. Quando os dois limites
+    estão ocupados, novas chamadas levantam `FilaCheia` imediatamente.
+
+    O modelo não é carregado na construção: `carregar` (bloqueante) ou
+    `aguardar_carregamento` (no event loop) criam o serviço e o aquecem, para
+    que o servidor abra a porta e responda às verificações de saúde antes de
+    ler os pesos. Chamadas a `executar` durante a carga aguardam o seu fim.
+    """
+
+    def __init__(
+        self,
+        fabrica_servico: Callable[[], Any],
+        max_concorrencia: int = 2,
+        max_fila: int = 8,
+        tipo: str = "thread",
+        preparar_processo: Optional[Callable[[], None]] = None,
+        aquecimento: Optional[Callable[[Any], None]] = None,
+    ):
+        """
+        Args:
+            fabrica_servico: Função de módulo que cria o serviço (ex: RemocaoFundoService)
+            max_concorrencia: Número máximo de pipelines executando ao mesmo tempo
+            max_fila: Número máximo de requisições aguardando um worker livre
+            tipo: "thread" (modelo compartilhado) ou "process" (um modelo por processo)
+            preparar_processo: Função executada em cada processo do pool antes de
+                criar o serviço (ex: ajuste de threads do PyTorch); ignorada no modo "thread"
+            aquecimento: Função de módulo que recebe o serviço e executa forwards de
+                teste; roda em cada thread (ou processo) do pool antes de o executor
+                ficar pronto, para que nenhuma requisição pague a primeira execução
+        """
+        if max_concorrencia < 1:
+            raise ValueError("max_concorrencia deve ser pelo menos 1")
+        if max_fila < 0:
+            raise ValueError("max_fila não pode ser negativo")
+
+        self.tipo = tipo
+        self.max_concorrencia = max_concorrencia
+        self.max_fila = max_fila
+        self._pendentes = 0
+        self._lock = threading.Lock()
+        self._servico: Optional[Any] = None
+
+        self._fabrica_servico = fabrica_servico
+        self._aquecimento = aquecimento
+        self._lock_carga = threading.Lock()
+        self._carregamento: Optional[asyncio.Future] = None
+        self._pronto = False
+        self.erro_carregamento: Optional[str] = None
+        self.tempo_carregamento_s: Optional[float] = None
+        self.tempo_aquecimento_s: Optional[float] = None
+
+        if tipo == "thread":
+            self._executor: Executor = ThreadPoolExecutor(
+                max_workers=max_concorrencia, thread_name_prefix="inferencia")
+        elif tipo == "process":
+            # spawn evita herdar o estado de threads do PyTorch via fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=max_concorrencia,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_inicializar_processo,
+                initargs=(fabrica_servico, preparar_processo, aquecimento),
+            )
+        else:
+            raise ValueError(f"Tipo de executor inválido: {tipo} (use 'thread' ou 'process')")
+
+    @property
+    def estado(self) -> str:
+        """"aquecendo" até o modelo ser carregado e aquecido, depois "pronto" (ou "erro" se a carga falhar)."""
+        if self._pronto:
+            return PRONTO
+        return ERRO if self.erro_carregamento is not None else AQUECENDO
+
+    @property
+    def pronto(self) -> bool:
+        """Indica se o modelo já foi carregado e aquecido."""
+        return self._pronto
+
+    def carregar(self, aquecer: bool = True) -> None:
+        """
+        Carrega e aquece o modelo, bloqueando até o fim; chamadas repetidas não recarregam.
+
+        No modo "thread" cria o serviço compartilhado e aquece cada thread do
+        pool; no modo "process" inicia os processos do pool e aguarda cada um
+        carregar e aquecer o seu.
+
+        Args:
+            aquecer: Com False, apenas carrega os pesos e o executor continua
+                "aquecendo" (ex: no processo pai, antes do fork dos workers,
+                que aquecem as próprias threads ao iniciar)
+        """
+        with self._lock_carga:
+            if self._pronto:
+                return
+
+            inicio = time.perf_counter()
+            try:
+                if self.tipo == "thread":
+                    if self._servico is None:
+                        self._servico = self._fabrica_servico()
+                        self.tempo_carregamento_s = time.perf_counter() - inicio
+                        logger.info("Modelos carregados em %.1fs", self.tempo_carregamento_s)
+                    if not aquecer:
+                        return
+                    self._aquecer_threads()
+                else:
+                    # Tarefas simultâneas obrigam o pool a criar todos os processos
+                    futuros = [self._executor.submit(_servico_carregado) for _ in range(self.max_concorrencia)]
+                    for futuro in futuros:
+                        futuro.result()
+            except Exception as e:
+                self.erro_carregamento = str(e)
+                logger.exception("Falha ao carregar os modelos")
+                raise
+
+            if self.tipo == "process":
+                self.tempo_carregamento_s = time.perf_counter() - inicio
+                logger.info("Modelos carregados e aquecidos em %.1fs", self.tempo_carregamento_s)
+            self._pronto = True
+
+    def _aquecer_threads(self) -> None:
+        """Executa o aquecimento ao mesmo tempo em cada thread do pool."""
+        if self._aquecimento is None:
+            return
+        inicio = time.perf_counter()
+        # Tarefas simultâneas (e longas) obrigam o pool a criar todas as threads
+        futuros = [
+            self._executor.submit(self._aquecimento, self._servico)
+            for _ in range(self.max_concorrencia)
+        ]
+        for futuro in futuros:
+            futuro.result()
+        self.tempo_aquecimento_s = time.perf_counter() - inicio
+        logger.info("Aquecimento concluído em %.1fs", self.tempo_aquecimento_s)
+
+    async def aguardar_carregamento(self) -> None:
+        """
+        Carrega o modelo em uma thread, sem bloquear o event loop.
+
+        Chamadas simultâneas aguardam a mesma carga; se ela falhou, a exceção
+        é levantada de novo.
+        """
+        if self._pronto:
+            return
+        if self._carregamento is None:
+            loop = asyncio.get_running_loop()
+            self._carregamento = loop.run_in_executor(None, self.carregar)
+        await asyncio.shield(self._carregamento)
+
+    @property
+    def servico(self) -> Optional[Any]:
+        """Serviço compartilhado pelas threads (None no modo "process" ou antes da carga)."""
+        return self._servico
+
+    @property
+    def capacidade(self) -> int:
+        """Total de requisições aceitas (em execução + na fila)."""
+        return self.max_concorrencia + self.max_fila
+
+    @property
+    def pendentes(self) -> int:
+        """Requisições aceitas que ainda não terminaram."""
+        return self._pendentes
+
+    @property
+    def em_execucao(self) -> int:
+        """Requisições ocupando o pool (o pool atende por ordem de chegada)."""
+        return min(self._pendentes, self.max_concorrencia)
+
+    @property
+    def na_fila(self) -> int:
+        """Requisições aceitas aguardando uma vaga no pool."""
+        return max(0, self._pendentes - self.max_concorrencia)
+
+    async def executar(self, metodo: str, *args, **kwargs) -> Any:
+        """
+        Executa `metodo` do serviço no pool sem bloquear o event loop.
+
+        Args:
+            metodo: Nome do método do serviço (ex: "remover_fundo")
+            *args, **kwargs: Argumentos repassados ao método
+
+        Returns:
+            O retorno do método do serviço
+
+        Raises:
+            FilaCheia: se a capacidade do executor estiver esgotada
+        """
+        with self._lock:
+            if self._pendentes >= self.capacidade:
+                raise FilaCheia(self.capacidade)
+            self._pendentes += 1
+
+        try:
+            await self.aguardar_carregamento()
+            loop = asyncio.get_running_loop()
+            if self.tipo == "thread":
+                # run_in_executor não leva o contexto: a linha de log da requisição vai junto
+                chamada = functools.partial(
+                    contextvars.copy_context().run, getattr(self._servico, metodo), *args, **kwargs)
+            else:
+                chamada = functools.partial(_chamar_no_processo, metodo, args, kwargs)
+            return await loop.run_in_executor(self._executor, chamada)
+        finally:
+            with self._lock:
+                self._pendentes -= 1
+
+    def encerrar(self) -> None:
+        """Encerra o pool aguardando as execuções em andamento."""
+        self._executor.shutdown(wait=True)
+
+
+__all__ = ["AQUECENDO", "PRONTO", "ERRO", "ExecutorInferencia"]
@@ -0,0 +1,343 @@
+"""
+Filas de tarefas assíncronas de remoção de fundo.
+
+Duas implementações, sem broker externo:
+
+- `FilaMemoria`: heap de prioridades no próprio processo; as tarefas se
+  perdem ao reiniciar e não são vistas por outros workers;
+- `FilaSQLite`: um arquivo SQLite (modo WAL) compartilhado por todos os
+  workers do servidor, que sobrevive a reinícios. A imagem de entrada fica no
+  banco até a tarefa terminar: uma tarefa interrompida (reinício, deploy ou
+  queda do processo) volta para a fila depois do prazo de processamento.
+"""
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.domain.tarefas import CONCLUIDA, ERRO, PENDENTE, PROCESSANDO, Tarefa
+
+
+# Reservas de uma mesma tarefa antes de ela ser dada como falha (ex: uma
+# imagem que derruba o processo não volta para a fila indefinidamente)
+MAX_TENTATIVAS = 3
+
+
+class FilaTarefas(ABC):
+    """
+    Interface das filas de tarefas.
+
+    A fila guarda a imagem de entrada até a tarefa ser concluída (ou falhar)
+    e o resultado até `expira_em`.
+    """
+
+    @abstractmethod
+    def enfileirar(self, tarefa: Tarefa, entrada: bytes) -> None:
+        """Guarda a tarefa pendente e a imagem de entrada."""
+
+    @abstractmethod
+    def reservar(self) -> Optional[Tuple[Tarefa, bytes]]:
+        """Marca a próxima tarefa pendente (maior prioridade, mais antiga) como em processamento."""
+
+    @abstractmethod
+    def concluir(self, identificador: str, resultado: bytes, expira_em: float) -> None:
+        """Marca a tarefa como concluída e guarda o resultado até `expira_em`."""
+
+    @abstractmethod
+    def falhar(self, identificador: str, erro: str, expira_em: float) -> None:
+        """Marca a tarefa com erro, mantido até `expira_em`."""
+
+    @abstractmethod
+    def renovar(self, identificador: str) -> None:
+        """Renova a reserva da tarefa em processamento (o worker continua ativo)."""
+
+    @abstractmethod
+    def obter(self, identificador: str) -> Optional[Tarefa]:
+        """Tarefa com o identificador, ou None se não existir."""
+
+    @abstractmethod
+    def resultado(self, identificador: str) -> Optional[bytes]:
+        """Bytes do resultado, ou None se a tarefa não foi concluída com sucesso."""
+
+    @abstractmethod
+    def remover_expiradas(self, agora: float) -> int:
+        """Remove tarefas finalizadas cujo prazo passou; retorna quantas foram removidas."""
+
+    @abstractmethod
+    def contagens(self) -> Dict[str, int]:
+        """Número de tarefas em cada estado."""
+
+    @abstractmethod
+    def recuperar_interrompidas(self, renovadas_antes: float, expira_em: float) -> Tuple[int, int]:
+        """
+        Devolve à fila as tarefas "processando" cuja reserva não foi renovada
+        desde `renovadas_antes` (o worker que as reservou parou); as que já
+        foram reservadas `MAX_TENTATIVAS` vezes passam a "erro" com `expira_em`.
+
+        Returns:
+            (tarefas devolvidas à fila, tarefas marcadas com erro)
+        """
+
+
+class FilaMemoria(FilaTarefas):
+    """Fila de prioridades em memória, restrita ao processo atual."""
+
+    def __init__(self):
+        self._heap: List[Tuple[int, int, str]] = []
+        self._sequencia = itertools.count()
+        self._tarefas: Dict[str, Tarefa] = {}
+        self._entradas: Dict[str, bytes] = {}
+        self._resultados: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def enfileirar(self, tarefa: Tarefa, entrada: bytes) -> None:
+        with self._lock:
+            self._tarefas[tarefa.id] = tarefa
+            self._entradas[tarefa.id] = entrada
+            heapq.heappush(self._heap, (tarefa.prioridade, next(self._sequencia), tarefa.id))
+
+    def reservar(self) -> Optional[Tuple[Tarefa, bytes]]:
+        with self._lock:
+            while self._heap:
+                _, _, identificador = heapq.heappop(self._heap)
+                tarefa = self._tarefas.get(identificador)
+                if tarefa is None or tarefa.status != PENDENTE:
+                    continue
+                tarefa.status = PROCESSANDO
+                tarefa.iniciada_em = time.time()
+                return tarefa, self._entradas[identificador]
+        return None
+
+    def concluir(self, identificador: str, resultado: bytes, expira_em: float) -> None:
+        with self._lock:
+            tarefa = self._tarefas[identificador]
+            tarefa.status = CONCLUIDA
+            tarefa.concluida_em = time.time()
+            tarefa.expira_em = expira_em
+            self._resultados[identificador] = resultado
+            self._entradas.pop(identificador, None)
+
+    def falhar(self, identificador: str, erro: str, expira_em: float) -> None:
+        with self._lock:
+            tarefa = self._tarefas[identificador]
+            tarefa.status = ERRO
+            tarefa.concluida_em = time.time()
+            tarefa.expira_em = expira_em
+            tarefa.erro = erro
+            self._entradas.pop(identificador, None)
+
+    def renovar(self, identificador: str) -> None:
+        # Sem recuperação de reservas (ver `recuperar_interrompidas`): nada a renovar
+        pass
+
+    def obter(self, identificador: str) -> Optional[Tarefa]:
+        with self._lock:
+            return self._tarefas.get(identificador)
+
+    def resultado(self, identificador: str) -> Optional[bytes]:
+        with self._lock:
+            return self._resultados.get(identificador)
+
+    def remover_expiradas(self, agora: float) -> int:
+        with self._lock:
+            expiradas = [
+                identificador for identificador, tarefa in self._tarefas.items()
+                if tarefa.expira_em is not None and tarefa.expira_em <= agora
+            ]
+            for identificador in expiradas:
+                del self._tarefas[identificador]
+                self._resultados.pop(identificador, None)
+            return len(expiradas)
+
+    def contagens(self) -> Dict[str, int]:
+        with self._lock:
+            contagens = {PENDENTE: 0, PROCESSANDO: 0, CONCLUIDA: 0, ERRO: 0}
+            for tarefa in self._tarefas.values():
+                contagens[tarefa.status] += 1
+            return contagens
+
+    def recuperar_interrompidas(self, renovadas_antes: float, expira_em: float) -> Tuple[int, int]:
+        # Os workers e a fila morrem juntos com o processo: não há reserva órfã
+        return 0, 0
+
+
+class FilaSQLite(FilaTarefas):
+    """
+    Fila persistida em SQLite, compartilhável entre processos.
+
+    A reserva roda em uma transação `BEGIN IMMEDIATE`, então dois workers
+    nunca pegam a mesma tarefa. A entrada só é apagada ao concluir ou falhar;
+    `renovada_em` é atualizada pelo worker enquanto processa e `tentativas`
+    conta as reservas, ambas usadas por `recuperar_interrompidas`.
+    """
+
+    _COLUNAS = "id, prioridade, modelo, formato_saida, criada_em, status, iniciada_em, concluida_em, expira_em, erro"
+
+    def __init__(self, caminho: Union[str, Path]):
+        self.caminho = str(caminho)
+        self._local = threading.local()
+
+        conexao = self._conexao()
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tarefas (
+                id TEXT PRIMARY KEY,
+                prioridade INTEGER NOT NULL,
+                modelo TEXT,
+                formato_saida TEXT NOT NULL,
+                criada_em REAL NOT NULL,
+                status TEXT NOT NULL,
+                iniciada_em REAL,
+                concluida_em REAL,
+                expira_em REAL,
+                erro TEXT,
+                entrada BLOB,
+                resultado BLOB,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                renovada_em REAL
+            )
+            """
+        )
+        # Bancos criados antes da contagem de tentativas e da renovação das reservas
+        colunas = {linha[1] for linha in conexao.execute("PRAGMA table_info(tarefas)")}
+        if "tentativas" not in colunas:
+            conexao.execute("ALTER TABLE tarefas ADD COLUMN tentativas INTEGER NOT NULL DEFAULT 0")
+        if "renovada_em" not in colunas:
+            conexao.execute("ALTER TABLE tarefas ADD COLUMN renovada_em REAL")
+        conexao.execute(
+            "CREATE INDEX IF NOT EXISTS tarefas_pendentes ON tarefas (status, prioridade, criada_em)")
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Conexão da thread atual (em modo autocommit)."""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            self._local.conexao = conexao
+        return conexao
+
+    @staticmethod
+    def _tarefa(linha: tuple) -> Tarefa:
+        return Tarefa(*linha)
+
+    def enfileirar(self, tarefa: Tarefa, entrada: bytes) -> None:
+        self._conexao().execute(
+            f"INSERT INTO tarefas ({self._COLUNAS}, entrada) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (tarefa.id, tarefa.prioridade, tarefa.modelo, tarefa.formato_saida, tarefa.criada_em,
+             tarefa.status, tarefa.iniciada_em, tarefa.concluida_em, tarefa.expira_em, tarefa.erro,
+             sqlite3.Binary(entrada)),
+        )
+
+    def reservar(self) -> Optional[Tuple[Tarefa, bytes]]:
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            linha = conexao.execute(
+                f"SELECT {self._COLUNAS}, entrada FROM tarefas WHERE status = ? "
+                "ORDER BY prioridade, criada_em LIMIT 1",
+                (PENDENTE,),
+            ).fetchone()
+            if linha is None:
+                conexao.execute("COMMIT")
+                return None
+
+            tarefa, entrada = self._tarefa(linha[:-1]), bytes(linha[-1])
+            tarefa.status = PROCESSANDO
+            tarefa.iniciada_em = time.time()
+            conexao.execute(
+                "UPDATE tarefas SET status = ?, iniciada_em = ?, renovada_em = ?, tentativas = tentativas + 1 "
+                "WHERE id = ?",
+                (tarefa.status, tarefa.iniciada_em, tarefa.iniciada_em, tarefa.id),
+            )
+            conexao.execute("COMMIT")
+            return tarefa, entrada
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+    def concluir(self, identificador: str, resultado: bytes, expira_em: float) -> None:
+        self._conexao().execute(
+            "UPDATE tarefas SET status = ?, concluida_em = ?, expira_em = ?, resultado = ?, entrada = NULL "
+            "WHERE id = ?",
+            (CONCLUIDA, time.time(), expira_em, sqlite3.Binary(resultado), identificador),
+        )
+
+    def falhar(self, identificador: str, erro: str, expira_em: float) -> None:
+        self._conexao().execute(
+            "UPDATE tarefas SET status = ?, concluida_em = ?, expira_em = ?, erro = ?, entrada = NULL WHERE id = ?",
+            (ERRO, time.time(), expira_em, erro, identificador),
+        )
+
+    def renovar(self, identificador: str) -> None:
+        self._conexao().execute(
+            "UPDATE tarefas SET renovada_em = ? WHERE id = ? AND status = ?",
+            (time.time(), identificador, PROCESSANDO),
+        )
+
+    def obter(self, identificador: str) -> Optional[Tarefa]:
+        linha = self._conexao().execute(
+            f"SELECT {self._COLUNAS} FROM tarefas WHERE id = ?", (identificador,)).fetchone()
+        return self._tarefa(linha) if linha else None
+
+    def resultado(self, identificador: str) -> Optional[bytes]:
+        linha = self._conexao().execute(
+            "SELECT resultado FROM tarefas WHERE id = ?", (identificador,)).fetchone()
+        return bytes(linha[0]) if linha and linha[0] is not None else None
+
+    def remover_expiradas(self, agora: float) -> int:
+        cursor = self._conexao().execute(
+            "DELETE FROM tarefas WHERE expira_em IS NOT NULL AND expira_em <= ?", (agora,))
+        return cursor.rowcount
+
+    def contagens(self) -> Dict[str, int]:
+        contagens = {PENDENTE: 0, PROCESSANDO: 0, CONCLUIDA: 0, ERRO: 0}
+        for status, total in self._conexao().execute(
+                "SELECT status, COUNT(*) FROM tarefas GROUP BY status"):
+            contagens[status] = total
+        return contagens
+
+    def recuperar_interrompidas(self, renovadas_antes: float, expira_em: float) -> Tuple[int, int]:
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            # Sem renovada_em ou sem entrada: reservadas por uma versão anterior
+            abandonada = "status = ? AND COALESCE(renovada_em, iniciada_em) < ?"
+            falhas = conexao.execute(
+                "UPDATE tarefas SET status = ?, concluida_em = ?, expira_em = ?, erro = ?, entrada = NULL "
+                f"WHERE {abandonada} AND (tentativas >= ? OR entrada IS NULL)",
+                (ERRO, time.time(), expira_em, "Processamento interrompido (parada do worker)",
+                 PROCESSANDO, renovadas_antes, MAX_TENTATIVAS),
+            ).rowcount
+            devolvidas = conexao.execute(
+                f"UPDATE tarefas SET status = ?, iniciada_em = NULL, renovada_em = NULL WHERE {abandonada}",
+                (PENDENTE, PROCESSANDO, renovadas_antes),
+            ).rowcount
+            conexao.execute("COMMIT")
+            return devolvidas, falhas
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+
+def criar_fila(tipo: str, caminho_sqlite: Optional[str] = None) -> FilaTarefas:
+    """
+    Cria a fila configurada.
+
+    Args:
+        tipo: "memoria" ou "sqlite"
+        caminho_sqlite: Arquivo do banco (obrigatório para "sqlite")
+    """
+    if tipo == "memoria":
+        return FilaMemoria()
+    if tipo == "sqlite":
+        if not caminho_sqlite:
+            raise ValueError("A fila 'sqlite' exige o caminho do banco")
+        return FilaSQLite(caminho_sqlite)
+    raise ValueError(f"Tipo de fila inválido: {tipo} (use 'memoria' ou 'sqlite')")
+
+
+__all__ = ["FilaTarefas", "FilaMemoria", "FilaSQLite", "criar_fila"]
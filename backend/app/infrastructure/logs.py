@@ -0,0 +1,221 @@
+"""
+Logs estruturados em JSON, uma linha por evento, escritos fora das threads
+que atendem as requisições.
+
+Os módulos usam `logging.getLogger(__name__)`; `configurar_logs` instala no
+logger do pacote `app` um `QueueHandler`, que só formata o registro e o põe em
+uma fila limitada, e uma thread (`QueueListener`) escreve as linhas no stdout.
+Com a fila cheia (stdout bloqueado), as linhas são descartadas e contadas em
+vez de atrasar a requisição.
+
+O `RegistroRequisicao` da requisição atual fica em uma `ContextVar`: o
+serviço registra nele dimensões e tempos das etapas, sem saber de HTTP, e o
+middleware escreve tudo em uma única linha ao final da requisição.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+
+# Logger raiz da aplicação; os loggers dos módulos (`app.*`) herdam o handler
+LOGGER_APLICACAO = "app"
+
+# Linhas aguardando a escrita; acima disso, são descartadas
+MAX_FILA_LOGS = 10000
+
+
+class RegistroRequisicao:
+    """
+    Campos da linha de log de uma requisição.
+
+    Cada requisição tem o seu; o event loop e a thread do pool que executa o
+    pipeline o preenchem uma de cada vez (a chamada ao pool é aguardada).
+    """
+
+    __slots__ = ("id", "campos", "etapas_ms")
+
+    def __init__(self, identificador: str):
+        self.id = identificador
+        self.campos: Dict[str, Any] = {}
+        self.etapas_ms: Dict[str, float] = {}
+
+
+_requisicao_atual: ContextVar[Optional[RegistroRequisicao]] = ContextVar("requisicao_atual", default=None)
+
+
+def iniciar_requisicao(identificador: str) -> Token:
+    """Associa um novo registro ao contexto atual; devolve o token para `encerrar_requisicao`."""
+    return _requisicao_atual.set(RegistroRequisicao(identificador))
+
+
+def encerrar_requisicao(token: Token) -> None:
+    _requisicao_atual.reset(token)
+
+
+def requisicao_atual() -> Optional[RegistroRequisicao]:
+    """Registro da requisição em andamento, ou None fora de uma requisição (ex: tarefas, aquecimento)."""
+    return _requisicao_atual.get()
+
+
+def registrar(**campos: Any) -> None:
+    """Adiciona campos à linha de log da requisição atual (sem efeito fora de uma requisição)."""
+    registro = _requisicao_atual.get()
+    if registro is not None:
+        registro.campos.update(campos)
+
+
+def registrar_etapa(etapa: str, duracao_ms: float) -> None:
+    """Soma a duração da etapa na requisição atual (no lote, uma etapa se repete por imagem)."""
+    registro = _requisicao_atual.get()
+    if registro is not None:
+        registro.etapas_ms[etapa] = registro.etapas_ms.get(etapa, 0.0) + duracao_ms
+
+
+class FiltroRequisicao(logging.Filter):
+    """Anexa o id da requisição atual a todo registro de log emitido durante ela."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        registro = _requisicao_atual.get()
+        if registro is not None and not hasattr(record, "requisicao"):
+            record.requisicao = registro.id
+        return True
+
+
+class FormatadorJson(logging.Formatter):
+    """
+    Uma linha JSON por registro: data, nível, logger, mensagem, id da
+    requisição, os campos passados em `extra={"campos": {...}}` e o traceback.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        requisicao = getattr(record, "requisicao", None)
+        if requisicao is not None:
+            dados["requisicao"] = requisicao
+        campos = getattr(record, "campos", None)
+        if campos:
+            dados.update(campos)
+        if record.exc_info:
+            dados["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class ManipuladorFila(QueueHandler):
+    """`QueueHandler` que descarta a linha quando a fila está cheia, sem bloquear."""
+
+    def __init__(self, fila: "queue.Queue"):
+        super().__init__(fila)
+        self.descartadas = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartadas += 1
+
+
+_lock = threading.Lock()
+_manipulador: Optional[ManipuladorFila] = None
+_ouvinte: Optional[QueueListener] = None
+_saida: Optional[logging.Handler] = None
+_amostragem = 1.0
+
+
+def _iniciar_ouvinte() -> None:
+    """Cria a fila e a thread que escreve as linhas (também no filho após um fork)."""
+    global _ouvinte
+    fila: "queue.Queue" = queue.Queue(MAX_FILA_LOGS)
+    _manipulador.queue = fila
+    _ouvinte = QueueListener(fila, _saida, respect_handler_level=False)
+    _ouvinte.start()
+
+
+def configurar_logs(nivel: str = "INFO", amostragem: float = 1.0) -> None:
+    """
+    Instala os logs em JSON no logger `app`; chamadas repetidas só atualizam nível e amostragem.
+
+    Args:
+        nivel: Nível mínimo (DEBUG, INFO, WARNING, ERROR)
+        amostragem: Fração das requisições bem-sucedidas com linha de log (0 a 1);
+            erros são sempre registrados
+
+    Raises:
+        ValueError: se o nível ou a amostragem forem inválidos
+    """
+    global _manipulador, _saida, _amostragem
+    nivel_numerico = logging.getLevelName(nivel.upper())
+    if not isinstance(nivel_numerico, int):
+        raise ValueError(f"LOG_NIVEL inválido: {nivel} (use DEBUG, INFO, WARNING ou ERROR)")
+    if not 0.0 <= amostragem <= 1.0:
+        raise ValueError("LOG_AMOSTRAGEM deve estar entre 0 e 1")
+
+    logger = logging.getLogger(LOGGER_APLICACAO)
+    logger.setLevel(nivel_numerico)
+    _amostragem = amostragem
+
+    with _lock:
+        if _manipulador is not None:
+            return
+
+        # A linha já sai formatada da fila: o ouvinte só escreve
+        _saida = logging.StreamHandler(sys.stdout)
+        _saida.setFormatter(logging.Formatter("%(message)s"))
+        _manipulador = ManipuladorFila(queue.Queue(MAX_FILA_LOGS))
+        _manipulador.setFormatter(FormatadorJson())
+        _manipulador.addFilter(FiltroRequisicao())
+        _iniciar_ouvinte()
+
+        logger.addHandler(_manipulador)
+        logger.propagate = False
+        atexit.register(encerrar_logs)
+
+        # Um fork (workers pré-carregados) não copia a thread do ouvinte
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_iniciar_ouvinte)
+
+
+def encerrar_logs() -> None:
+    """Escreve as linhas pendentes e para a thread do ouvinte."""
+    global _ouvinte
+    with _lock:
+        ouvinte, _ouvinte = _ouvinte, None
+    if ouvinte is not None:
+        ouvinte.stop()
+
+
+def amostrar() -> bool:
+    """Sorteia se uma requisição bem-sucedida terá a sua linha de log."""
+    return _amostragem >= 1.0 or random.random() < _amostragem
+
+
+def linhas_descartadas() -> int:
+    """Linhas perdidas por fila cheia desde o início do processo."""
+    return _manipulador.descartadas if _manipulador is not None else 0
+
+
+__all__ = [
+    "RegistroRequisicao",
+    "iniciar_requisicao",
+    "encerrar_requisicao",
+    "requisicao_atual",
+    "registrar",
+    "registrar_etapa",
+    "configurar_logs",
+    "encerrar_logs",
+    "amostrar",
+    "linhas_descartadas",
+]
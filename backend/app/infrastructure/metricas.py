@@ -0,0 +1,186 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+
+# Rótulos de uma série, em ordem fixa para servir de chave
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+class Histograma:
+    """
+    Histograma com limites fixos, seguro para uso entre threads.
+
+    Cada observação é contada no primeiro bucket cujo limite superior é
+    maior ou igual ao valor; valores acima do último limite vão para "+Inf".
+    """
+
+    def __init__(self, limites: Sequence[float]):
+        self.limites = sorted(limites)
+        self._contagens = [0] * (len(self.limites) + 1)
+        self._soma = 0.0
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float) -> None:
+        """Registra uma observação."""
+        indice = bisect_left(self.limites, valor)
+        with self._lock:
+            self._contagens[indice] += 1
+            self._soma += valor
+            self._total += 1
+
+    def zerar(self) -> None:
+        """Descarta as observações acumuladas (ex: as do aquecimento)."""
+        with self._lock:
+            self._contagens = [0] * (len(self.limites) + 1)
+            self._soma = 0.0
+            self._total = 0
+
+    def resumo(self) -> Dict:
+        """
+        Retorna as contagens acumuladas por bucket, no formato do Prometheus.
+
+        Returns:
+            Dicionário com "buckets" (limite -> contagem acumulada), "contagem" e "soma"
+        """
+        with self._lock:
+            contagens = list(self._contagens)
+            soma = self._soma
+            total = self._total
+
+        buckets = {}
+        acumulado = 0
+        for limite, contagem in zip(self.limites, contagens):
+            acumulado += contagem
+            buckets[f"{limite:g}"] = acumulado
+        buckets["+Inf"] = total
+
+        return {
+            "buckets": buckets,
+            "contagem": total,
+            "soma": round(soma, 6),
+            "media": round(soma / total, 6) if total else 0.0
+        }
+
+
+def _rotulos(rotulos: Dict[str, str]) -> Rotulos:
+    return tuple(sorted((nome, str(valor)) for nome, valor in rotulos.items()))
+
+
+class Contador:
+    """Contador crescente com uma série por combinação de rótulos, seguro entre threads."""
+
+    def __init__(self):
+        self._valores: Dict[Rotulos, float] = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, valor: float = 1, **rotulos: str) -> None:
+        """Soma `valor` à série dos rótulos informados."""
+        chave = _rotulos(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def amostras(self) -> List[Tuple[Dict[str, str], float]]:
+        """(rótulos, valor) de cada série."""
+        with self._lock:
+            return [(dict(chave), valor) for chave, valor in self._valores.items()]
+
+
+class FamiliaHistogramas:
+    """Um `Histograma` por combinação de rótulos, criado na primeira observação."""
+
+    def __init__(self, limites: Sequence[float]):
+        self.limites = sorted(limites)
+        self._histogramas: Dict[Rotulos, Histograma] = {}
+        self._lock = threading.Lock()
+
+    def rotulado(self, **rotulos: str) -> Histograma:
+        """Histograma da série dos rótulos informados."""
+        chave = _rotulos(rotulos)
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma(self.limites)
+            return histograma
+
+    def amostras(self) -> List[Tuple[Dict[str, str], Dict]]:
+        """(rótulos, resumo) de cada série."""
+        with self._lock:
+            itens = list(self._histogramas.items())
+        return [(dict(chave), histograma.resumo()) for chave, histograma in itens]
+
+
+def _formatar_rotulos(rotulos: Dict[str, str]) -> str:
+    if not rotulos:
+        return ""
+    pares = []
+    for nome, valor in rotulos.items():
+        valor = str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pares.append(f'{nome}="{valor}"')
+    return "{" + ",".join(pares) + "}"
+
+
+def _formatar_valor(valor: float) -> str:
+    valor = float(valor)
+    if valor == float("inf"):
+        return "+Inf"
+    if valor.is_integer() and abs(valor) < 1e15:
+        return str(int(valor))
+    return f"{valor:.12g}"
+
+
+class ExpositorPrometheus:
+    """
+    Monta o texto do formato de exposição do Prometheus (`text/plain; version=0.0.4`).
+
+    Cada família é escrita uma vez, com `# HELP` e `# TYPE`, seguida das suas
+    séries. Os histogramas vêm do `resumo()` de `Histograma`; `escala` converte
+    a unidade interna (ex: 0.001 de milissegundos para segundos).
+    """
+
+    TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, prefixo: str = ""):
+        self.prefixo = prefixo
+        self._linhas: List[str] = []
+
+    def _cabecalho(self, nome: str, ajuda: str, tipo: str) -> str:
+        nome = self.prefixo + nome
+        self._linhas.append(f"# HELP {nome} {ajuda}")
+        self._linhas.append(f"# TYPE {nome} {tipo}")
+        return nome
+
+    def contador(self, nome: str, ajuda: str, amostras: Iterable[Tuple[Dict[str, str], float]]) -> None:
+        """Família do tipo counter; o nome deve terminar em `_total`."""
+        nome = self._cabecalho(nome, ajuda, "counter")
+        for rotulos, valor in amostras:
+            self._linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {_formatar_valor(valor)}")
+
+    def medidor(self, nome: str, ajuda: str, amostras: Iterable[Tuple[Dict[str, str], float]]) -> None:
+        """Família do tipo gauge (valor atual, pode subir e descer)."""
+        nome = self._cabecalho(nome, ajuda, "gauge")
+        for rotulos, valor in amostras:
+            self._linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {_formatar_valor(valor)}")
+
+    def histograma(
+        self,
+        nome: str,
+        ajuda: str,
+        amostras: Iterable[Tuple[Dict[str, str], Dict]],
+        escala: float = 1.0
+    ) -> None:
+        """Família do tipo histogram, com `_bucket`, `_sum` e `_count` por série."""
+        nome = self._cabecalho(nome, ajuda, "histogram")
+        for rotulos, resumo in amostras:
+            for limite, contagem in resumo["buckets"].items():
+                le = limite if limite == "+Inf" else f"{float(limite) * escala:g}"
+                self._linhas.append(f"{nome}_bucket{_formatar_rotulos({**rotulos, 'le': le})} {contagem}")
+            self._linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {_formatar_valor(resumo['soma'] * escala)}")
+            self._linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {resumo['contagem']}")
+
+    def texto(self) -> str:
+        return "\n".join(self._linhas) + "\n"
+
+
+__all__ = ["Histograma", "Contador", "FamiliaHistogramas", "ExpositorPrometheus"]
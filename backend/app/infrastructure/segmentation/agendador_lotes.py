@@ -0,0 +1,172 @@
+import os
+import queue
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from app.infrastructure.metricas import Histograma
+
+
+class AgendadorLotes:
+    """
+    Agrupa pedidos de inferência que chegam em uma janela curta de tempo e
+    os executa em uma única chamada ao modelo (micro-batching dinâmico).
+
+    Cada chamador recebe um `Future` com o seu próprio resultado. Um lote é
+    disparado quando atinge `max_lote` itens ou quando a janela, contada a
+    partir do primeiro item, expira. Com `chave`, um lote só reúne itens de
+    mesma chave; os demais esperam pelo próximo lote, na ordem de chegada.
+    """
+
+    def __init__(
+        self,
+        processar_lote: Callable[[List[Any]], List[Any]],
+        max_lote: int = 4,
+        janela_ms: float = 10.0,
+        chave: Optional[Callable[[Any], Hashable]] = None,
+    ):
+        """
+        Args:
+            processar_lote: Função que recebe uma lista de itens e retorna uma
+                lista de resultados na mesma ordem
+            max_lote: Número máximo de itens por chamada ao modelo
+            janela_ms: Tempo máximo de espera por novos itens após o primeiro
+            chave: Agrupamento dos itens (ex: o formato da entrada); None
+                permite qualquer combinação
+        """
+        if max_lote < 1:
+            raise ValueError("max_lote deve ser pelo menos 1")
+
+        self.processar_lote = processar_lote
+        self.max_lote = max_lote
+        self.janela = janela_ms / 1000.0
+        self.chave = chave
+
+        self.hist_tamanho_lote = Histograma([1, 2, 4, 8, 16, 32, 64])
+        self.hist_espera_ms = Histograma([1, 2, 5, 10, 20, 50, 100, 250, 500, 1000])
+
+        self._iniciar_thread()
+
+        # Um fork (workers pré-carregados) não copia threads: o filho precisa da sua
+        if hasattr(os, "register_at_fork"):
+            referencia = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: _reiniciar_apos_fork(referencia))
+
+    def _iniciar_thread(self) -> None:
+        """Cria a fila e a thread que monta e executa os lotes."""
+        self._fila: "queue.Queue" = queue.Queue()
+        # Itens retirados da fila durante a coleta de um lote de outra chave
+        self._adiados: deque = deque()
+        self._ativo = True
+        self._thread = threading.Thread(
+            target=self._executar, name="agendador-lotes", daemon=True)
+        self._thread.start()
+
+    def submeter(self, item: Any) -> Future:
+        """
+        Enfileira um item para o próximo lote.
+
+        Returns:
+            Future que recebe o resultado do item (ou a exceção do lote)
+        """
+        if not self._ativo:
+            raise RuntimeError("Agendador de lotes encerrado")
+        futuro: Future = Future()
+        self._fila.put((item, futuro, time.perf_counter()))
+        return futuro
+
+    def executar(self, item: Any) -> Any:
+        """Submete um item e aguarda o resultado."""
+        return self.submeter(item).result()
+
+    def estatisticas(self) -> Dict:
+        """Itens aguardando, histogramas de tamanho de lote e tempo de espera na janela."""
+        return {
+            "max_lote": self.max_lote,
+            "fila": self._fila.qsize() + len(self._adiados),
+            "janela_ms": self.janela * 1000.0,
+            "tamanho_lote": self.hist_tamanho_lote.resumo(),
+            "espera_ms": self.hist_espera_ms.resumo(),
+        }
+
+    def encerrar(self) -> None:
+        """Para a thread do agendador após processar os itens pendentes."""
+        self._ativo = False
+        self._fila.put(None)
+        self._thread.join()
+
+    def _coletar_lote(self, primeiro) -> List:
+        """
+        Junta itens de mesma chave ao lote até atingir o tamanho máximo ou a
+        janela expirar, começando pelos adiados.
+        """
+        lote = [primeiro]
+        chave = self.chave(primeiro[0]) if self.chave is not None else None
+        if self._adiados:
+            restantes: deque = deque()
+            for pedido in self._adiados:
+                if len(lote) < self.max_lote and self.chave(pedido[0]) == chave:
+                    lote.append(pedido)
+                else:
+                    restantes.append(pedido)
+            self._adiados = restantes
+
+        prazo = primeiro[2] + self.janela
+        while len(lote) < self.max_lote:
+            restante = prazo - time.perf_counter()
+            try:
+                pedido = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if pedido is None:
+                # Reenfileira o sinal de parada para o laço principal
+                self._fila.put(None)
+                break
+            if self.chave is not None and self.chave(pedido[0]) != chave:
+                self._adiados.append(pedido)
+                continue
+            lote.append(pedido)
+
+        return lote
+
+    def _executar(self) -> None:
+        """Laço da thread: coleta lotes e distribui os resultados."""
+        while True:
+            # Os adiados são mais antigos que qualquer item da fila (e que o sinal de parada)
+            primeiro = self._adiados.popleft() if self._adiados else self._fila.get()
+            if primeiro is None:
+                break
+
+            lote = self._coletar_lote(primeiro)
+            inicio = time.perf_counter()
+            self.hist_tamanho_lote.observar(len(lote))
+            for _, _, enfileirado_em in lote:
+                self.hist_espera_ms.observar((inicio - enfileirado_em) * 1000.0)
+
+            # Ignora pedidos cujo chamador já desistiu
+            lote = [pedido for pedido in lote if pedido[1].set_running_or_notify_cancel()]
+            if not lote:
+                continue
+
+            try:
+                resultados = self.processar_lote([item for item, _, _ in lote])
+            except Exception as e:
+                for _, futuro, _ in lote:
+                    futuro.set_exception(e)
+                continue
+
+            for (_, futuro, _), resultado in zip(lote, resultados):
+                futuro.set_result(resultado)
+
+
+def _reiniciar_apos_fork(referencia: "weakref.ref") -> None:
+    """Recria a thread do agendador no processo filho, se ele ainda existir."""
+    agendador = referencia()
+    if agendador is not None and agendador._ativo:
+        agendador._iniciar_thread()
+
+
+__all__ = ["AgendadorLotes"]
@@ -0,0 +1,156 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import torch
+
+from app.infrastructure.segmentation.modelo import caminho_pesos, carregar_rede
+
+
+# Nomes das entradas/saídas do grafo exportado para ONNX
+ENTRADA_ONNX = "entrada"
+SAIDA_ONNX = "mascara"
+
+# Extensão do artefato gerado por cada backend a partir de `<variante>.pth`
+EXTENSOES_ARTEFATO = {
+    "torchscript": ".torchscript.pt",
+    "onnx": ".onnx",
+    "quantizado": ".int8.torchscript.pt",
+}
+
+
+class BackendInferencia(ABC):
+    """
+    Interface dos backends de execução do U²-Net.
+
+    Um backend recebe um lote normalizado [N, 3, H, W] (float32) e retorna as
+    probabilidades da saída fundida d0 com shape [N, 1, H, W], no mesmo device.
+    """
+
+    nome = "base"
+
+    @abstractmethod
+    def __call__(self, lote: torch.Tensor) -> torch.Tensor:
+        """Executa o forward do lote."""
+
+
+class BackendEager(BackendInferencia):
+    """Execução eager em PyTorch (comportamento original do serviço)."""
+
+    nome = "eager"
+
+    def __init__(self, variante: str, caminho_modelo: Optional[Path], device: torch.device):
+        self.net = carregar_rede(variante, caminho_modelo, device)
+
+    def __call__(self, lote: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            return self.net(lote)
+
+
+class BackendTorchScript(BackendInferencia):
+    """Execução de um grafo TorchScript traçado e congelado (ver `exportar`)."""
+
+    nome = "torchscript"
+
+    def __init__(self, caminho_artefato: Path, device: torch.device):
+        net = torch.jit.load(str(caminho_artefato), map_location=device)
+        net.eval()
+        self.net = torch.jit.optimize_for_inference(net)
+
+    def __call__(self, lote: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            return self.net(lote)
+
+
+class BackendOnnx(BackendInferencia):
+    """Execução no ONNX Runtime (CPU) com todas as otimizações de grafo."""
+
+    nome = "onnx"
+
+    def __init__(self, caminho_artefato: Path, num_threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "O backend 'onnx' requer o pacote onnxruntime (pip install onnxruntime)") from e
+
+        opcoes = ort.SessionOptions()
+        opcoes.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            opcoes.intra_op_num_threads = num_threads
+
+        self.sessao = ort.InferenceSession(
+            str(caminho_artefato), sess_options=opcoes, providers=["CPUExecutionProvider"])
+
+    def __call__(self, lote: torch.Tensor) -> torch.Tensor:
+        entrada = np.ascontiguousarray(lote.detach().cpu().numpy(), dtype=np.float32)
+        saida, = self.sessao.run([SAIDA_ONNX], {ENTRADA_ONNX: entrada})
+        return torch.from_numpy(saida)
+
+
+def caminho_artefato(
+    backend: str,
+    variante: str = "u2net",
+    caminho_modelo: Optional[Union[str, Path]] = None,
+) -> Path:
+    """
+    Caminho padrão do artefato exportado: ao lado do `.pth`, com a extensão do backend.
+
+    Ex: saved_models/u2net/u2net.pth -> saved_models/u2net/u2net.onnx
+    """
+    pesos = caminho_pesos(variante, caminho_modelo, verificar=False)
+    return pesos.with_name(pesos.stem + EXTENSOES_ARTEFATO[backend])
+
+
+def criar_backend(
+    nome: str = "eager",
+    variante: str = "u2net",
+    caminho_modelo: Optional[Union[str, Path]] = None,
+    artefato: Optional[Union[str, Path]] = None,
+    device: Optional[torch.device] = None,
+) -> BackendInferencia:
+    """
+    Cria o backend de inferência escolhido pela configuração.
+
+    Args:
+        nome: "eager", "torchscript", "onnx" ou "quantizado" (TorchScript int8)
+        variante: Variante do modelo ("u2net" ou "u2netp")
+        caminho_modelo: Checkpoint `.pth` (padrão: saved_models/<variante>/<variante>.pth)
+        artefato: Artefato exportado; padrão derivado do checkpoint
+        device: Device do PyTorch (os backends onnx e quantizado rodam sempre em CPU)
+
+    Raises:
+        FileNotFoundError: se o checkpoint ou o artefato não existirem
+    """
+    device = device or torch.device("cpu")
+
+    if nome == "eager":
+        return BackendEager(variante, caminho_modelo, device)
+
+    if nome not in EXTENSOES_ARTEFATO:
+        raise ValueError(f"Backend desconhecido: {nome} (use eager, torchscript, onnx ou quantizado)")
+
+    artefato = Path(artefato) if artefato else caminho_artefato(nome, variante, caminho_modelo)
+    if not artefato.exists():
+        raise FileNotFoundError(
+            f"Artefato {nome} não encontrado: {artefato} "
+            f"(gere com: python -m app.infrastructure.segmentation.exportar --formato {nome})")
+
+    if nome == "torchscript":
+        return BackendTorchScript(artefato, device)
+    if nome == "quantizado":
+        # Kernels int8 existem apenas em CPU
+        return BackendTorchScript(artefato, torch.device("cpu"))
+    # Mesmo número de threads intra-op configurado para o PyTorch
+    return BackendOnnx(artefato, num_threads=torch.get_num_threads())
+
+
+__all__ = [
+    "BackendInferencia",
+    "BackendEager",
+    "BackendTorchScript",
+    "BackendOnnx",
+    "caminho_artefato",
+    "criar_backend",
+]
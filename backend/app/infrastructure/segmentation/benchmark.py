@@ -0,0 +1,420 @@
+"""
+Micro-benchmarks das etapas do pipeline de remoção de fundo.
+
+As medições de memória rodam em um processo separado para que o pico
+(ru_maxrss) de uma variante não contamine a outra.
+
+Uso (a partir de backend/):
+    python -m app.infrastructure.segmentation.benchmark composicao --largura 6000 --altura 4000
+    python -m app.infrastructure.segmentation.benchmark preprocessamento --lote 4
+    python -m app.infrastructure.segmentation.benchmark threads --variante u2netp --lotes 1,2,4
+    python -m app.infrastructure.segmentation.benchmark codificacao --largura 3000 --altura 2000
+    python -m app.infrastructure.segmentation.benchmark entrada --variante u2netp --imagens fotos/
+"""
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+from PIL import Image, ImageFilter
+from torchvision import transforms
+
+from app.infrastructure.cpu import nucleos_disponiveis
+from app.infrastructure.segmentation.backends import criar_backend
+from app.infrastructure.segmentation.codificacao import CodificadorSaida
+from app.infrastructure.segmentation.composicao import aplicar_mascara, redimensionar_mascara
+from app.infrastructure.segmentation.modelo import DESVIO_IMAGENET, MEDIA_IMAGENET, TAMANHO_ENTRADA
+from app.infrastructure.segmentation.preprocessamento import PreProcessador, dimensoes_entrada
+
+
+def _pico_rss_mb() -> float:
+    """Pico de memória residente do processo atual, em MB (Linux: ru_maxrss em KB)."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024.0 if sys.platform != "darwin" else pico / (1024.0 * 1024.0)
+
+
+def _medir_em_processo(funcao: Callable, args: Tuple) -> Dict[str, float]:
+    """Executa `funcao(*args)` em um processo novo e retorna tempo e memória extra."""
+    contexto = multiprocessing.get_context("spawn")
+    with contexto.Pool(1) as pool:
+        return pool.apply(funcao, args)
+
+
+# ---------------------------------------------------------------------------
+# Composição: ampliação da máscara + canal alfa
+# ---------------------------------------------------------------------------
+
+def _composicao_original(imagem: Image.Image, mascara: np.ndarray) -> Image.Image:
+    """Caminho anterior: LANCZOS + cópia RGBA para NumPy + nova imagem PIL."""
+    mascara_img = Image.fromarray((mascara * 255).astype(np.uint8)).convert('L')
+    mascara_img = mascara_img.resize(imagem.size, Image.LANCZOS)
+
+    imagem_rgba = imagem.convert('RGBA')
+    img_array = np.array(imagem_rgba)
+    img_array[:, :, 3] = np.array(mascara_img)
+    return Image.fromarray(img_array, 'RGBA')
+
+
+def _composicao_rapida(imagem: Image.Image, mascara: np.ndarray, filtro: str) -> Image.Image:
+    """Caminho atual: filtro configurável + putalpha no próprio objeto."""
+    return aplicar_mascara(imagem, redimensionar_mascara(mascara, imagem.size, filtro))
+
+
+def _executar_composicao(variante: str, largura: int, altura: int, filtro: str) -> Dict[str, float]:
+    imagem = Image.new("RGB", (largura, altura), (120, 80, 40))
+    mascara = np.random.default_rng(0).random((320, 320), dtype=np.float32)
+    base = _pico_rss_mb()
+
+    inicio = time.perf_counter()
+    if variante == "original":
+        resultado = _composicao_original(imagem, mascara)
+    else:
+        resultado = _composicao_rapida(imagem, mascara, filtro)
+    tempo = time.perf_counter() - inicio
+
+    assert resultado.mode == "RGBA"
+    return {"tempo_ms": tempo * 1000.0, "memoria_extra_mb": _pico_rss_mb() - base}
+
+
+def benchmark_composicao(largura: int, altura: int, filtro: str) -> None:
+    """Compara tempo e pico de memória da composição original e da atual."""
+    megapixels = largura * altura / 1e6
+    entrada_mb = largura * altura * 3 / (1024.0 * 1024.0)
+    print(f"🖼️  Imagem {largura}x{altura} ({megapixels:.1f} MP, RGB de entrada {entrada_mb:.0f} MB)")
+    print(f"{'variante':<28}{'tempo (ms)':>12}{'memória extra (MB)':>22}")
+
+    for variante, rotulo in [("original", "antes (LANCZOS + NumPy)"), ("rapida", f"depois ({filtro} + putalpha)")]:
+        resultado = _medir_em_processo(_executar_composicao, (variante, largura, altura, filtro))
+        print(f"{rotulo:<28}{resultado['tempo_ms']:>12.1f}{resultado['memoria_extra_mb']:>22.1f}")
+
+
+# ---------------------------------------------------------------------------
+# Pré-processamento: redimensionamento + normalização da entrada do modelo
+# ---------------------------------------------------------------------------
+
+def _preprocessamento_original(imagens: List[Image.Image]) -> torch.Tensor:
+    """Caminho anterior: Compose montado a cada imagem + torch.cat do lote."""
+    tensores = []
+    for imagem in imagens:
+        transform = transforms.Compose([
+            transforms.Resize((TAMANHO_ENTRADA, TAMANHO_ENTRADA)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=MEDIA_IMAGENET, std=DESVIO_IMAGENET)
+        ])
+        tensores.append(transform(imagem).unsqueeze(0))
+    return torch.cat(tensores, dim=0)
+
+
+def _tempo_medio_ms(funcao: Callable[[], torch.Tensor], repeticoes: int) -> float:
+    funcao()  # aquecimento
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) * 1000.0 / repeticoes
+
+
+def benchmark_preprocessamento(largura: int, altura: int, lote: int, repeticoes: int) -> None:
+    """Compara o tempo por imagem do pré-processamento original e do atual."""
+    gerador = np.random.default_rng(0)
+    imagens = [
+        Image.fromarray(gerador.integers(0, 256, (altura, largura, 3), dtype=np.uint8))
+        for _ in range(lote)
+    ]
+    preprocessador = PreProcessador(max_lote=lote)
+
+    diferenca = (_preprocessamento_original(imagens) - preprocessador.preparar(imagens)).abs().max().item()
+    print(f"🖼️  Lote de {lote} imagem(ns) {largura}x{altura} -> {TAMANHO_ENTRADA}x{TAMANHO_ENTRADA} "
+          f"(diferença máxima {diferenca:.1e})")
+    print(f"{'variante':<36}{'por imagem (ms)':>18}")
+
+    variantes = [
+        ("antes (Compose por chamada + cat)", lambda: _preprocessamento_original(imagens)),
+        ("depois (tabela + buffer do lote)", lambda: preprocessador.preparar(imagens)),
+    ]
+    for rotulo, funcao in variantes:
+        tempo = _tempo_medio_ms(funcao, repeticoes) / lote
+        print(f"{rotulo:<36}{tempo:>18.2f}")
+
+    # Apenas a normalização, a partir de imagens já no tamanho do modelo
+    pixels = [preprocessador.redimensionar(imagem) for imagem in imagens]
+    redimensionadas = [Image.fromarray(p) for p in pixels]
+    variantes = [
+        ("  só normalização, antes", lambda: _preprocessamento_original(redimensionadas)),
+        ("  só normalização, depois", lambda: preprocessador.preencher(pixels)),
+    ]
+    for rotulo, funcao in variantes:
+        tempo = _tempo_medio_ms(funcao, repeticoes) / lote
+        print(f"{rotulo:<36}{tempo:>18.2f}")
+
+
+# ---------------------------------------------------------------------------
+# Threads: varredura de threads intra-op x tamanho de lote
+# ---------------------------------------------------------------------------
+
+def _contagens_threads(nucleos: int) -> List[int]:
+    """1, 2, 4, ... até o número de núcleos (incluído)."""
+    contagens = []
+    valor = 1
+    while valor < nucleos:
+        contagens.append(valor)
+        valor *= 2
+    contagens.append(nucleos)
+    return contagens
+
+
+def benchmark_threads(
+    backend: str,
+    variante: str,
+    modelo: Optional[str],
+    artefato: Optional[str],
+    lotes: List[int],
+    repeticoes: int,
+) -> None:
+    """
+    Mede o forward para cada combinação de threads intra-op e tamanho de lote.
+
+    A vazão da máquina é estimada como a de um worker multiplicada pelo número
+    de workers que cabem nos núcleos (núcleos // threads), cada um fixado em
+    núcleos próprios.
+    """
+    nucleos = len(nucleos_disponiveis())
+    print(f"🧮 {nucleos} núcleo(s), backend {backend}, variante {variante}")
+    print(f"{'threads':>8}{'lote':>6}{'ms/lote':>10}{'ms/imagem':>11}{'img/s (worker)':>16}"
+          f"{'workers':>9}{'img/s (máquina)':>17}")
+
+    gerador = torch.Generator().manual_seed(0)
+    resultados = []
+    modelo_backend = None
+
+    for threads in _contagens_threads(nucleos):
+        torch.set_num_threads(threads)
+        # A sessão do ONNX Runtime fixa as threads na criação
+        if modelo_backend is None or backend == "onnx":
+            modelo_backend = criar_backend(backend, variante, modelo, artefato)
+
+        for lote in lotes:
+            entrada = torch.randn(lote, 3, TAMANHO_ENTRADA, TAMANHO_ENTRADA, generator=gerador)
+            tempos = []
+            with torch.no_grad():
+                modelo_backend(entrada)  # aquecimento
+                for _ in range(repeticoes):
+                    inicio = time.perf_counter()
+                    modelo_backend(entrada)
+                    tempos.append(time.perf_counter() - inicio)
+
+            tempo_lote = float(np.median(tempos))
+            vazao = lote / tempo_lote
+            workers = max(1, nucleos // threads)
+            resultados.append((threads, lote, workers, vazao * workers, tempo_lote / lote))
+            print(f"{threads:>8}{lote:>6}{tempo_lote * 1000:>10.1f}{tempo_lote * 1000 / lote:>11.1f}"
+                  f"{vazao:>16.2f}{workers:>9}{vazao * workers:>17.2f}")
+
+    threads, lote, workers, vazao, _ = max(resultados, key=lambda r: r[3])
+    print(f"\n🏆 Maior vazão estimada: {vazao:.2f} img/s")
+    print(f"   SERVIDOR_WORKERS={workers} TORCH_NUM_THREADS={threads} LOTE_MAX={lote} CPU_AFINIDADE=auto")
+
+    threads, lote, _, _, por_imagem = min((r for r in resultados if r[1] == min(lotes)), key=lambda r: r[4])
+    print(f"⚡ Menor latência (lote {lote}): {por_imagem * 1000:.1f} ms/imagem com TORCH_NUM_THREADS={threads}")
+
+
+# ---------------------------------------------------------------------------
+# Codificação: formato e nível da imagem de saída
+# ---------------------------------------------------------------------------
+
+# (formato, nível) comparados; o primeiro é o PNG padrão do Pillow
+VARIANTES_CODIFICACAO = [
+    ("png", 6), ("png", 3), ("png", 1), ("png", 0),
+    ("webp", 80), ("webp", 90),
+    ("webp_sem_perda", 0), ("webp_sem_perda", 50),
+    ("rgba", 0),
+]
+
+
+def _imagem_recortada(largura: int, altura: int) -> Image.Image:
+    """RGBA parecida com uma foto recortada: gradientes, ruído e alfa com borda suave."""
+    gerador = np.random.default_rng(0)
+    y, x = np.mgrid[0:altura, 0:largura]
+    rgb = np.stack([x / largura * 255, y / altura * 255, (x + y) % 256], axis=-1)
+    rgb += gerador.normal(0, 8, rgb.shape)
+    imagem = Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(1))
+
+    alfa = np.zeros((altura, largura), dtype=np.uint8)
+    alfa[altura // 6:altura * 5 // 6, largura // 4:largura * 3 // 4] = 255
+    imagem.putalpha(Image.fromarray(alfa).filter(ImageFilter.GaussianBlur(5)))
+    return imagem
+
+
+def benchmark_codificacao(largura: int, altura: int, repeticoes: int) -> None:
+    """Compara tempo e tamanho de cada formato/nível de saída."""
+    imagem = _imagem_recortada(largura, altura)
+    codificador = CodificadorSaida()
+    print(f"🖼️  RGBA {largura}x{altura} ({largura * altura / 1e6:.1f} MP)")
+    print(f"{'formato':<22}{'nível':>6}{'tempo (ms)':>12}{'tamanho (MB)':>15}")
+
+    for formato, nivel in VARIANTES_CODIFICACAO:
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            tamanho = len(codificador.codificar(imagem, formato, nivel).getbuffer())
+            tempos.append(time.perf_counter() - inicio)
+        print(f"{formato:<22}{nivel:>6}{float(np.median(tempos)) * 1000:>12.1f}{tamanho / 1e6:>15.2f}")
+
+
+# ---------------------------------------------------------------------------
+# Entrada: esticar x letterbox e tamanho da entrada do modelo
+# ---------------------------------------------------------------------------
+
+# Proporções das imagens sintéticas (largura, altura), quando não há --imagens
+PROPORCOES_SINTETICAS = [(1200, 1200), (1600, 1200), (1920, 1080), (1080, 1920), (3000, 1000)]
+
+# Lado usado para comparar as máscaras (evita comparar em resolução cheia)
+LADO_COMPARACAO = 640
+
+
+def _carregar_imagens(diretorio: Optional[str]) -> List[Tuple[str, Image.Image]]:
+    """Imagens de `diretorio` (jpg/png/webp) ou, sem ele, sintéticas em várias proporções."""
+    if diretorio is None:
+        return [
+            (f"sintetica {largura}x{altura}", _imagem_recortada(largura, altura).convert("RGB"))
+            for largura, altura in PROPORCOES_SINTETICAS
+        ]
+    caminhos = sorted(
+        caminho for caminho in Path(diretorio).iterdir()
+        if caminho.suffix.lower() in (".jpg", ".jpeg", ".png", ".webp")
+    )
+    return [(caminho.name, Image.open(caminho).convert("RGB")) for caminho in caminhos]
+
+
+def _mascara_entrada(
+    modelo_backend: Callable,
+    preprocessador: PreProcessador,
+    imagem: Image.Image,
+) -> np.ndarray:
+    """Redimensiona, executa o forward e recorta o preenchimento, como o serviço."""
+    pixels = preprocessador.redimensionar(imagem)
+    with torch.no_grad():
+        pred = modelo_backend(preprocessador.preencher([pixels]))[0, 0].numpy()
+    pred = pred[:pixels.shape[0], :pixels.shape[1]]
+    return (pred - pred.min()) / (pred.max() - pred.min() + 1e-8)
+
+
+def _comparavel(mascara: np.ndarray, tamanho: Tuple[int, int]) -> np.ndarray:
+    """Máscara ampliada para a imagem reduzida a LADO_COMPARACAO, em [0, 1]."""
+    destino = dimensoes_entrada(tamanho, min(LADO_COMPARACAO, max(tamanho)), letterbox=True)
+    return np.asarray(redimensionar_mascara(mascara, destino), dtype=np.float32) / 255.0
+
+
+def benchmark_entrada(
+    backend: str,
+    variante: str,
+    modelo: Optional[str],
+    artefato: Optional[str],
+    diretorio: Optional[str],
+    tamanhos: List[int],
+    repeticoes: int,
+) -> None:
+    """
+    Compara latência e qualidade de cada modo e tamanho de entrada.
+
+    A referência é a configuração padrão (esticada em 320x320); a qualidade é
+    o erro absoluto médio e o IoU (limiar 0.5) das máscaras em relação a ela.
+    """
+    modelo_backend = criar_backend(backend, variante, modelo, artefato)
+    imagens = _carregar_imagens(diretorio)
+    print(f"🖼️  {len(imagens)} imagem(ns), backend {backend}, variante {variante}")
+
+    referencia = PreProcessador(tamanho=TAMANHO_ENTRADA)
+    referencias = [
+        _comparavel(_mascara_entrada(modelo_backend, referencia, imagem), imagem.size)
+        for _, imagem in imagens
+    ]
+
+    print(f"{'modo':<11}{'lado':>6}{'pixels (média)':>16}{'ms/imagem':>11}{'EAM':>8}{'IoU':>7}")
+    for letterbox in (False, True):
+        for lado in tamanhos:
+            preprocessador = PreProcessador(tamanho=lado, letterbox=letterbox)
+            tempos, erros, ious, pixels = [], [], [], []
+            for (_, imagem), alvo in zip(imagens, referencias):
+                _mascara_entrada(modelo_backend, preprocessador, imagem)  # aquecimento
+                for _ in range(repeticoes):
+                    inicio = time.perf_counter()
+                    mascara = _mascara_entrada(modelo_backend, preprocessador, imagem)
+                    tempos.append(time.perf_counter() - inicio)
+
+                largura, altura = dimensoes_entrada(imagem.size, lado, letterbox)
+                pixels.append(largura * altura)
+                comparada = _comparavel(mascara, imagem.size)
+                erros.append(float(np.abs(comparada - alvo).mean()))
+                uniao = np.logical_or(comparada > 0.5, alvo > 0.5).sum()
+                intersecao = np.logical_and(comparada > 0.5, alvo > 0.5).sum()
+                ious.append(float(intersecao / uniao) if uniao else 1.0)
+
+            modo = "letterbox" if letterbox else "esticar"
+            print(f"{modo:<11}{lado:>6}{np.mean(pixels):>16.0f}{float(np.median(tempos)) * 1000:>11.1f}"
+                  f"{np.mean(erros):>8.3f}{np.mean(ious):>7.3f}")
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks do pipeline de remoção de fundo")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    composicao = subparsers.add_parser("composicao", help="Ampliação da máscara e canal alfa")
+    composicao.add_argument("--largura", type=int, default=6000)
+    composicao.add_argument("--altura", type=int, default=4000)
+    composicao.add_argument("--filtro", default="bilinear",
+                            choices=["nearest", "bilinear", "bicubic", "lanczos", "tensor"])
+
+    preprocessamento = subparsers.add_parser("preprocessamento", help="Redimensionamento e normalização da entrada")
+    preprocessamento.add_argument("--largura", type=int, default=1280)
+    preprocessamento.add_argument("--altura", type=int, default=960)
+    preprocessamento.add_argument("--lote", type=int, default=1)
+    preprocessamento.add_argument("--repeticoes", type=int, default=50)
+
+    threads = subparsers.add_parser("threads", help="Varredura de threads intra-op x tamanho de lote")
+    threads.add_argument("--backend", default="eager", choices=["eager", "torchscript", "onnx", "quantizado"])
+    threads.add_argument("--variante", default="u2net", choices=["u2net", "u2netp"])
+    threads.add_argument("--modelo", default=None, help="Checkpoint .pth")
+    threads.add_argument("--artefato", default=None, help="Artefato exportado (torchscript/onnx/quantizado)")
+    threads.add_argument("--lotes", default="1,2,4", help="Tamanhos de lote separados por vírgula")
+    threads.add_argument("--repeticoes", type=int, default=5)
+
+    codificacao = subparsers.add_parser("codificacao", help="Formato e nível da imagem de saída")
+    codificacao.add_argument("--largura", type=int, default=3000)
+    codificacao.add_argument("--altura", type=int, default=2000)
+    codificacao.add_argument("--repeticoes", type=int, default=3)
+
+    entrada = subparsers.add_parser("entrada", help="Esticar x letterbox e tamanho da entrada do modelo")
+    entrada.add_argument("--backend", default="eager", choices=["eager", "torchscript", "onnx", "quantizado"])
+    entrada.add_argument("--variante", default="u2net", choices=["u2net", "u2netp"])
+    entrada.add_argument("--modelo", default=None, help="Checkpoint .pth")
+    entrada.add_argument("--artefato", default=None, help="Artefato exportado (torchscript/onnx/quantizado)")
+    entrada.add_argument("--imagens", default=None, help="Diretório com imagens; sem ele, usa imagens sintéticas")
+    entrada.add_argument("--tamanhos", default="192,256,320", help="Lados de entrada separados por vírgula")
+    entrada.add_argument("--repeticoes", type=int, default=3)
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "composicao":
+        benchmark_composicao(args.largura, args.altura, args.filtro)
+    elif args.comando == "preprocessamento":
+        benchmark_preprocessamento(args.largura, args.altura, args.lote, args.repeticoes)
+    elif args.comando == "threads":
+        lotes = [int(valor) for valor in args.lotes.split(",") if valor.strip()]
+        benchmark_threads(args.backend, args.variante, args.modelo, args.artefato, lotes, args.repeticoes)
+    elif args.comando == "codificacao":
+        benchmark_codificacao(args.largura, args.altura, args.repeticoes)
+    elif args.comando == "entrada":
+        tamanhos = [int(valor) for valor in args.tamanhos.split(",") if valor.strip()]
+        benchmark_entrada(args.backend, args.variante, args.modelo, args.artefato,
+                          args.imagens, tamanhos, args.repeticoes)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import time
+from io import BytesIO
+from typing import Dict, Optional
+
+from PIL import Image
+
+from app.infrastructure.metricas import Histograma
+
+
+# Formatos de saída: tipo de mídia e extensão do arquivo
+FORMATOS_SAIDA = {
+    "png": ("image/png", ".png"),
+    "webp": ("image/webp", ".webp"),
+    "webp_sem_perda": ("image/webp", ".webp"),
+    "rgba": ("application/octet-stream", ".rgba"),  # RGBA pré-multiplicado, 8 bits, linha a linha
+}
+
+# Faixa do `nivel` de cada formato
+FAIXAS_NIVEL = {
+    "png": (0, 9),              # compress_level do zlib
+    "webp": (0, 100),           # qualidade com perdas
+    "webp_sem_perda": (0, 100), # esforço de compressão
+    "rgba": (0, 0),             # sem codificação
+}
+
+# Método do libwebp (0 = mais rápido, 6 = menor arquivo) no modo com perdas
+METODO_WEBP = 4
+
+
+def normalizar_formato(formato: str) -> str:
+    """
+    Nome canônico do formato ("PNG" -> "png").
+
+    Raises:
+        ValueError: se o formato não for suportado
+    """
+    nome = formato.lower()
+    if nome not in FORMATOS_SAIDA:
+        raise ValueError(f"Formato de saída inválido: {formato} (use {', '.join(FORMATOS_SAIDA)})")
+    return nome
+
+
+def validar_nivel(formato: str, nivel: int) -> int:
+    """
+    Raises:
+        ValueError: se o nível estiver fora da faixa do formato
+    """
+    minimo, maximo = FAIXAS_NIVEL[normalizar_formato(formato)]
+    if not minimo <= nivel <= maximo:
+        raise ValueError(f"Nível {nivel} inválido para {formato} (use de {minimo} a {maximo})")
+    return nivel
+
+
+class CodificadorSaida:
+    """
+    Codifica a imagem RGBA final no formato pedido e mede o tempo de cada formato.
+
+    Em imagens grandes a compressão zlib do PNG pode custar mais que a própria
+    inferência; os histogramas por formato mostram qual é o mais barato para
+    cada cliente.
+    """
+
+    def __init__(self, nivel_png: int = 1, qualidade_webp: int = 80, esforco_webp_sem_perda: int = 0):
+        """
+        Args:
+            nivel_png: compress_level padrão do PNG (0 = sem compressão, 9 = máxima)
+            qualidade_webp: Qualidade padrão do WebP com perdas
+            esforco_webp_sem_perda: Esforço padrão do WebP sem perdas (0 = mais rápido)
+        """
+        self.niveis_padrao = {
+            "png": validar_nivel("png", nivel_png),
+            "webp": validar_nivel("webp", qualidade_webp),
+            "webp_sem_perda": validar_nivel("webp_sem_perda", esforco_webp_sem_perda),
+            "rgba": 0,
+        }
+        self.hist_ms = {
+            formato: Histograma([5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000])
+            for formato in FORMATOS_SAIDA
+        }
+
+    def nivel(self, formato: str, nivel: Optional[int] = None) -> int:
+        """Nível efetivo: o pedido, validado, ou o padrão do formato."""
+        formato = normalizar_formato(formato)
+        return self.niveis_padrao[formato] if nivel is None else validar_nivel(formato, nivel)
+
+    def codificar(self, imagem: Image.Image, formato: str = "png", nivel: Optional[int] = None) -> BytesIO:
+        """
+        Args:
+            imagem: Imagem RGBA com fundo removido
+            formato: Chave de FORMATOS_SAIDA
+            nivel: compress_level (png), qualidade (webp) ou esforço (webp_sem_perda);
+                None usa o padrão configurado
+
+        Returns:
+            BytesIO posicionado no início
+        """
+        formato = normalizar_formato(formato)
+        nivel = self.nivel(formato, nivel)
+
+        inicio = time.perf_counter()
+        buffer = BytesIO()
+        if formato == "png":
+            imagem.save(buffer, format="PNG", compress_level=nivel)
+        elif formato == "webp":
+            imagem.save(buffer, format="WEBP", quality=nivel, method=METODO_WEBP)
+        elif formato == "webp_sem_perda":
+            # No modo sem perdas a qualidade é o esforço; o método acompanha
+            imagem.save(buffer, format="WEBP", lossless=True, quality=nivel, method=round(nivel * 6 / 100))
+        else:
+            buffer.write(imagem.convert("RGBa").tobytes())
+        buffer.seek(0)
+
+        self.hist_ms[formato].observar((time.perf_counter() - inicio) * 1000.0)
+        return buffer
+
+    def estatisticas(self) -> Dict:
+        """Histograma do tempo de codificação (ms) dos formatos já usados."""
+        resumos = {formato: histograma.resumo() for formato, histograma in self.hist_ms.items()}
+        return {formato: resumo for formato, resumo in resumos.items() if resumo["contagem"]}
+
+
+__all__ = ["FORMATOS_SAIDA", "normalizar_formato", "validar_nivel", "CodificadorSaida"]
@@ -0,0 +1,69 @@
+from typing import Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+
+# Filtros aceitos para ampliar a máscara até a resolução original
+FILTROS_MASCARA = {
+    "nearest": Image.NEAREST,
+    "bilinear": Image.BILINEAR,
+    "bicubic": Image.BICUBIC,
+    "lanczos": Image.LANCZOS,
+    "tensor": None,  # F.interpolate bilinear sobre o tensor da máscara
+}
+
+
+def redimensionar_mascara(
+    mascara: np.ndarray,
+    tamanho: Tuple[int, int],
+    filtro: str = "bilinear",
+) -> Image.Image:
+    """
+    Converte a máscara do modelo em imagem L (uint8) no tamanho pedido.
+
+    A máscara é convertida para uint8 ainda em 320x320, de modo que a única
+    alocação em resolução cheia é a própria imagem L de saída.
+
+    Args:
+        mascara: Array float [H, W] em [0, 1]
+        tamanho: (largura, altura) de destino
+        filtro: Chave de FILTROS_MASCARA
+    """
+    if filtro not in FILTROS_MASCARA:
+        raise ValueError(f"Filtro de máscara inválido: {filtro} (use {', '.join(FILTROS_MASCARA)})")
+
+    largura, altura = tamanho
+
+    if filtro == "tensor":
+        tensor = torch.from_numpy(np.ascontiguousarray(mascara, dtype=np.float32))[None, None]
+        tensor = F.interpolate(tensor, size=(altura, largura), mode="bilinear", align_corners=False)
+        return Image.fromarray(tensor[0, 0].mul_(255).to(torch.uint8).numpy(), "L")
+
+    mascara_img = Image.fromarray((mascara * 255).astype(np.uint8), "L")
+    if mascara_img.size == (largura, altura):
+        return mascara_img
+    return mascara_img.resize((largura, altura), FILTROS_MASCARA[filtro])
+
+
+def aplicar_mascara(imagem: Image.Image, mascara: Image.Image) -> Image.Image:
+    """
+    Usa a máscara como canal alfa da imagem, sem cópias intermediárias.
+
+    `putalpha` converte a imagem RGB para RGBA no próprio objeto e grava a
+    banda alfa diretamente, então a imagem recebida é modificada e retornada.
+
+    Args:
+        imagem: Imagem em RGB (ou RGBA)
+        mascara: Máscara L com o mesmo tamanho da imagem
+
+    Returns:
+        A mesma imagem, agora em RGBA com fundo removido
+    """
+    imagem.putalpha(mascara)
+    return imagem
+
+
+__all__ = ["FILTROS_MASCARA", "redimensionar_mascara", "aplicar_mascara"]
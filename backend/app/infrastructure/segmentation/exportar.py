@@ -0,0 +1,143 @@
+"""
+Exporta o U²-Net (apenas a saída fundida d0) para TorchScript ou ONNX e
+confere a paridade do artefato com a execução eager.
+
+Uso (a partir de backend/):
+    python -m app.infrastructure.segmentation.exportar --formato onnx
+    python -m app.infrastructure.segmentation.exportar --formato torchscript --variante u2netp
+    python -m app.infrastructure.segmentation.exportar --formato onnx --apenas-verificar
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import torch
+
+from app.infrastructure.segmentation.backends import (
+    ENTRADA_ONNX,
+    SAIDA_ONNX,
+    BackendInferencia,
+    caminho_artefato,
+    criar_backend,
+)
+from app.infrastructure.segmentation.modelo import carregar_rede
+
+
+TAMANHO_EXEMPLO = 320
+
+
+def exportar_torchscript(net: torch.nn.Module, destino: Path) -> None:
+    """
+    Traça a rede com um lote de exemplo e congela os pesos no grafo.
+
+    As otimizações dependentes da máquina (`optimize_for_inference`) são
+    aplicadas ao carregar o artefato, pois o grafo resultante não é serializável.
+    """
+    exemplo = torch.randn(1, 3, TAMANHO_EXEMPLO, TAMANHO_EXEMPLO)
+    with torch.no_grad():
+        congelado = torch.jit.freeze(torch.jit.trace(net, exemplo))
+    congelado.save(str(destino))
+
+
+def exportar_onnx(net: torch.nn.Module, destino: Path, opset: int = 17) -> None:
+    """Exporta a rede para ONNX com lote, altura e largura dinâmicos."""
+    exemplo = torch.randn(1, 3, TAMANHO_EXEMPLO, TAMANHO_EXEMPLO)
+    eixos = {0: "lote", 2: "altura", 3: "largura"}
+    with torch.no_grad():
+        torch.onnx.export(
+            net,
+            exemplo,
+            str(destino),
+            input_names=[ENTRADA_ONNX],
+            output_names=[SAIDA_ONNX],
+            dynamic_axes={ENTRADA_ONNX: eixos, SAIDA_ONNX: eixos},
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+
+
+def verificar_paridade(
+    referencia: torch.nn.Module,
+    backend: BackendInferencia,
+    tamanho_lote: int = 2,
+    repeticoes: int = 3,
+) -> Dict[str, float]:
+    """
+    Compara a saída do backend com a execução eager em entradas aleatórias.
+
+    Returns:
+        Dicionário com a diferença absoluta máxima e o tempo médio por lote de cada execução
+    """
+    gerador = torch.Generator().manual_seed(0)
+    diferenca = 0.0
+    tempo_eager = 0.0
+    tempo_backend = 0.0
+
+    for _ in range(repeticoes):
+        lote = torch.randn(tamanho_lote, 3, TAMANHO_EXEMPLO, TAMANHO_EXEMPLO, generator=gerador)
+
+        inicio = time.perf_counter()
+        with torch.no_grad():
+            esperado = referencia(lote)
+        tempo_eager += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        obtido = backend(lote)
+        tempo_backend += time.perf_counter() - inicio
+
+        diferenca = max(diferenca, (esperado - obtido.to(esperado.device)).abs().max().item())
+
+    return {
+        "diferenca_maxima": diferenca,
+        "tempo_eager_s": tempo_eager / repeticoes,
+        "tempo_backend_s": tempo_backend / repeticoes,
+    }
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Exporta o U²-Net para TorchScript ou ONNX")
+    parser.add_argument("--formato", required=True, choices=["torchscript", "onnx"],
+                        help="Formato do artefato")
+    parser.add_argument("--variante", default="u2net", choices=["u2net", "u2netp"],
+                        help="Variante do modelo")
+    parser.add_argument("--modelo", default=None,
+                        help="Checkpoint .pth (padrão: U-2-Net/saved_models/<variante>/<variante>.pth)")
+    parser.add_argument("--saida", default=None,
+                        help="Arquivo de saída (padrão: ao lado do checkpoint)")
+    parser.add_argument("--opset", type=int, default=17, help="Versão do opset ONNX")
+    parser.add_argument("--tolerancia", type=float, default=1e-4,
+                        help="Diferença absoluta máxima aceita em relação ao eager")
+    parser.add_argument("--apenas-verificar", action="store_true",
+                        help="Não exporta; apenas verifica um artefato existente")
+    args = parser.parse_args(argv)
+
+    destino = Path(args.saida) if args.saida else caminho_artefato(args.formato, args.variante, args.modelo)
+    net = carregar_rede(args.variante, args.modelo)
+
+    if not args.apenas_verificar:
+        print(f"📦 Exportando {args.variante} para {args.formato}: {destino}")
+        if args.formato == "torchscript":
+            exportar_torchscript(net, destino)
+        else:
+            exportar_onnx(net, destino, args.opset)
+
+    backend = criar_backend(args.formato, args.variante, args.modelo, artefato=destino)
+    resultado = verificar_paridade(net, backend)
+
+    print(f"📏 Diferença máxima vs eager: {resultado['diferenca_maxima']:.2e} "
+          f"(tolerância {args.tolerancia:.0e})")
+    print(f"⏱️  Tempo por lote: eager {resultado['tempo_eager_s']:.3f}s, "
+          f"{args.formato} {resultado['tempo_backend_s']:.3f}s")
+
+    if resultado["diferenca_maxima"] > args.tolerancia:
+        print("❌ Paridade fora da tolerância")
+        return 1
+
+    print("✅ Paridade dentro da tolerância")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import functools
+import logging
+import sys
+import zipfile
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import torch
+from PIL import Image, UnidentifiedImageError
+
+from app.domain.excecoes import ImagemInvalida
+
+
+logger = logging.getLogger(__name__)
+
+# Raiz do repositório (contém backend/ e U-2-Net/)
+RAIZ_PROJETO = Path(__file__).parent.parent.parent.parent.parent
+
+# Fallback absoluto usado no deploy do Render
+RAIZ_RENDER = Path("/opt/render/project/src")
+
+# Resolução de entrada do modelo e normalização ImageNet usada no treino
+TAMANHO_ENTRADA = 320
+MEDIA_IMAGENET = [0.485, 0.456, 0.406]
+DESVIO_IMAGENET = [0.229, 0.224, 0.225]
+
+# Classe de inferência (apenas a saída fundida d0) de cada variante
+CLASSES_INFERENCIA = {
+    "u2net": "U2NETInference",
+    "u2netp": "U2NETPInference",
+}
+
+
+def importar_u2net():
+    """Adiciona U-2-Net/model ao sys.path e importa o módulo u2net."""
+    u2net_path = RAIZ_PROJETO / "U-2-Net"
+
+    if str(u2net_path) not in sys.path:
+        sys.path.insert(0, str(u2net_path))
+
+    model_dir = u2net_path / "model"
+    if str(model_dir) not in sys.path:
+        sys.path.insert(0, str(model_dir))
+
+    import u2net
+    return u2net
+
+
+def caminho_pesos(
+    variante: str = "u2net",
+    caminho: Optional[Union[str, Path]] = None,
+    verificar: bool = True,
+) -> Path:
+    """
+    Resolve o caminho do checkpoint `.pth` de uma variante.
+
+    Args:
+        variante: "u2net" ou "u2netp"
+        caminho: Caminho explícito; se informado, é usado sem fallback
+        verificar: Se True, exige que o arquivo exista
+
+    Raises:
+        FileNotFoundError: se `verificar` e o checkpoint não for encontrado
+    """
+    if caminho:
+        model_path = Path(caminho)
+    else:
+        relativo = Path("U-2-Net") / "saved_models" / variante / f"{variante}.pth"
+        model_path = RAIZ_PROJETO / relativo
+
+        # Fallback absoluto
+        if not model_path.exists() and (RAIZ_RENDER / relativo).exists():
+            model_path = RAIZ_RENDER / relativo
+
+    if verificar and not model_path.exists():
+        raise FileNotFoundError(f"Modelo não encontrado: {model_path}")
+
+    return model_path
+
+
+def decodificar_imagem(
+    imagem_bytes: Union[bytes, BytesIO],
+    reduzir_para: Optional[int] = None,
+) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    Decodifica a imagem em RGB.
+
+    Com `reduzir_para`, JPEGs usam o escalonamento DCT do decodificador
+    (`Image.draft`): os pixels são decodificados direto em 1/2, 1/4 ou 1/8 da
+    resolução, na menor escala em que os dois lados ainda têm pelo menos
+    `reduzir_para` pixels. Para os demais formatos a decodificação é completa.
+
+    Returns:
+        (imagem RGB, tamanho original lido do cabeçalho)
+
+    Raises:
+        ImagemInvalida: se o conteúdo não for uma imagem ou os pixels estiverem truncados/corrompidos
+    """
+    if isinstance(imagem_bytes, bytes):
+        imagem_bytes = BytesIO(imagem_bytes)
+
+    try:
+        imagem = Image.open(imagem_bytes)
+        tamanho_original = imagem.size
+        if reduzir_para is not None:
+            imagem.draft("RGB", (reduzir_para, reduzir_para))
+        # convert() decodifica os pixels: um corpo truncado só aparece aqui
+        return imagem.convert("RGB"), tamanho_original
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise ImagemInvalida("Arquivo enviado não é uma imagem válida") from e
+
+
+@functools.lru_cache(maxsize=None)
+def _transformacao_entrada():
+    """
+    Transformação de referência da entrada, montada uma única vez.
+
+    O torchvision só é importado aqui: o serviço usa o `PreProcessador` e não
+    paga a importação na inicialização.
+    """
+    from torchvision import transforms
+
+    return transforms.Compose([
+        transforms.Resize((TAMANHO_ENTRADA, TAMANHO_ENTRADA)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=MEDIA_IMAGENET, std=DESVIO_IMAGENET)
+    ])
+
+
+def preparar_imagem(imagem: Image.Image) -> torch.Tensor:
+    """Redimensiona e normaliza uma imagem RGB para um tensor [1, 3, 320, 320]."""
+    return _transformacao_entrada()(imagem).unsqueeze(0)
+
+
+def carregar_pesos(caminho: Path) -> Dict[str, torch.Tensor]:
+    """
+    Lê o state_dict do checkpoint apenas como tensores (`weights_only`, sem pickle arbitrário).
+
+    Checkpoints no formato zip (padrão desde o PyTorch 1.6) são mapeados em
+    memória: os tensores apontam para as páginas do arquivo, lidas sob demanda
+    e compartilhadas pelo cache de páginas do sistema entre os processos, em
+    vez de copiados para a memória de cada um. O formato legado não permite
+    mmap e é lido por completo.
+    """
+    if zipfile.is_zipfile(caminho):
+        return torch.load(caminho, map_location="cpu", mmap=True, weights_only=True)
+
+    logger.warning(
+        "%s está no formato legado do PyTorch e não pode ser mapeado em memória; "
+        "para converter: torch.save(torch.load('%s', weights_only=True), '<novo>.pth')", caminho.name, caminho)
+    return torch.load(caminho, map_location="cpu", weights_only=True)
+
+
+def carregar_rede(
+    variante: str = "u2net",
+    caminho: Optional[Union[str, Path]] = None,
+    device: Optional[torch.device] = None,
+) -> torch.nn.Module:
+    """
+    Constrói a rede de inferência da variante e carrega os pesos.
+
+    Returns:
+        Rede em modo eval que retorna apenas sigmoid(d0) com shape [N, 1, H, W]
+    """
+    if variante not in CLASSES_INFERENCIA:
+        raise ValueError(f"Variante desconhecida: {variante} (use {', '.join(CLASSES_INFERENCIA)})")
+
+    device = device or torch.device("cpu")
+    u2net = importar_u2net()
+
+    # A rede é construída sem memória (device "meta") e recebe os próprios
+    # tensores do checkpoint (`assign=True`): nem a inicialização aleatória
+    # nem a cópia dos pesos acontecem
+    with torch.device("meta"):
+        net = getattr(u2net, CLASSES_INFERENCIA[variante])(3, 1)
+    net.load_state_dict(carregar_pesos(caminho_pesos(variante, caminho)), assign=True)
+    net.to(device)
+    net.eval()
+    return net
+
+
+__all__ = [
+    "RAIZ_PROJETO",
+    "TAMANHO_ENTRADA",
+    "importar_u2net",
+    "caminho_pesos",
+    "decodificar_imagem",
+    "preparar_imagem",
+    "carregar_pesos",
+    "carregar_rede",
+]
@@ -0,0 +1,391 @@
+"""
+Perfis do pipeline de remoção de fundo, sob demanda: `torch.profiler`
+(trace no formato do Chrome, operador a operador) e cProfile (código Python).
+
+O perfil é pedido por requisição (`iniciar_perfil`, chamado pela API a partir
+de um cabeçalho protegido por token ou de uma amostragem) e fica em uma
+`ContextVar`; o serviço envolve o pipeline em `perfilar`, que só tem efeito
+nessas requisições. Os forwards dos blocos RSU do modelo eager são anotados
+(`rsu:<bloco>:<classe>`) para que o resumo agrupe os operadores por bloco.
+
+Uso (a partir de backend/):
+    python -m app.infrastructure.segmentation.perfil capturar --variante u2netp --imagem foto.jpg
+    python -m app.infrastructure.segmentation.perfil resumo perfis/<arquivo>.json --top 10
+    python -m app.infrastructure.segmentation.perfil resumo perfis/<arquivo>.pstats
+"""
+import argparse
+import cProfile
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar, Token
+from pathlib import Path
+from typing import ContextManager, Dict, Iterator, List, Optional, Tuple
+
+import torch
+from torch.profiler import ProfilerActivity, profile, record_function
+
+
+logger = logging.getLogger(__name__)
+
+# Prefixo das anotações dos blocos RSU no trace: "rsu:<bloco>:<classe>"
+PREFIXO_BLOCO = "rsu:"
+
+# Extensões dos arquivos gravados para cada perfil
+EXTENSAO_TRACE = ".json"
+EXTENSAO_PYTHON = ".pstats"
+
+# Um perfil por vez no processo: o perfilador do PyTorch não admite sessões simultâneas
+_lock_perfil = threading.Lock()
+
+
+class SessaoPerfil:
+    """Perfil pedido para a requisição atual: nome dos arquivos e onde gravá-los."""
+
+    __slots__ = ("nome", "diretorio", "max_arquivos", "ativa")
+
+    def __init__(self, nome: str, diretorio: Path, max_arquivos: int):
+        self.nome = nome
+        self.diretorio = diretorio
+        self.max_arquivos = max_arquivos
+        # Só a sessão que obteve o perfilador anota as etapas
+        self.ativa = False
+
+
+_sessao: ContextVar[Optional[SessaoPerfil]] = ContextVar("sessao_perfil", default=None)
+
+
+def iniciar_perfil(nome: str, diretorio: str, max_arquivos: int = 50) -> Token:
+    """Pede o perfil do pipeline executado no contexto atual; devolve o token para `encerrar_perfil`."""
+    return _sessao.set(SessaoPerfil(nome, Path(diretorio), max_arquivos))
+
+
+def encerrar_perfil(token: Token) -> None:
+    _sessao.reset(token)
+
+
+def perfil_pedido() -> bool:
+    """Se o contexto atual pediu um perfil (ex: para não responder do cache)."""
+    return _sessao.get() is not None
+
+
+def perfil_em_andamento() -> bool:
+    """Se o pipeline do contexto atual está sendo perfilado agora."""
+    sessao = _sessao.get()
+    return sessao is not None and sessao.ativa
+
+
+def anotar(nome: str) -> ContextManager:
+    """Intervalo nomeado no trace (ex: uma etapa do pipeline); sem custo fora de um perfil."""
+    return record_function(nome) if perfil_em_andamento() else nullcontext()
+
+
+# Thread do perfil em andamento e as anotações de bloco abertas nela. Os
+# ganchos ficam na rede compartilhada: forwards de outras requisições, em
+# outras threads, passam por eles sem anotar nada
+_thread_perfilada: Optional[int] = None
+_anotacoes_abertas: List[Tuple[torch.nn.Module, record_function]] = []
+
+
+def _abrir_bloco(modulo: torch.nn.Module, _entradas) -> None:
+    if threading.get_ident() != _thread_perfilada:
+        return
+    anotacao = record_function(modulo._nome_perfil)
+    anotacao.__enter__()
+    _anotacoes_abertas.append((modulo, anotacao))
+
+
+def _fechar_bloco(modulo: torch.nn.Module, _entradas, _saida) -> None:
+    # Um forward iniciado antes dos ganchos não tem anotação aberta
+    if threading.get_ident() != _thread_perfilada:
+        return
+    if _anotacoes_abertas and _anotacoes_abertas[-1][0] is modulo:
+        _anotacoes_abertas.pop()[1].__exit__(None, None, None)
+
+
+def _fechar_blocos_abertos() -> None:
+    """Fecha as anotações de um forward interrompido por exceção (o gancho de saída não roda)."""
+    while _anotacoes_abertas:
+        _anotacoes_abertas.pop()[1].__exit__(None, None, None)
+
+
+def _anotar_blocos(rede: Optional[torch.nn.Module]) -> List:
+    """
+    Envolve o forward de cada bloco RSU da rede em uma anotação do trace.
+
+    Returns:
+        Os ganchos instalados, a remover ao fim do perfil (vazio fora do modo
+        eager: TorchScript e ONNX não executam os módulos Python)
+    """
+    if not isinstance(rede, torch.nn.Module) or isinstance(rede, torch.jit.ScriptModule):
+        return []
+    ganchos = []
+    for nome, modulo in rede.named_modules():
+        if type(modulo).__name__.startswith("RSU"):
+            modulo._nome_perfil = f"{PREFIXO_BLOCO}{nome}:{type(modulo).__name__}"
+            ganchos.append(modulo.register_forward_pre_hook(_abrir_bloco))
+            ganchos.append(modulo.register_forward_hook(_fechar_bloco))
+    return ganchos
+
+
+def _limitar_arquivos(diretorio: Path, max_arquivos: int) -> None:
+    """Remove os perfis mais antigos além de `max_arquivos` (trace e pstats contam juntos)."""
+    traces = sorted(diretorio.glob("*" + EXTENSAO_TRACE), key=lambda caminho: caminho.stat().st_mtime)
+    for trace in traces[:max(0, len(traces) - max_arquivos)]:
+        trace.unlink(missing_ok=True)
+        trace.with_suffix(EXTENSAO_PYTHON).unlink(missing_ok=True)
+
+
+@contextmanager
+def perfilar(rede: Optional[torch.nn.Module] = None) -> Iterator[Optional[str]]:
+    """
+    Perfila o bloco se o contexto atual pediu um perfil e nenhum outro está em andamento.
+
+    O `torch.profiler` e o cProfile só observam a thread atual: o forward
+    precisa rodar nela (o serviço dispensa o agendador de lotes durante o perfil).
+
+    Args:
+        rede: Rede eager cujos blocos RSU são anotados no trace
+
+    Yields:
+        Nome do perfil (arquivos `<nome>.json` e `<nome>.pstats` no diretório
+        configurado), ou None se o bloco não estiver sendo perfilado
+    """
+    global _thread_perfilada
+    sessao = _sessao.get()
+    if sessao is None or sessao.ativa or not _lock_perfil.acquire(blocking=False):
+        yield None
+        return
+
+    atividades = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        atividades.append(ProfilerActivity.CUDA)
+    perfil_torch = profile(activities=atividades, record_shapes=True)
+    perfil_python = cProfile.Profile()
+    _thread_perfilada = threading.get_ident()
+    ganchos = _anotar_blocos(rede)
+    sessao.ativa = True
+    try:
+        with perfil_torch:
+            perfil_python.enable()
+            try:
+                yield sessao.nome
+            finally:
+                perfil_python.disable()
+                _fechar_blocos_abertos()
+    finally:
+        sessao.ativa = False
+        _thread_perfilada = None
+        for gancho in ganchos:
+            gancho.remove()
+        _lock_perfil.release()
+
+    # O serviço trata as próprias falhas: o perfil de uma requisição com erro também é gravado
+    inicio = time.perf_counter()
+    try:
+        sessao.diretorio.mkdir(parents=True, exist_ok=True)
+        perfil_torch.export_chrome_trace(str(sessao.diretorio / (sessao.nome + EXTENSAO_TRACE)))
+        perfil_python.dump_stats(str(sessao.diretorio / (sessao.nome + EXTENSAO_PYTHON)))
+        _limitar_arquivos(sessao.diretorio, sessao.max_arquivos)
+    except Exception:
+        logger.exception("Erro ao gravar o perfil %s", sessao.nome)
+        return
+    logger.info("Perfil %s gravado em %.0f ms", sessao.nome, (time.perf_counter() - inicio) * 1000.0)
+
+
+# ---------------------------------------------------------------------------
+# Resumo dos perfis gravados
+# ---------------------------------------------------------------------------
+
+def _tempo_proprio(eventos: List[Dict]) -> Dict[int, float]:
+    """
+    Tempo de cada evento descontados os eventos aninhados nele (mesma thread), em µs.
+
+    Os operadores chamam outros (aten::conv2d -> aten::convolution -> ...):
+    somar a duração total contaria o mesmo tempo várias vezes.
+    """
+    proprio: Dict[int, float] = {}
+    por_thread: Dict[Tuple, List[Dict]] = defaultdict(list)
+    for evento in eventos:
+        por_thread[(evento.get("pid"), evento.get("tid"))].append(evento)
+
+    for lista in por_thread.values():
+        lista.sort(key=lambda e: (e["ts"], -e["dur"]))
+        pilha: List[Dict] = []
+        for evento in lista:
+            while pilha and evento["ts"] >= pilha[-1]["ts"] + pilha[-1]["dur"]:
+                pilha.pop()
+            proprio[id(evento)] = float(evento["dur"])
+            if pilha:
+                proprio[id(pilha[-1])] -= evento["dur"]
+            pilha.append(evento)
+    return proprio
+
+
+def resumir_trace(caminho: str) -> Dict:
+    """
+    Agrupa o trace do Chrome gravado por `perfilar` por bloco RSU e por operador.
+
+    Returns:
+        {"total_ms", "blocos": [(bloco, classe, ms, {operador: ms próprio})],
+         "operadores": {operador: (ms próprio, chamadas)}}, com os blocos na
+        ordem de execução
+    """
+    with open(caminho, encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+    eventos = dados["traceEvents"] if isinstance(dados, dict) else dados
+    eventos = [e for e in eventos if e.get("ph") == "X" and "dur" in e and e.get("cat") != "Trace"]
+    operadores = [e for e in eventos if e.get("cat") == "cpu_op"]
+    blocos = sorted((e for e in eventos if e["name"].startswith(PREFIXO_BLOCO)), key=lambda e: e["ts"])
+    proprio = _tempo_proprio([e for e in eventos if e.get("cat") in ("cpu_op", "user_annotation")])
+
+    por_operador: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+    for evento in operadores:
+        por_operador[evento["name"]][0] += proprio[id(evento)] / 1000.0
+        por_operador[evento["name"]][1] += 1
+
+    # Cada bloco soma os seus forwards (um por lote ou bloco da alta resolução)
+    por_bloco: Dict[Tuple[str, str], List] = {}
+    for bloco in blocos:
+        _, nome, classe = bloco["name"].split(":", 2)
+        acumulado = por_bloco.setdefault((nome, classe), [0.0, defaultdict(float)])
+        acumulado[0] += bloco["dur"] / 1000.0
+        fim = bloco["ts"] + bloco["dur"]
+        for evento in operadores:
+            if evento.get("tid") == bloco.get("tid") and bloco["ts"] <= evento["ts"] < fim:
+                acumulado[1][evento["name"]] += proprio[id(evento)] / 1000.0
+
+    inicio = min((e["ts"] for e in eventos), default=0)
+    fim = max((e["ts"] + e["dur"] for e in eventos), default=0)
+    return {
+        "total_ms": (fim - inicio) / 1000.0,
+        "blocos": [(nome, classe, ms, dict(ops)) for (nome, classe), (ms, ops) in por_bloco.items()],
+        "operadores": {nome: (ms, int(chamadas)) for nome, (ms, chamadas) in por_operador.items()},
+    }
+
+
+def imprimir_resumo_trace(caminho: str, top: int = 10) -> None:
+    resumo = resumir_trace(caminho)
+    total_ms = resumo["total_ms"] or 1.0
+    print(f"Trace: {caminho} ({resumo['total_ms']:.1f} ms)")
+
+    if resumo["blocos"]:
+        soma_blocos = sum(ms for _, _, ms, _ in resumo["blocos"])
+        print(f"\nBlocos RSU ({soma_blocos:.1f} ms, {100.0 * soma_blocos / total_ms:.1f}% do perfil)")
+        print(f"  {'bloco':<10} {'classe':<7} {'ms':>9} {'%':>6}  principais operadores (tempo próprio)")
+        for nome, classe, ms, ops in resumo["blocos"]:
+            principais = sorted(ops.items(), key=lambda item: -item[1])[:3]
+            descricao = ", ".join(f"{op} {op_ms:.1f}" for op, op_ms in principais)
+            print(f"  {nome:<10} {classe:<7} {ms:>9.2f} {100.0 * ms / total_ms:>5.1f}%  {descricao}")
+    else:
+        print("\nSem anotações de blocos RSU (backend torchscript/onnx ou trace de outra origem)")
+
+    print(f"\nOperadores por tempo próprio (top {top})")
+    print(f"  {'operador':<40} {'ms':>9} {'%':>6} {'chamadas':>9}")
+    for nome, (ms, chamadas) in sorted(resumo["operadores"].items(), key=lambda item: -item[1][0])[:top]:
+        print(f"  {nome:<40} {ms:>9.2f} {100.0 * ms / total_ms:>5.1f}% {chamadas:>9}")
+
+
+def imprimir_resumo_python(caminho: str, top: int = 10) -> None:
+    """Funções Python por tempo acumulado (o que o trace do PyTorch não mostra: PIL, NumPy, codificação)."""
+    estatisticas = pstats.Stats(caminho)
+    estatisticas.strip_dirs().sort_stats("cumulative").print_stats(top)
+
+
+# ---------------------------------------------------------------------------
+# Captura fora do servidor
+# ---------------------------------------------------------------------------
+
+def capturar(
+    imagem: Optional[str],
+    backend: str,
+    variante: str,
+    caminho_modelo: Optional[str],
+    caminho_artefato: Optional[str],
+    diretorio: str,
+    alta_resolucao: bool,
+) -> Path:
+    """Perfila um `remover_fundo` completo, após um aquecimento, e retorna o caminho do trace."""
+    from io import BytesIO
+
+    from PIL import Image
+
+    # Executado com `python -m`, este módulo é `__main__`: a sessão precisa ser
+    # a da cópia importada pelo serviço
+    from app.infrastructure.segmentation import perfil
+    from app.infrastructure.segmentation.u2net_service import U2NetService
+
+    if imagem is not None:
+        imagem_bytes = Path(imagem).read_bytes()
+    else:
+        buffer = BytesIO()
+        Image.new("RGB", (1280, 960), (180, 120, 60)).save(buffer, format="JPEG")
+        imagem_bytes = buffer.getvalue()
+
+    servico = U2NetService(
+        backend=backend, variante=variante, caminho_modelo=caminho_modelo, caminho_artefato=caminho_artefato)
+    servico.remover_fundo(imagem_bytes, alta_resolucao=alta_resolucao)
+
+    nome = time.strftime("%Y%m%d-%H%M%S") + "-cli"
+    token = perfil.iniciar_perfil(nome, diretorio)
+    try:
+        if servico.remover_fundo(imagem_bytes, alta_resolucao=alta_resolucao) is None:
+            raise RuntimeError("O pipeline falhou (ver o log)")
+    finally:
+        perfil.encerrar_perfil(token)
+    return Path(diretorio) / (nome + EXTENSAO_TRACE)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Perfis do pipeline de remoção de fundo")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    resumo = subparsers.add_parser("resumo", help="Resume um perfil gravado (.json do PyTorch ou .pstats)")
+    resumo.add_argument("arquivo")
+    resumo.add_argument("--top", type=int, default=10)
+
+    captura = subparsers.add_parser("capturar", help="Perfila uma imagem sem o servidor e resume o trace")
+    captura.add_argument("--imagem", default=None, help="Imagem de entrada; sem ela, usa uma sintética")
+    captura.add_argument("--backend", default="eager", choices=["eager", "torchscript", "onnx", "quantizado"])
+    captura.add_argument("--variante", default="u2net", choices=["u2net", "u2netp"])
+    captura.add_argument("--modelo", default=None, help="Checkpoint .pth")
+    captura.add_argument("--artefato", default=None, help="Artefato exportado (torchscript/onnx/quantizado)")
+    captura.add_argument("--diretorio", default="perfis")
+    captura.add_argument("--alta-resolucao", action="store_true")
+    captura.add_argument("--top", type=int, default=10)
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "resumo":
+        if args.arquivo.endswith(EXTENSAO_PYTHON):
+            imprimir_resumo_python(args.arquivo, args.top)
+        else:
+            imprimir_resumo_trace(args.arquivo, args.top)
+    elif args.comando == "capturar":
+        logging.basicConfig(level=logging.INFO)
+        trace = capturar(args.imagem, args.backend, args.variante, args.modelo, args.artefato,
+                         args.diretorio, args.alta_resolucao)
+        imprimir_resumo_trace(str(trace), args.top)
+
+    return 0
+
+
+__all__ = [
+    "iniciar_perfil",
+    "encerrar_perfil",
+    "perfil_pedido",
+    "perfil_em_andamento",
+    "anotar",
+    "perfilar",
+    "resumir_trace",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
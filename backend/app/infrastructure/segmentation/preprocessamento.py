@@ -0,0 +1,176 @@
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+
+from app.infrastructure.segmentation.modelo import DESVIO_IMAGENET, MEDIA_IMAGENET, TAMANHO_ENTRADA
+
+
+# Redução inteira antes do bilinear (Pillow): a partir de 3 o resultado é
+# praticamente igual ao redimensionamento direto
+REDUCAO_PREVIA = 3.0
+
+# A entrada em letterbox é completada até um múltiplo deste valor: o U²-Net
+# reduz a resolução 5 vezes pela metade (pools com ceil_mode=True)
+MULTIPLO_ENTRADA = 32
+
+
+def dimensoes_entrada(
+    tamanho_original: Tuple[int, int],
+    lado: int = TAMANHO_ENTRADA,
+    letterbox: bool = False,
+) -> Tuple[int, int]:
+    """
+    (largura, altura) da imagem redimensionada para o modelo, sem o preenchimento.
+
+    Esticando, é sempre `lado` x `lado`; em letterbox, o lado maior vira
+    `lado` e o menor segue a proporção original.
+    """
+    if not letterbox:
+        return lado, lado
+    largura, altura = tamanho_original
+    escala = lado / max(largura, altura)
+    return max(1, round(largura * escala)), max(1, round(altura * escala))
+
+
+def _arredondar_multiplo(valor: int) -> int:
+    return -(-valor // MULTIPLO_ENTRADA) * MULTIPLO_ENTRADA
+
+
+class PreProcessador:
+    """
+    Pré-processamento da entrada do modelo montado uma única vez.
+
+    Divide o trabalho em duas etapas:
+
+    - `redimensionar`: PIL -> array uint8 [H, W, 3] no tamanho do modelo,
+      a parte cara, que roda na thread de cada requisição. Imagens grandes
+      são primeiro reduzidas por fatores inteiros (`reducing_gap`), o que
+      evita o filtro bilinear percorrer todos os pixels originais;
+    - `preencher`: escreve os arrays direto no buffer do lote [N, 3, H, W].
+      Como a entrada é uint8, a escala para [0, 1] e a normalização
+      (x / 255 - média) / desvio de cada canal viram uma tabela de 256
+      valores, aplicada com um único `np.take` por canal, já no layout CHW.
+
+    Por padrão a imagem é esticada para um quadrado, ignorando a proporção.
+    Em modo letterbox, o lado maior é reduzido para o tamanho pedido e o
+    lote é completado com zeros (a média ImageNet após a normalização) até
+    um múltiplo de 32: imagens largas passam por menos pixels e sem
+    distorção, e a máscara é recortada de volta para a região da imagem.
+
+    Cada thread tem o seu buffer, alocado na primeira chamada (e ampliado se
+    um lote maior aparecer) e reutilizado daí em diante; com CUDA ele fica em
+    memória fixada (pinned) para permitir cópias assíncronas para a GPU.
+    """
+
+    def __init__(
+        self,
+        max_lote: int = 1,
+        tamanho: int = TAMANHO_ENTRADA,
+        fixar_memoria: bool = False,
+        letterbox: bool = False,
+    ):
+        """
+        Args:
+            max_lote: Capacidade do buffer (maior lote que será preenchido)
+            tamanho: Lado padrão da entrada do modelo (o maior lado, em letterbox)
+            fixar_memoria: Aloca o buffer em memória fixada (apenas com CUDA)
+            letterbox: Mantém a proporção em vez de esticar a imagem
+        """
+        if max_lote < 1:
+            raise ValueError("max_lote deve ser pelo menos 1")
+
+        self.max_lote = max_lote
+        self.tamanho = tamanho
+        self.fixar_memoria = fixar_memoria
+        self.letterbox = letterbox
+
+        # Tabela [3, 256]: valor normalizado de cada intensidade uint8 por canal
+        valores = np.arange(256, dtype=np.float64) / 255.0
+        media = np.array(MEDIA_IMAGENET, dtype=np.float64)[:, None]
+        desvio = np.array(DESVIO_IMAGENET, dtype=np.float64)[:, None]
+        self.tabela = ((valores[None, :] - media) / desvio).astype(np.float32)
+
+        self._local = threading.local()
+
+    def redimensionar(self, imagem: Image.Image, tamanho: Optional[int] = None) -> np.ndarray:
+        """
+        Redimensiona a imagem RGB para o modelo como array uint8 [H, W, 3].
+
+        Args:
+            tamanho: Lado da entrada (ex: 192 ou 256 para prévias); None usa o padrão
+        """
+        if imagem.mode != "RGB":
+            imagem = imagem.convert("RGB")
+        destino = dimensoes_entrada(imagem.size, tamanho or self.tamanho, self.letterbox)
+        if imagem.size != destino:
+            imagem = imagem.resize(destino, Image.BILINEAR, reducing_gap=REDUCAO_PREVIA)
+        return np.asarray(imagem)
+
+    def formato_lote(self, pixels: np.ndarray) -> Tuple[int, int]:
+        """
+        (altura, largura) que o item ocupa no lote (em letterbox, arredondadas
+        para múltiplo de 32).
+
+        Só itens do mesmo formato devem ser agrupados: misturados, o menor
+        paga o forward do maior e a sua máscara passa a depender do
+        preenchimento, diferente da que teria sozinho.
+        """
+        altura, largura = pixels.shape[:2]
+        if self.letterbox:
+            return _arredondar_multiplo(altura), _arredondar_multiplo(largura)
+        return altura, largura
+
+    def preencher(self, itens: Sequence[np.ndarray]) -> torch.Tensor:
+        """
+        Normaliza os arrays de `redimensionar` direto no buffer da thread atual.
+
+        Itens de tamanhos diferentes ficam no canto superior esquerdo de um
+        lote com o maior tamanho, arredondado para múltiplo de 32 em letterbox
+        (o serviço só agrupa itens do mesmo `formato_lote`).
+
+        Returns:
+            Visão [N, 3, H, W] do buffer; válida até a próxima chamada na mesma thread
+        """
+        if len(itens) > self.max_lote:
+            raise ValueError(f"Lote de {len(itens)} itens excede a capacidade {self.max_lote}")
+
+        altura = max(pixels.shape[0] for pixels in itens)
+        largura = max(pixels.shape[1] for pixels in itens)
+        if self.letterbox:
+            altura, largura = _arredondar_multiplo(altura), _arredondar_multiplo(largura)
+
+        lote = self._buffer(len(itens) * 3 * altura * largura)[:len(itens) * 3 * altura * largura]
+        lote = lote.view(len(itens), 3, altura, largura)
+        lote_np = lote.numpy()
+
+        for indice, pixels in enumerate(itens):
+            h, w = pixels.shape[:2]
+            if (h, w) != (altura, largura):
+                lote_np[indice].fill(0.0)
+            for canal in range(3):
+                np.take(self.tabela[canal], pixels[:, :, canal], out=lote_np[indice, canal, :h, :w])
+
+        return lote
+
+    def preparar(self, imagens: List[Image.Image]) -> torch.Tensor:
+        """Redimensiona e normaliza um lote de imagens (atalho para os dois passos)."""
+        return self.preencher([self.redimensionar(imagem) for imagem in imagens])
+
+    def _buffer(self, elementos: int) -> torch.Tensor:
+        """Buffer plano da thread atual com pelo menos `elementos` floats."""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.numel() < elementos:
+            padrao = self.max_lote * 3 * self.tamanho * self.tamanho
+            buffer = torch.empty(
+                max(elementos, padrao),
+                dtype=torch.float32,
+                pin_memory=self.fixar_memoria,
+            )
+            self._local.buffer = buffer
+        return buffer
+
+
+__all__ = ["MULTIPLO_ENTRADA", "dimensoes_entrada", "PreProcessador"]
@@ -0,0 +1,172 @@
+"""
+Quantização estática int8 (pós-treino) do U²-Net para CPU.
+
+Os blocos REBNCONV (conv + BN + ReLU) são fundidos e quantizados para int8
+com observadores calibrados em uma pasta de imagens de exemplo. As saídas
+laterais e a `outconv`, que formam a máscara final, permanecem em fp32.
+O modelo quantizado é salvo como TorchScript e servido pelo backend
+"quantizado" (U2NET_BACKEND=quantizado).
+
+Ao final é impresso um relatório de IoU/MAE das máscaras int8 contra fp32 no
+conjunto de calibração, junto do tempo médio de inferência de cada modelo.
+
+Uso (a partir de backend/):
+    python -m app.infrastructure.segmentation.quantizacao --imagens caminho/para/fotos
+    python -m app.infrastructure.segmentation.quantizacao --imagens fotos --relatorio relatorio.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.ao.quantization import QConfigMapping, get_default_qconfig
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+from app.infrastructure.segmentation.backends import caminho_artefato
+from app.infrastructure.segmentation.modelo import TAMANHO_ENTRADA, carregar_rede, preparar_imagem
+
+
+EXTENSOES_IMAGEM = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+# Camadas que produzem a máscara final ficam em fp32 para preservar a qualidade
+CAMADAS_FP32 = ["side1", "side2", "side3", "side4", "side5", "side6", "outconv"]
+
+
+def carregar_imagens(diretorio: Path, max_imagens: int) -> List[torch.Tensor]:
+    """Lê e pré-processa as imagens de calibração como tensores [1, 3, 320, 320]."""
+    caminhos = sorted(p for p in diretorio.iterdir() if p.suffix.lower() in EXTENSOES_IMAGEM)
+    if not caminhos:
+        raise FileNotFoundError(f"Nenhuma imagem encontrada em {diretorio}")
+
+    return [preparar_imagem(Image.open(p).convert("RGB")) for p in caminhos[:max_imagens]]
+
+
+def quantizar(net: torch.nn.Module, entradas: List[torch.Tensor], motor: str = "x86") -> torch.nn.Module:
+    """
+    Aplica quantização estática int8 via FX: fusão conv+BN+ReLU, calibração e conversão.
+
+    Args:
+        net: Rede fp32 em modo eval
+        entradas: Tensores usados para calibrar os observadores
+        motor: Backend de kernels quantizados ("x86" ou "qnnpack" para ARM)
+    """
+    torch.backends.quantized.engine = motor
+    qconfig_mapping = QConfigMapping().set_global(get_default_qconfig(motor))
+    for nome in CAMADAS_FP32:
+        qconfig_mapping.set_module_name(nome, None)
+
+    exemplo = (torch.randn(1, 3, TAMANHO_ENTRADA, TAMANHO_ENTRADA),)
+    preparado = prepare_fx(net, qconfig_mapping, exemplo)
+
+    with torch.no_grad():
+        for entrada in entradas:
+            preparado(entrada)
+
+    return convert_fx(preparado)
+
+
+def salvar_torchscript(net: torch.nn.Module, destino: Path) -> torch.jit.ScriptModule:
+    """Traça e congela o modelo quantizado para ser carregado sem o código do modelo."""
+    exemplo = torch.randn(1, 3, TAMANHO_ENTRADA, TAMANHO_ENTRADA)
+    with torch.no_grad():
+        congelado = torch.jit.freeze(torch.jit.trace(net, exemplo).eval())
+    congelado.save(str(destino))
+    return congelado
+
+
+def _mascara(net, entrada: torch.Tensor) -> np.ndarray:
+    """Máscara normalizada para [0, 1], como no serviço."""
+    with torch.no_grad():
+        pred = net(entrada)[0, 0]
+    return ((pred - pred.min()) / (pred.max() - pred.min() + 1e-8)).numpy()
+
+
+def comparar(
+    referencia: torch.nn.Module,
+    quantizado: torch.nn.Module,
+    entradas: List[torch.Tensor],
+    limiar: float = 0.5,
+) -> Dict:
+    """
+    Compara as máscaras do modelo quantizado com as do fp32.
+
+    Returns:
+        Relatório com IoU das máscaras binarizadas em `limiar`, MAE das máscaras
+        contínuas e o tempo médio de inferência por imagem de cada modelo
+    """
+    ious, maes = [], []
+    tempo_fp32 = tempo_int8 = 0.0
+
+    for entrada in entradas:
+        inicio = time.perf_counter()
+        esperado = _mascara(referencia, entrada)
+        tempo_fp32 += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        obtido = _mascara(quantizado, entrada)
+        tempo_int8 += time.perf_counter() - inicio
+
+        a, b = esperado >= limiar, obtido >= limiar
+        uniao = np.logical_or(a, b).sum()
+        ious.append(float(np.logical_and(a, b).sum() / uniao) if uniao else 1.0)
+        maes.append(float(np.abs(esperado - obtido).mean()))
+
+    total = len(entradas)
+    return {
+        "imagens": total,
+        "iou_medio": float(np.mean(ious)),
+        "iou_minimo": float(np.min(ious)),
+        "mae_medio": float(np.mean(maes)),
+        "mae_maximo": float(np.max(maes)),
+        "tempo_fp32_ms": 1000.0 * tempo_fp32 / total,
+        "tempo_int8_ms": 1000.0 * tempo_int8 / total,
+    }
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Quantização estática int8 do U²-Net")
+    parser.add_argument("--imagens", required=True, help="Pasta com imagens de calibração")
+    parser.add_argument("--variante", default="u2net", choices=["u2net", "u2netp"],
+                        help="Variante do modelo")
+    parser.add_argument("--modelo", default=None,
+                        help="Checkpoint .pth (padrão: U-2-Net/saved_models/<variante>/<variante>.pth)")
+    parser.add_argument("--saida", default=None,
+                        help="Arquivo TorchScript de saída (padrão: <variante>.int8.torchscript.pt)")
+    parser.add_argument("--max-imagens", type=int, default=100,
+                        help="Número máximo de imagens de calibração")
+    parser.add_argument("--motor", default="x86", choices=["x86", "fbgemm", "qnnpack"],
+                        help="Kernels quantizados da CPU de destino")
+    parser.add_argument("--relatorio", default=None, help="Salva o relatório IoU/MAE em JSON")
+    args = parser.parse_args(argv)
+
+    destino = Path(args.saida) if args.saida else caminho_artefato("quantizado", args.variante, args.modelo)
+
+    net = carregar_rede(args.variante, args.modelo)
+    entradas = carregar_imagens(Path(args.imagens), args.max_imagens)
+    print(f"📐 Calibrando {args.variante} com {len(entradas)} imagens ({args.motor})...")
+
+    quantizado = salvar_torchscript(quantizar(net, entradas, args.motor), destino)
+    print(f"📦 Modelo int8 salvo em {destino}")
+
+    relatorio = comparar(net, quantizado, entradas)
+    relatorio["artefato"] = str(destino)
+
+    print(f"📊 IoU médio {relatorio['iou_medio']:.4f} (mínimo {relatorio['iou_minimo']:.4f})")
+    print(f"📊 MAE médio {relatorio['mae_medio']:.4f} (máximo {relatorio['mae_maximo']:.4f})")
+    print(f"⏱️  Inferência por imagem: fp32 {relatorio['tempo_fp32_ms']:.1f} ms, "
+          f"int8 {relatorio['tempo_int8_ms']:.1f} ms")
+
+    if args.relatorio:
+        Path(args.relatorio).write_text(json.dumps(relatorio, indent=2))
+        print(f"📝 Relatório salvo em {args.relatorio}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+from app.infrastructure.metricas import Histograma
+from app.infrastructure.segmentation.modelo import TAMANHO_ENTRADA
+from app.infrastructure.segmentation.preprocessamento import REDUCAO_PREVIA, PreProcessador
+
+
+# Probabilidades fora desta faixa são consideradas certas (fundo ou objeto)
+FAIXA_INCERTEZA = (0.05, 0.95)
+
+
+def _posicoes(total: int, bloco: int, passo: int) -> List[int]:
+    """Início de cada bloco ao longo de um eixo; o último fica alinhado à borda."""
+    if total <= bloco:
+        return [0]
+    posicoes = list(range(0, total - bloco + 1, passo))
+    if posicoes[-1] != total - bloco:
+        posicoes.append(total - bloco)
+    return posicoes
+
+
+def _rampa(tamanho: int, sobreposicao: int, inicio_livre: bool, fim_livre: bool) -> np.ndarray:
+    """Peso 1D do bloco: sobe ao longo da sobreposição, exceto nas bordas da imagem."""
+    peso = np.ones(tamanho, dtype=np.float32)
+    if sobreposicao <= 0:
+        return peso
+    degrau = np.arange(1, sobreposicao + 1, dtype=np.float32) / (sobreposicao + 1)
+    n = min(sobreposicao, tamanho)
+    if not inicio_livre:
+        peso[:n] = np.minimum(peso[:n], degrau[:n])
+    if not fim_livre:
+        peso[-n:] = np.minimum(peso[-n:], degrau[:n][::-1])
+    return peso
+
+
+def _esticar(mascara: np.ndarray) -> np.ndarray:
+    """Estica a máscara para [0, 1] (a normalização por imagem da passada normal)."""
+    minimo, maximo = float(mascara.min()), float(mascara.max())
+    return (mascara - minimo) / (maximo - minimo + 1e-8)
+
+
+class RefinadorBordas:
+    """
+    Modo de alta resolução: refina as bordas incertas da máscara com blocos sobrepostos.
+
+    A passada completa em 320x320 distorce a proporção e borra as bordas de
+    imagens grandes ou largas. Aqui a imagem é levada a uma resolução de
+    trabalho (lado maior `lado_trabalho`), a máscara grossa é ampliada até ela
+    e apenas os blocos com mais pixels incertos (probabilidade entre 5% e 95%)
+    passam de novo pela rede, em lotes, até `max_blocos`. As predições dos
+    blocos são combinadas com pesos que decaem na sobreposição e substituem a
+    máscara grossa só na faixa incerta, perto das bordas do objeto. Máscara
+    grossa e blocos entram como probabilidades da rede; o resultado é esticado
+    para [0, 1] uma única vez, para não criar degraus nas bordas dos blocos.
+    """
+
+    def __init__(
+        self,
+        preprocessador: PreProcessador,
+        inferir: Callable[[List[np.ndarray]], List[np.ndarray]],
+        tamanho_bloco: int = TAMANHO_ENTRADA,
+        sobreposicao: int = 64,
+        max_blocos: int = 16,
+        lado_trabalho: int = 1280,
+    ):
+        """
+        Args:
+            preprocessador: Pré-processador do serviço (define o maior lote por forward)
+            inferir: Executa a rede em arrays uint8 [320, 320, 3] e retorna as
+                probabilidades [320, 320] sem normalização por imagem
+            tamanho_bloco: Lado do bloco na resolução de trabalho (reduzido para 320 na rede)
+            sobreposicao: Pixels compartilhados entre blocos vizinhos
+            max_blocos: Máximo de blocos refinados por imagem (controla o custo)
+            lado_trabalho: Lado maior da resolução em que os blocos são recortados
+        """
+        if tamanho_bloco < 32:
+            raise ValueError("tamanho_bloco deve ser pelo menos 32")
+        if not 0 <= sobreposicao < tamanho_bloco:
+            raise ValueError("sobreposicao deve estar entre 0 e tamanho_bloco - 1")
+        if max_blocos < 0:
+            raise ValueError("max_blocos não pode ser negativo")
+
+        self.preprocessador = preprocessador
+        self.inferir = inferir
+        self.tamanho_bloco = tamanho_bloco
+        self.sobreposicao = sobreposicao
+        self.max_blocos = max_blocos
+        self.lado_trabalho = lado_trabalho
+        self.hist_blocos = Histograma([0, 1, 2, 4, 8, 16, 32, 64])
+
+    def refinar(self, imagem: Image.Image, mascara: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            imagem: Imagem RGB em resolução cheia
+            mascara: Probabilidades da passada completa, sem normalização por
+                imagem (qualquer tamanho), na mesma escala das dos blocos
+
+        Returns:
+            Máscara [H, W] na resolução de trabalho (ou a grossa, se a imagem
+            não for maior que a entrada do modelo), esticada para [0, 1] só
+            depois da combinação, como a da passada normal
+        """
+        largura, altura = imagem.size
+        escala = min(1.0, self.lado_trabalho / max(largura, altura))
+        largura_t, altura_t = max(1, round(largura * escala)), max(1, round(altura * escala))
+        if max(largura_t, altura_t) <= TAMANHO_ENTRADA or self.max_blocos == 0:
+            self.hist_blocos.observar(0)
+            return _esticar(mascara)
+
+        trabalho = imagem
+        if (largura_t, altura_t) != imagem.size:
+            trabalho = imagem.resize((largura_t, altura_t), Image.BILINEAR, reducing_gap=REDUCAO_PREVIA)
+        pixels = np.asarray(trabalho)
+
+        grossa = F.interpolate(
+            torch.from_numpy(np.ascontiguousarray(mascara, dtype=np.float32))[None, None],
+            size=(altura_t, largura_t), mode="bilinear", align_corners=False,
+        )[0, 0]
+        minimo, maximo = FAIXA_INCERTEZA
+        incerta = (grossa > minimo) & (grossa < maximo)
+
+        blocos = self._selecionar_blocos(incerta.numpy(), largura_t, altura_t)
+        self.hist_blocos.observar(len(blocos))
+        if not blocos:
+            return _esticar(grossa.numpy())
+
+        # Um forward por formato de entrada (em letterbox, blocos da borda
+        # podem ter outro), em lotes de até `max_lote`
+        itens = [self._entrada_bloco(pixels[y:y + h, x:x + w]) for x, y, w, h in blocos]
+        grupos: Dict[Tuple[int, int], List[int]] = {}
+        for indice, item in enumerate(itens):
+            grupos.setdefault(self.preprocessador.formato_lote(item), []).append(indice)
+
+        acumulado = np.zeros((altura_t, largura_t), dtype=np.float32)
+        peso = np.zeros((altura_t, largura_t), dtype=np.float32)
+        for indices in grupos.values():
+            for inicio in range(0, len(indices), self.preprocessador.max_lote):
+                grupo = indices[inicio:inicio + self.preprocessador.max_lote]
+                for indice, pred in zip(grupo, self.inferir([itens[i] for i in grupo])):
+                    x, y, w, h = blocos[indice]
+                    janela = self._janela(x, y, w, h, largura_t, altura_t)
+                    acumulado[y:y + h, x:x + w] += self._ajustar(pred, w, h) * janela
+                    peso[y:y + h, x:x + w] += janela
+
+        # Faixa em volta dos pixels incertos em que os blocos substituem a máscara grossa
+        raio = max(1, self.sobreposicao // 4)
+        faixa = F.max_pool2d(
+            incerta.float()[None, None], kernel_size=2 * raio + 1, stride=1, padding=raio)[0, 0].numpy()
+
+        grossa = grossa.numpy()
+        refinada = np.divide(acumulado, peso, out=grossa.copy(), where=peso > 0)
+        alfa = np.minimum(peso, 1.0) * faixa
+        return _esticar(grossa + (refinada - grossa) * alfa)
+
+    def _selecionar_blocos(self, incerta: np.ndarray, largura: int, altura: int) -> List[Tuple[int, int, int, int]]:
+        """Blocos (x, y, w, h) com pixels incertos, do mais incerto ao menos, até `max_blocos`."""
+        w, h = min(self.tamanho_bloco, largura), min(self.tamanho_bloco, altura)
+        passo = self.tamanho_bloco - self.sobreposicao
+
+        # Imagem integral: soma de qualquer retângulo em O(1)
+        integral = np.zeros((altura + 1, largura + 1), dtype=np.int64)
+        integral[1:, 1:] = incerta.cumsum(0).cumsum(1)
+
+        candidatos = []
+        for y in _posicoes(altura, h, passo):
+            for x in _posicoes(largura, w, passo):
+                contagem = integral[y + h, x + w] - integral[y, x + w] - integral[y + h, x] + integral[y, x]
+                if contagem > 0:
+                    candidatos.append((int(contagem), x, y))
+
+        candidatos.sort(key=lambda c: -c[0])
+        return [(x, y, w, h) for _, x, y in candidatos[:self.max_blocos]]
+
+    def _entrada_bloco(self, recorte: np.ndarray) -> np.ndarray:
+        """Recorte uint8 [h, w, 3] no tamanho de entrada do modelo."""
+        if recorte.shape[:2] == (self.preprocessador.tamanho, self.preprocessador.tamanho):
+            return np.ascontiguousarray(recorte)
+        return self.preprocessador.redimensionar(Image.fromarray(recorte))
+
+    @staticmethod
+    def _ajustar(pred: np.ndarray, largura: int, altura: int) -> np.ndarray:
+        """Predição [320, 320] de volta ao tamanho do recorte."""
+        if pred.shape == (altura, largura):
+            return pred
+        tensor = torch.from_numpy(np.ascontiguousarray(pred, dtype=np.float32))[None, None]
+        return F.interpolate(tensor, size=(altura, largura), mode="bilinear", align_corners=False)[0, 0].numpy()
+
+    def _janela(self, x: int, y: int, w: int, h: int, largura: int, altura: int) -> np.ndarray:
+        colunas = _rampa(w, self.sobreposicao, x == 0, x + w >= largura)
+        linhas = _rampa(h, self.sobreposicao, y == 0, y + h >= altura)
+        return linhas[:, None] * colunas[None, :]
+
+    def estatisticas(self) -> Dict:
+        """Configuração e histograma de blocos refinados por imagem."""
+        return {
+            "tamanho_bloco": self.tamanho_bloco,
+            "sobreposicao": self.sobreposicao,
+            "max_blocos": self.max_blocos,
+            "lado_trabalho": self.lado_trabalho,
+            "blocos_por_imagem": self.hist_blocos.resumo(),
+        }
+
+
+__all__ = ["RefinadorBordas"]
@@ -1,141 +1,493 @@
-import sys
-from pathlib import Path
-from typing import Optional, Union
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 from io import BytesIO
 import numpy as np
 from PIL import Image
 import torch
-from torchvision import transforms
 
+from app.domain.excecoes import ImagemInvalida
+from app.infrastructure.logs import registrar, registrar_etapa
+from app.infrastructure.metricas import Histograma
+from app.infrastructure.segmentation.agendador_lotes import AgendadorLotes
+from app.infrastructure.segmentation.backends import criar_backend
+from app.infrastructure.segmentation.codificacao import CodificadorSaida
+from app.infrastructure.segmentation.composicao import (
+    FILTROS_MASCARA,
+    aplicar_mascara,
+    redimensionar_mascara,
+)
+from app.infrastructure.segmentation.modelo import TAMANHO_ENTRADA, decodificar_imagem
+from app.infrastructure.segmentation.perfil import anotar, perfil_em_andamento, perfilar
+from app.infrastructure.segmentation.preprocessamento import PreProcessador, dimensoes_entrada
+from app.infrastructure.segmentation.refinamento import RefinadorBordas
 
-class U2NetService:
-    """Serviço de segmentação usando U2Net."""
 
-    def __init__(self):
-        """Inicializa o serviço e carrega o modelo U2Net."""
-        # Adiciona o diretório U-2-Net ao sys.path
-        project_root = Path(__file__).parent.parent.parent.parent.parent
-        u2net_path = project_root / "U-2-Net"
+logger = logging.getLogger(__name__)
+
+# Etapas do pipeline medidas separadamente (ver `U2NetService.hist_etapas_ms`)
+ETAPAS = ("decodificacao", "preprocessamento", "inferencia", "refinamento", "mascara", "composicao", "codificacao")
+
 
-        if str(u2net_path) not in sys.path:
-            sys.path.insert(0, str(u2net_path))
+def _perfilado(metodo):
+    """Perfila o método quando a requisição pediu um perfil (ver `perfil.perfilar`)."""
+    @functools.wraps(metodo)
+    def envolvido(self, *args, **kwargs):
+        with perfilar(getattr(self.backend, "net", None)) as perfil:
+            if perfil is not None:
+                registrar(perfil=perfil)
+            return metodo(self, *args, **kwargs)
+    return envolvido
 
-        # Adiciona o diretório model também
-        model_dir = u2net_path / "model"
-        if str(model_dir) not in sys.path:
-            sys.path.insert(0, str(model_dir))
 
-        # Agora importa o modelo
-        from u2net import U2NET
+class U2NetService:
+    """Serviço de segmentação usando U2Net."""
+
+    def __init__(
+        self,
+        max_lote: int = 1,
+        janela_lote_ms: float = 10.0,
+        max_lote_agendador: Optional[int] = None,
+        backend: str = "eager",
+        variante: str = "u2net",
+        caminho_modelo: Optional[str] = None,
+        caminho_artefato: Optional[str] = None,
+        filtro_mascara: str = "bilinear",
+        nivel_png: int = 1,
+        qualidade_webp: int = 80,
+        alta_res_bloco: int = TAMANHO_ENTRADA,
+        alta_res_sobreposicao: int = 64,
+        alta_res_max_blocos: int = 16,
+        alta_res_lado: int = 1280,
+        entrada_letterbox: bool = False,
+        tamanho_entrada: int = TAMANHO_ENTRADA,
+    ):
+        """
+        Inicializa o serviço e carrega o modelo U2Net.
 
+        Args:
+            max_lote: Tamanho máximo do lote de inferência; acima de 1 ativa o
+                agendador que agrupa requisições simultâneas em um único forward
+            janela_lote_ms: Tempo que o agendador aguarda por novas requisições
+            max_lote_agendador: Requisições reunidas pelo agendador (padrão:
+                `max_lote`); 1 o desativa e mantém `max_lote` para os lotes de
+                uma mesma requisição (endpoint de lote e alta resolução)
+            backend: Backend de execução ("eager", "torchscript", "onnx" ou "quantizado")
+            variante: "u2net" (176 MB) ou "u2netp" (4.7 MB)
+            caminho_modelo: Checkpoint `.pth` (padrão: U-2-Net/saved_models/<variante>/<variante>.pth)
+            caminho_artefato: Artefato exportado para torchscript/onnx (padrão: ao lado do checkpoint)
+            filtro_mascara: Filtro usado para ampliar a máscara (bilinear, lanczos, tensor...)
+            nivel_png: compress_level padrão do PNG de saída (0-9)
+            qualidade_webp: Qualidade padrão do WebP de saída com perdas (0-100)
+            alta_res_bloco: Lado dos blocos do modo de alta resolução
+            alta_res_sobreposicao: Sobreposição entre blocos vizinhos, em pixels
+            alta_res_max_blocos: Máximo de blocos refinados por imagem
+            alta_res_lado: Lado maior da resolução em que os blocos são recortados
+            entrada_letterbox: Mantém a proporção da imagem na entrada do modelo
+                (lado maior = `tamanho_entrada`, completada até múltiplo de 32)
+            tamanho_entrada: Lado padrão da entrada do modelo
+        """
         self.device = torch.device(
             "cuda" if torch.cuda.is_available() else "cpu")
-        print(f"🔧 U2Net usando: {self.device}")
+        self.variante = variante
+        if filtro_mascara not in FILTROS_MASCARA:
+            raise ValueError(f"Filtro de máscara inválido: {filtro_mascara}")
+        self.filtro_mascara = filtro_mascara
+        logger.info("U2Net (%s) usando %s (backend %s)", variante, self.device, backend)
 
-        # Carrega o modelo
-        model_path = project_root / "U-2-Net" / "saved_models" / "u2net" / "u2net.pth"
+        try:
+            self.backend = criar_backend(
+                backend, variante, caminho_modelo, caminho_artefato, self.device)
+            logger.info("Modelo U2Net (%s) carregado", variante)
+        except Exception:
+            logger.exception("Erro ao carregar modelo U2Net (%s)", variante)
+            raise
 
-        if not model_path.exists():
-            model_path = Path(__file__).parent.parent.parent.parent.parent / \
-            "U-2-Net" / "saved_models" / "u2net" / "u2net.pth"
+        self.hist_latencia_ms = Histograma([50, 100, 250, 500, 1000, 2500, 5000, 10000])
+        self.hist_inferencia_ms = Histograma([10, 25, 50, 100, 250, 500, 1000, 2500, 5000])
+        # Por requisição; a inferência inclui a espera na janela do agendador
+        self.hist_etapas_ms = {
+            etapa: Histograma([1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000])
+            for etapa in ETAPAS
+        }
+        self.codificador = CodificadorSaida(nivel_png=nivel_png, qualidade_webp=qualidade_webp)
+
+        # Tabelas de normalização e buffer do lote montados uma única vez
+        self.preprocessador = PreProcessador(
+            max_lote=max(1, max_lote),
+            tamanho=tamanho_entrada,
+            fixar_memoria=self.device.type == "cuda",
+            letterbox=entrada_letterbox,
+        )
+
+        # Blocos do modo de alta resolução vão direto à rede, em lotes, sem normalização por imagem
+        self.refinador = RefinadorBordas(
+            self.preprocessador,
+            lambda itens: self._inferir_itens(itens, normalizar=False),
+            tamanho_bloco=alta_res_bloco,
+            sobreposicao=alta_res_sobreposicao,
+            max_blocos=alta_res_max_blocos,
+            lado_trabalho=alta_res_lado,
+        )
+
+        self.agendador: Optional[AgendadorLotes] = None
+        lote_agendador = min(max_lote, max_lote_agendador or max_lote)
+        if lote_agendador > 1:
+            self.agendador = AgendadorLotes(
+                self._inferir_itens, max_lote=lote_agendador, janela_ms=janela_lote_ms,
+                chave=self.preprocessador.formato_lote)
+
+        self._lock_aquecimento = threading.Lock()
+        self._aquecido = False
+
+    def aquecer(self, tamanhos: Sequence[int], lotes: Sequence[int], repeticoes: int = 1) -> float:
+        """
+        Executa forwards de teste em cada lado de entrada e tamanho de lote.
 
-        # Fallback absoluto
-        if not model_path.exists():
-            model_path = Path(
-            "/opt/render/project/src/U-2-Net/saved_models/u2net/u2net.pth")
+        A primeira execução de cada formato de tensor é bem mais lenta que as
+        seguintes (criação das primitivas do oneDNN, crescimento do alocador,
+        equipe de threads do OpenMP da thread que executa). Com o agendador,
+        os lotes passam por ele, na mesma thread das requisições, e só a
+        primeira chamada trabalha; sem ele, o forward roda na thread que chama,
+        então o executor chama este método em cada thread do pool.
 
-        if not model_path.exists():
-            raise FileNotFoundError(f"Modelo não encontrado: {model_path}")
+        Em letterbox, aquece o quadrado e as proporções 4:3 e 3:4; outras
+        proporções ainda pagam a primeira execução.
 
+        Returns:
+            Duração do aquecimento em segundos
+        """
+        with self._lock_aquecimento:
+            if self.agendador is not None and self._aquecido:
+                return 0.0
+            self._aquecido = True
+
+        inicio = time.perf_counter()
+        proporcoes = [(1, 1), (4, 3), (3, 4)] if self.preprocessador.letterbox else [(1, 1)]
+        lotes = sorted({min(max(1, lote), self.preprocessador.max_lote) for lote in lotes})
+        forwards = 0
+
+        for lado in tamanhos:
+            for largura, altura in proporcoes:
+                imagem = Image.new("RGB", (lado * largura, lado * altura), (128, 128, 128))
+                pixels = self.preprocessador.redimensionar(imagem, lado)
+                for lote in lotes:
+                    for _ in range(repeticoes):
+                        if self.agendador is not None:
+                            futuros = [self.agendador.submeter(pixels) for _ in range(lote)]
+                            for futuro in futuros:
+                                futuro.result()
+                        else:
+                            self._inferir_itens([pixels] * lote)
+                        forwards += 1
+
+        # As observações do aquecimento distorceriam os histogramas
+        self.hist_inferencia_ms.zerar()
+        if self.agendador is not None:
+            self.agendador.hist_tamanho_lote.zerar()
+            self.agendador.hist_espera_ms.zerar()
+
+        duracao = time.perf_counter() - inicio
+        logger.info("Aquecimento do %s: %d forward(s) em %.1fs", self.variante, forwards, duracao)
+        return duracao
+
+    @contextmanager
+    def _medir(self, etapa: str) -> Iterator[None]:
+        """Mede a etapa no histograma do serviço e na linha de log da requisição."""
+        inicio = time.perf_counter()
         try:
-            self.net = U2NET(3, 1)
-            self.net.load_state_dict(torch.load(
-                model_path, map_location=self.device))
-            self.net.to(self.device)
-            self.net.eval()
-            print(f"✅ Modelo U2Net carregado com sucesso!")
-        except Exception as e:
-            print(f"❌ Erro ao carregar modelo U2Net: {e}")
-            raise
-
-    def remover_fundo(self, imagem_bytes: Union[bytes, BytesIO], formato_saida: str = "PNG") -> Optional[BytesIO]:
+            with anotar(etapa):
+                yield
+        finally:
+            duracao_ms = (time.perf_counter() - inicio) * 1000.0
+            self.hist_etapas_ms[etapa].observar(duracao_ms)
+            registrar_etapa(etapa, duracao_ms)
+
+    @_perfilado
+    def remover_fundo(
+        self,
+        imagem_bytes: Union[bytes, BytesIO],
+        formato_saida: str = "PNG",
+        nivel: Optional[int] = None,
+        alta_resolucao: bool = False,
+        tamanho_entrada: Optional[int] = None
+    ) -> Optional[BytesIO]:
         """
         Remove o fundo de uma imagem processando em memória.
 
         Args:
             imagem_bytes: Bytes da imagem de entrada ou objeto BytesIO
-            formato_saida: Formato da imagem de saída (PNG, JPEG, etc.)
+            formato_saida: png, webp, webp_sem_perda ou rgba (ver `codificacao.FORMATOS_SAIDA`)
+            nivel: Compressão/qualidade do formato; None usa o padrão configurado
+            alta_resolucao: Refina as bordas incertas com blocos sobrepostos (ver `RefinadorBordas`)
+            tamanho_entrada: Lado da entrada do modelo (ex: 192 para prévias); None usa o padrão
 
         Returns:
             BytesIO contendo a imagem processada com fundo removido, ou None se houver erro
+
+        Raises:
+            ImagemInvalida: se os pixels da imagem estiverem truncados ou corrompidos
         """
+        inicio = time.perf_counter()
         try:
-            # Converte bytes para PIL Image
-            if isinstance(imagem_bytes, bytes):
-                imagem_bytes = BytesIO(imagem_bytes)
+            # A composição precisa da imagem em resolução cheia
+            with self._medir("decodificacao"):
+                imagem_original, tamanho_original = decodificar_imagem(imagem_bytes)
 
-            imagem_original = Image.open(imagem_bytes).convert("RGB")
-            tamanho_original = imagem_original.size
+            registrar(variante=self.variante, largura=tamanho_original[0], altura=tamanho_original[1])
 
-            print(
-                f"📸 Processando imagem {tamanho_original[0]}x{tamanho_original[1]}...")
+            # Prepara a imagem e executa a inferência; no refinamento, a máscara
+            # grossa só é normalizada depois de combinada com os blocos
+            mascara = self._inferir_mascara(imagem_original, tamanho_entrada, normalizar=not alta_resolucao)
+            if alta_resolucao:
+                with self._medir("refinamento"):
+                    mascara = self.refinador.refinar(imagem_original, mascara)
 
-            # Prepara a imagem para o modelo
-            imagem_tensor = self._preparar_imagem(imagem_original)
+            # Amplia a máscara para o tamanho original
+            with self._medir("mascara"):
+                mascara_img = redimensionar_mascara(
+                    mascara, tamanho_original, self.filtro_mascara)
 
-            # Executa a inferência
-            with torch.no_grad():
-                imagem_tensor = imagem_tensor.to(self.device)
-                d1, d2, d3, d4, d5, d6, d7 = self.net(imagem_tensor)
+            # Aplica a máscara na imagem original
+            with self._medir("composicao"):
+                imagem_resultado = self._aplicar_mascara(
+                    imagem_original, mascara_img)
 
-                # Normaliza a predição
-                pred = d1[:, 0, :, :]
-                pred = self._normalizar_pred(pred)
+            with self._medir("codificacao"):
+                output_buffer = self.codificador.codificar(imagem_resultado, formato_saida, nivel)
 
-                # Converte para numpy
-                mascara = pred.squeeze().cpu().data.numpy()
+            self.hist_latencia_ms.observar((time.perf_counter() - inicio) * 1000.0)
 
-            # Cria a máscara em PIL Image
-            mascara_img = Image.fromarray(
-                (mascara * 255).astype(np.uint8)).convert('L')
-            mascara_img = mascara_img.resize(tamanho_original, Image.LANCZOS)
+            # getbuffer não copia o conteúdo, ao contrário de getvalue
+            registrar(bytes_saida=output_buffer.getbuffer().nbytes)
+            return output_buffer
 
-            # Aplica a máscara na imagem original
-            imagem_resultado = self._aplicar_mascara(
-                imagem_original, mascara_img)
+        except ImagemInvalida:
+            raise
+        except Exception:
+            logger.exception("Erro ao processar imagem")
+            return None
 
-            # Converte para BytesIO
-            output_buffer = BytesIO()
-            imagem_resultado.save(output_buffer, format=formato_saida)
-            output_buffer.seek(0)
+    @_perfilado
+    def remover_fundo_lote(
+        self,
+        imagens: List[Union[bytes, BytesIO]],
+        formato_saida: str = "PNG",
+        nivel: Optional[int] = None
+    ) -> List[Optional[BytesIO]]:
+        """
+        Remove o fundo de várias imagens, agrupando-as em forwards de até
+        `max_lote` imagens.
 
-            print(
-                f"✅ Processamento concluído! Tamanho: {len(output_buffer.getvalue())} bytes")
+        Args:
+            imagens: Bytes de cada imagem de entrada
+            formato_saida: Formato das imagens de saída (png, webp, webp_sem_perda ou rgba)
+            nivel: Compressão/qualidade do formato; None usa o padrão configurado
 
+        Returns:
+            Um BytesIO por imagem, na mesma ordem; None nas que falharem
+        """
+        inicio = time.perf_counter()
+        resultados: List[Optional[BytesIO]] = [None] * len(imagens)
+
+        decodificadas = {}
+        for indice, imagem_bytes in enumerate(imagens):
+            try:
+                with self._medir("decodificacao"):
+                    decodificadas[indice] = decodificar_imagem(imagem_bytes)
+            except Exception as e:
+                logger.warning("Erro ao decodificar imagem %d do lote: %s", indice, e)
+
+        indices = list(decodificadas)
+        for posicao in range(0, len(indices), self.preprocessador.max_lote):
+            bloco = indices[posicao:posicao + self.preprocessador.max_lote]
+            try:
+                # Pré-processamento e inferência medidos por bloco; as demais etapas, por imagem
+                with self._medir("preprocessamento"):
+                    itens = [self.preprocessador.redimensionar(decodificadas[i][0]) for i in bloco]
+                with self._medir("inferencia"):
+                    mascaras = self._inferir_por_formato(itens)
+
+                for indice, mascara in zip(bloco, mascaras):
+                    imagem_original, tamanho_original = decodificadas.pop(indice)
+                    with self._medir("mascara"):
+                        mascara_img = redimensionar_mascara(mascara, tamanho_original, self.filtro_mascara)
+                    with self._medir("composicao"):
+                        imagem_resultado = self._aplicar_mascara(imagem_original, mascara_img)
+
+                    with self._medir("codificacao"):
+                        resultados[indice] = self.codificador.codificar(imagem_resultado, formato_saida, nivel)
+
+            except Exception:
+                logger.exception("Erro ao processar bloco do lote")
+
+        processadas = sum(1 for resultado in resultados if resultado is not None)
+        if processadas:
+            por_imagem = (time.perf_counter() - inicio) * 1000.0 / processadas
+            for _ in range(processadas):
+                self.hist_latencia_ms.observar(por_imagem)
+
+        registrar(variante=self.variante)
+        logger.debug("Lote concluído: %d/%d imagem(ns)", processadas, len(imagens))
+        return resultados
+
+    @_perfilado
+    def gerar_mascara(
+        self,
+        imagem_bytes: Union[bytes, BytesIO],
+        tamanho: Optional[Tuple[int, int]] = None,
+        formato: str = "png",
+        tamanho_entrada: Optional[int] = None
+    ) -> Optional[BytesIO]:
+        """
+        Gera apenas a máscara alfa, sem compor nem codificar a imagem RGBA.
+
+        Args:
+            imagem_bytes: Bytes da imagem de entrada ou objeto BytesIO
+            tamanho: (largura, altura) da máscara; None mantém a resolução do modelo
+                (ver `preprocessamento.dimensoes_entrada`)
+            formato: "png" (PNG em escala de cinza) ou "bruto" (uint8, uma linha após a outra)
+            tamanho_entrada: Lado da entrada do modelo; None usa o padrão
+
+        Returns:
+            BytesIO com a máscara codificada, ou None se houver erro
+
+        Raises:
+            ImagemInvalida: se os pixels da imagem estiverem truncados ou corrompidos
+        """
+        inicio = time.perf_counter()
+        try:
+            # A máscara vem da entrada do modelo: basta decodificar uma cópia reduzida
+            lado = tamanho_entrada or self.preprocessador.tamanho
+            with self._medir("decodificacao"):
+                imagem_reduzida, tamanho_original = decodificar_imagem(imagem_bytes, reduzir_para=lado)
+            registrar(variante=self.variante, largura=tamanho_original[0], altura=tamanho_original[1])
+            mascara = self._inferir_mascara(imagem_reduzida, lado)
+
+            # Calculado a partir do tamanho original, como no cabeçalho da resposta
+            tamanho = tamanho or dimensoes_entrada(tamanho_original, lado, self.preprocessador.letterbox)
+            with self._medir("mascara"):
+                mascara_img = redimensionar_mascara(mascara, tamanho, self.filtro_mascara)
+
+            with self._medir("codificacao"):
+                output_buffer = BytesIO()
+                if formato == "bruto":
+                    output_buffer.write(mascara_img.tobytes())
+                else:
+                    mascara_img.save(output_buffer, format="PNG")
+                output_buffer.seek(0)
+
+            self.hist_latencia_ms.observar((time.perf_counter() - inicio) * 1000.0)
             return output_buffer
 
-        except Exception as e:
-            print(f"❌ Erro ao processar imagem: {e}")
-            import traceback
-            traceback.print_exc()
+        except ImagemInvalida:
+            raise
+        except Exception:
+            logger.exception("Erro ao gerar máscara")
             return None
 
-    def _preparar_imagem(self, imagem: Image.Image) -> torch.Tensor:
-        """Prepara a imagem para inferência no modelo."""
-        transform = transforms.Compose([
-            transforms.Resize((320, 320)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[
-                                 0.229, 0.224, 0.225])
-        ])
+    def _inferir_mascara(
+        self,
+        imagem: Image.Image,
+        tamanho_entrada: Optional[int] = None,
+        normalizar: bool = True
+    ) -> np.ndarray:
+        """
+        Redimensiona a imagem e executa a inferência, agrupada com outras
+        requisições se houver agendador.
+
+        Args:
+            normalizar: Estica a máscara para [0, 1]; sem isso, retorna as
+                probabilidades da rede (o agendador só entrega máscaras normalizadas)
+
+        Returns:
+            Máscara no tamanho da entrada do modelo (320x320 por padrão; em
+            letterbox, sem o preenchimento)
+        """
+        with self._medir("preprocessamento"):
+            pixels = self.preprocessador.redimensionar(imagem, tamanho_entrada)
+
+        # Perfilada, a requisição não entra no lote: o perfilador só vê a thread atual
+        with self._medir("inferencia"):
+            if self.agendador is not None and normalizar and not perfil_em_andamento():
+                return self.agendador.executar(pixels)
+            return self._inferir_itens([pixels], normalizar)[0]
+
+    def inferir_lote(self, lote: torch.Tensor, normalizar: bool = True) -> np.ndarray:
+        """
+        Executa um único forward do modelo para um lote de imagens.
+
+        Args:
+            lote: Tensor [N, 3, H, W] já normalizado (320x320 por padrão)
+            normalizar: Estica cada máscara para [0, 1]; sem isso, retorna as
+                probabilidades da rede (usado nos blocos, que podem ser só fundo)
+
+        Returns:
+            Array [N, H, W] com a máscara de cada imagem
+        """
+        inicio = time.perf_counter()
+        with torch.no_grad():
+            lote = lote.to(self.device, non_blocking=True)
+            d0 = self.backend(lote)
+            self.hist_inferencia_ms.observar((time.perf_counter() - inicio) * 1000.0)
+
+            # Normaliza a predição de cada imagem do lote individualmente
+            pred = d0[:, 0, :, :]
+            if normalizar:
+                pred = self._normalizar_pred(pred)
 
-        tensor = transform(imagem).unsqueeze(0)
-        return tensor
+            return pred.cpu().numpy()
+
+    def _inferir_itens(self, itens: List[np.ndarray], normalizar: bool = True) -> List[np.ndarray]:
+        """
+        Normaliza os arrays uint8 [H, W, 3] direto no buffer do lote e executa o forward.
+
+        Se os itens tiverem tamanhos diferentes ou houver preenchimento
+        (letterbox), cada máscara é recortada para a região do seu item antes
+        da normalização, para que o preenchimento não altere o mínimo e o máximo.
+        """
+        lote = self.preprocessador.preencher(itens)
+        altura, largura = lote.shape[2:]
+        if all(pixels.shape[:2] == (altura, largura) for pixels in itens):
+            return list(self.inferir_lote(lote, normalizar))
+
+        mascaras = self.inferir_lote(lote, normalizar=False)
+        recortes = [mascara[:pixels.shape[0], :pixels.shape[1]] for mascara, pixels in zip(mascaras, itens)]
+        if normalizar:
+            recortes = [(r - r.min()) / (r.max() - r.min() + 1e-8) for r in recortes]
+        return recortes
+
+    def _inferir_por_formato(self, itens: List[np.ndarray]) -> List[np.ndarray]:
+        """`_inferir_itens` com um forward por formato de entrada (ver `PreProcessador.formato_lote`)."""
+        grupos: Dict[Tuple[int, int], List[int]] = {}
+        for indice, pixels in enumerate(itens):
+            grupos.setdefault(self.preprocessador.formato_lote(pixels), []).append(indice)
+
+        mascaras: List[Optional[np.ndarray]] = [None] * len(itens)
+        for indices in grupos.values():
+            for indice, mascara in zip(indices, self._inferir_itens([itens[i] for i in indices])):
+                mascaras[indice] = mascara
+        return mascaras
+
+    def estatisticas(self) -> Dict:
+        """Latência do pipeline, de cada etapa, do forward e da codificação por formato, e estatísticas do agendador de lotes, se ativo."""
+        return {
+            "variante": self.variante,
+            "latencia_ms": self.hist_latencia_ms.resumo(),
+            "etapas_ms": {etapa: histograma.resumo() for etapa, histograma in self.hist_etapas_ms.items()},
+            "inferencia_ms": self.hist_inferencia_ms.resumo(),
+            "codificacao_ms": self.codificador.estatisticas(),
+            "alta_resolucao": self.refinador.estatisticas(),
+            "lote": self.agendador.estatisticas() if self.agendador is not None else None
+        }
 
     def _normalizar_pred(self, pred: torch.Tensor) -> torch.Tensor:
-        """Normaliza a predição do modelo."""
-        ma = torch.max(pred)
-        mi = torch.min(pred)
+        """Normaliza a predição do modelo para [0, 1], por imagem do lote."""
+        ma = torch.amax(pred, dim=(1, 2), keepdim=True)
+        mi = torch.amin(pred, dim=(1, 2), keepdim=True)
         return (pred - mi) / (ma - mi + 1e-8)
 
     def _aplicar_mascara(self, imagem_original: Image.Image, mascara: Image.Image) -> Image.Image:
@@ -143,27 +495,13 @@ class U2NetService:
         Aplica a máscara na imagem original para remover o fundo.
 
         Args:
-            imagem_original: Imagem original em RGB
+            imagem_original: Imagem original em RGB (convertida para RGBA no próprio objeto)
             mascara: Máscara em escala de cinza (L)
 
         Returns:
             Imagem com fundo removido (RGBA)
         """
-        # Converte para RGBA
-        if imagem_original.mode != 'RGBA':
-            imagem_original = imagem_original.convert('RGBA')
-
-        # Converte para arrays numpy
-        img_array = np.array(imagem_original)
-        mascara_array = np.array(mascara)
-
-        # Aplica a máscara no canal alfa
-        img_array[:, :, 3] = mascara_array
-
-        # Cria a imagem final
-        imagem_resultado = Image.fromarray(img_array, 'RGBA')
-
-        return imagem_resultado
+        return aplicar_mascara(imagem_original, mascara)
 
 
 __all__ = ["U2NetService"]
@@ -0,0 +1,121 @@
+"""
+Servidor com vários workers que compartilham o modelo carregado no processo pai.
+
+O processo pai importa a aplicação, carrega os pesos
+(`ExecutorInferencia.carregar`), abre o socket e cria os workers com `fork`. Os tensores dos pesos ficam em páginas que nenhum
+worker escreve, então continuam compartilhadas (copy-on-write) e a memória do
+modelo é paga uma única vez, independentemente do número de workers.
+"""
+import logging
+import os
+import signal
+from typing import Dict, List, Optional, Set
+
+import torch
+
+from app.infrastructure.cpu import configurar_threads, fixar_afinidade
+from app.infrastructure.logs import encerrar_logs
+
+
+logger = logging.getLogger(__name__)
+
+
+def preparar_processo_pai() -> None:
+    """
+    Deve ser chamada antes de carregar o modelo no processo pai.
+
+    Com uma única thread, o PyTorch não inicia o pool do OpenMP durante o
+    carregamento; um pool já iniciado no pai não sobrevive ao fork e pode
+    travar os workers.
+    """
+    torch.set_num_threads(1)
+
+
+def executar_prefork(
+    aplicacao: str,
+    host: str,
+    porta: int,
+    threads_intra_op: List[int],
+    threads_inter_op: int = 0,
+    afinidade: Optional[List[Optional[Set[int]]]] = None,
+) -> None:
+    """
+    Serve `aplicacao` com um processo por item de `threads_intra_op`, criados
+    por fork a partir deste.
+
+    Workers que terminam inesperadamente são recriados a partir do pai, sem
+    recarregar o modelo. SIGTERM/SIGINT encerram todos os workers.
+
+    Args:
+        aplicacao: Aplicação ASGI no formato "modulo:atributo", já importada
+        host: Endereço de escuta
+        porta: Porta de escuta
+        threads_intra_op: Threads intra-op do PyTorch de cada worker
+        threads_inter_op: Threads inter-op de cada worker (0 = padrão do PyTorch)
+        afinidade: Núcleos de cada worker (None = sem afinidade)
+    """
+    import uvicorn
+
+    if not hasattr(os, "fork"):
+        raise RuntimeError("Workers pré-carregados exigem fork (indisponível nesta plataforma)")
+
+    # A linha JSON por requisição (MedidorHttp) substitui o log de acesso do uvicorn
+    configuracao = uvicorn.Config(aplicacao, host=host, port=porta, reload=False, workers=1, access_log=False)
+    configuracao.load()
+    socket_servidor = configuracao.bind_socket()
+
+    workers = len(threads_intra_op)
+    afinidade = afinidade or [None] * workers
+    filhos: Dict[int, int] = {}
+    estado = {"encerrando": False}
+
+    def iniciar_worker(indice: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            fixar_afinidade(afinidade[indice])
+            configurar_threads(threads_intra_op[indice], threads_inter_op)
+            try:
+                uvicorn.Server(configuracao).run(sockets=[socket_servidor])
+            finally:
+                # os._exit não executa o atexit: escreve as linhas de log pendentes antes
+                encerrar_logs()
+                os._exit(0)
+        filhos[pid] = indice
+        nucleos = f", núcleos {sorted(afinidade[indice])}" if afinidade[indice] else ""
+        logger.info("Worker %d iniciado (pid %d, %d thread(s) do PyTorch%s)",
+                    indice, pid, threads_intra_op[indice], nucleos)
+
+    def encerrar(sinal, _frame) -> None:
+        estado["encerrando"] = True
+        for pid in list(filhos):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+
+    logger.info("Servindo em http://%s:%d com %d workers (modelo compartilhado)", host, porta, workers)
+    for indice in range(workers):
+        iniciar_worker(indice)
+
+    while filhos:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+
+        indice = filhos.pop(pid, None)
+        if indice is None or estado["encerrando"]:
+            continue
+
+        logger.warning("Worker %d (pid %d) terminou com status %d; recriando...", indice, pid, status)
+        iniciar_worker(indice)
+
+    socket_servidor.close()
+
+
+__all__ = ["preparar_processo_pai", "executar_prefork"]
@@ -1,21 +1,196 @@
-from fastapi import FastAPI, UploadFile, File, Query
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import FastAPI, UploadFile, File, Query, Header, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import base64
+import functools
+import hmac
+import json
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
 from io import BytesIO
+from typing import AsyncIterator, Dict, List, Literal, Optional, Tuple
+
+from PIL import Image
+
+from app import config
+from app.application.tarefas import ProcessadorTarefas
+from app.domain.excecoes import (
+    FilaCheia,
+    ImagemInvalida,
+    ImagemMuitoGrande,
+    ModeloIndisponivel,
+    TarefaNaoEncontrada,
+)
+from app.domain.tarefas import CONCLUIDA, PRIORIDADES
+from app.infrastructure.cache import CacheResultados
+from app.infrastructure.cpu import threads_intra_op
+from app.infrastructure.execucao import ExecutorInferencia
+from app.infrastructure.logs import configurar_logs, registrar, requisicao_atual
+from app.infrastructure.metricas import ExpositorPrometheus
+from app.infrastructure.segmentation.codificacao import FORMATOS_SAIDA, normalizar_formato, validar_nivel
+from app.infrastructure.segmentation.modelo import TAMANHO_ENTRADA
+from app.infrastructure.segmentation.perfil import encerrar_perfil, iniciar_perfil, perfil_pedido
+from app.infrastructure.segmentation.preprocessamento import MULTIPLO_ENTRADA, dimensoes_entrada
+from app.presentation.dependencias import (
+    aquecer_servico,
+    criar_fila_tarefas,
+    criar_servico_remocao,
+    preparar_processo_inferencia,
+)
+from app.presentation.lote import Entrada, FluxoZip, listar_entradas
+from app.presentation.metricas import MedidorHttp, MetricasHttp, exportar_metricas
+from app.presentation.respostas import (
+    FORMATO_BINARIO,
+    FORMATO_MULTIPART,
+    formato_por_accept,
+    montar_multipart,
+    negociar_formato,
+    parte_arquivo,
+    parte_json,
+)
+from app.presentation.upload import LimitadorCorpo, receber_imagem, verificar_dimensoes
+
+
+# Logs em JSON escritos por uma thread própria (ver `app.infrastructure.logs`)
+configurar_logs(config.LOG_NIVEL, config.LOG_AMOSTRAGEM)
+logger = logging.getLogger(__name__)
+
+
+async def _carregar_em_segundo_plano() -> None:
+    """Carrega os modelos sem atrasar a abertura da porta; a falha fica em /health/ready."""
+    try:
+        await executor_inferencia.aguardar_carregamento()
+    except Exception:
+        # `carregar` já registrou o erro, exposto em /health/ready
+        pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Inicia a carga dos modelos e os workers das tarefas assíncronas e libera
+    os pools ao desligar o servidor.
+
+    A carga e o aquecimento rodam em segundo plano: o servidor já responde em
+    `/health/live` (e com "aquecendo" em `/health/ready`) enquanto os pesos
+    são lidos e os primeiros forwards executados.
+    """
+    carregamento = asyncio.ensure_future(_carregar_em_segundo_plano())
+    await processador_tarefas.iniciar()
+    yield
+    await processador_tarefas.encerrar()
+    await carregamento
+    executor_inferencia.encerrar()
 
-from app.application.services import RemocaoFundoService
-from app.infrastructure.segmentation.u2net_service import U2NetService
 
 app = FastAPI(
     title="Bemasnap Background Removal API",
     description="API para remoção de fundo de imagens usando U²-Net",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
+)
+
+# Executor de inferência: roda o pipeline fora do event loop com concorrência
+# e fila limitadas; o serviço (e o modelo) só é criado na carga, no lifespan
+executor_inferencia = ExecutorInferencia(
+    fabrica_servico=criar_servico_remocao,
+    max_concorrencia=config.INFERENCIA_MAX_CONCORRENCIA,
+    max_fila=config.INFERENCIA_MAX_FILA,
+    tipo=config.INFERENCIA_EXECUTOR,
+    # No modo "process", cada processo do pool executa um pipeline por vez
+    preparar_processo=functools.partial(
+        preparar_processo_inferencia,
+        threads_intra_op(config.INFERENCIA_MAX_CONCORRENCIA, 1, config.TORCH_NUM_THREADS),
+        config.TORCH_INTEROP_THREADS,
+    ),
+    aquecimento=aquecer_servico if config.AQUECIMENTO_REPETICOES > 0 else None,
 )
 
-# Instancia o serviço de infraestrutura e o serviço de aplicação
-u2net_service = U2NetService()
-remocao_service = RemocaoFundoService(segmentador=u2net_service)
+# O agendador só reúne as requisições em execução: um LOTE_MAX maior não seria atingido
+if config.INFERENCIA_EXECUTOR == "thread" and config.LOTE_MAX > config.INFERENCIA_MAX_CONCORRENCIA:
+    logger.warning(
+        "LOTE_MAX=%d acima de INFERENCIA_MAX_CONCORRENCIA=%d: o agendador reúne até %d requisições por forward",
+        config.LOTE_MAX, config.INFERENCIA_MAX_CONCORRENCIA, config.LOTE_AGENDADOR)
+
+# Tarefas assíncronas: usam o mesmo executor, mas só quando ele está pronto e tem vaga ociosa
+processador_tarefas = ProcessadorTarefas(
+    fila=criar_fila_tarefas(),
+    executar=executor_inferencia.executar,
+    tem_vaga=lambda: (
+        executor_inferencia.pronto
+        and executor_inferencia.pendentes < executor_inferencia.max_concorrencia
+    ),
+    workers=config.TAREFAS_WORKERS,
+    ttl_s=config.TAREFAS_TTL_S,
+    max_pendentes=config.TAREFAS_MAX_PENDENTES,
+    prazo_s=config.TAREFAS_PRAZO_S,
+)
+
+# Cache de resultados indexado pelo hash da imagem enviada e das opções de saída
+cache_resultados = CacheResultados(
+    max_bytes=config.CACHE_MAX_MB * 1024 * 1024,
+    diretorio=config.CACHE_DIRETORIO,
+    max_bytes_disco=config.CACHE_MAX_MB_DISCO * 1024 * 1024,
+)
+
+# Limites de upload aplicados antes de decodificar a imagem
+UPLOAD_MAX_BYTES = int(config.UPLOAD_MAX_MB * 1024 * 1024)
+ROTA_LOTE = "/remover-fundo/lote/"
+
+# Limite do corpo das requisições: /remover-fundo/lote/ aceita vários arquivos
+app.add_middleware(
+    LimitadorCorpo, limite_mb=config.UPLOAD_MAX_MB, limites_mb_por_rota={ROTA_LOTE: config.LOTE_UPLOAD_MAX_MB})
+
+
+# Perfis por requisição: desativados, o middleware nem é instalado
+PERFIL_ATIVO = bool(config.PERFIL_TOKEN) or config.PERFIL_AMOSTRAGEM > 0
+if not 0.0 <= config.PERFIL_AMOSTRAGEM <= 1.0:
+    raise ValueError("PERFIL_AMOSTRAGEM deve estar entre 0 e 1")
+if PERFIL_ATIVO and config.INFERENCIA_EXECUTOR != "thread":
+    logger.warning("Perfis por requisição só funcionam com INFERENCIA_EXECUTOR=thread")
+
+
+def _perfil_solicitado(request: Request) -> bool:
+    """Cabeçalho X-Perfil com o token de administração, ou sorteio pela amostragem."""
+    valor = request.headers.get("x-perfil")
+    if valor is not None and config.PERFIL_TOKEN:
+        if hmac.compare_digest(valor.encode(), config.PERFIL_TOKEN.encode()):
+            return True
+        logger.warning("Cabeçalho X-Perfil com token inválido")
+    return config.PERFIL_AMOSTRAGEM > 0 and random.random() < config.PERFIL_AMOSTRAGEM
+
+
+async def perfilar_requisicao(request: Request, call_next):
+    """
+    Pede o perfil do pipeline da requisição (ver `segmentation.perfil`) e
+    devolve em X-Perfil o nome dos arquivos gravados em PERFIL_DIRETORIO.
+
+    O pedido segue até a thread do executor pela `ContextVar`; a requisição
+    perfilada não é respondida do cache. Se outro perfil estiver em
+    andamento, a requisição é processada sem perfil.
+    """
+    if not _perfil_solicitado(request):
+        return await call_next(request)
+
+    registro = requisicao_atual()
+    nome = time.strftime("%Y%m%d-%H%M%S") + "-" + registro.id
+    token = iniciar_perfil(nome, config.PERFIL_DIRETORIO, config.PERFIL_MAX_ARQUIVOS)
+    try:
+        response = await call_next(request)
+    finally:
+        encerrar_perfil(token)
+    # Nas respostas em streaming (ZIP do lote), o pipeline termina depois dos cabeçalhos
+    if "perfil" in registro.campos:
+        response.headers["X-Perfil"] = registro.campos["perfil"]
+    return response
+
+
+if PERFIL_ATIVO:
+    app.middleware("http")(perfilar_requisicao)
+
 
 # Configuração CORS
 app.add_middleware(
@@ -32,6 +207,150 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Contadores e histogramas por rota expostos em /metrics; adicionado por
+# último, o medidor envolve os demais middlewares e vê também as respostas deles
+metricas_http = MetricasHttp()
+app.add_middleware(MedidorHttp, metricas=metricas_http)
+
+# Limite de cada lado da máscara pedida em /mascara/
+MAX_LADO_MASCARA = 8192
+
+# Nível de modelo escolhido por requisição (rapido = U2NETP, qualidade = U2NET)
+NivelModelo = Literal["rapido", "qualidade"]
+FormatoSaida = Literal["png", "webp", "webp_sem_perda", "rgba"]
+DESCRICAO_MODELO = "rapido (U2NETP, 4.7 MB) ou qualidade (U2NET, 176 MB); padrão configurável"
+DESCRICAO_FORMATO = "png, webp, webp_sem_perda ou rgba (bytes RGBA pré-multiplicados); padrão pelo Accept ou PNG"
+DESCRICAO_NIVEL = "compress_level do PNG (0-9), qualidade do WebP ou esforço do WebP sem perdas (0-100)"
+DESCRICAO_TAMANHO_ENTRADA = (
+    "Lado da entrada do modelo, múltiplo de 32 (ex: 192 ou 256 para prévias rápidas); "
+    "padrão ENTRADA_TAMANHO"
+)
+
+
+def _etag_corresponde(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Verifica se o cabeçalho If-None-Match contém o ETag do resultado.
+
+    Só ETags exatos: `*` ("qualquer representação") não vale aqui, pois o
+    recurso é calculado a partir do próprio upload e o cliente nunca o recebeu.
+    """
+    if not if_none_match:
+        return False
+    candidatos = [valor.strip() for valor in if_none_match.split(",")]
+    candidatos = [c[2:] if c.startswith("W/") else c for c in candidatos]
+    return etag in candidatos
+
+
+def _opcoes_saida(formato: str, nivel: Optional[int] = None) -> Dict:
+    """
+    Formato e nível efetivos da imagem de saída; entram na chave de cache e no ETag.
+
+    Raises:
+        ValueError: se o nível estiver fora da faixa do formato
+    """
+    padroes = {"png": config.PNG_NIVEL_COMPRESSAO, "webp": config.WEBP_QUALIDADE}
+    nivel = padroes.get(formato, 0) if nivel is None else validar_nivel(formato, nivel)
+    return {"formato_saida": formato, "nivel": nivel}
+
+
+# Saída dos endpoints que sempre respondem PNG
+SAIDA_PNG = _opcoes_saida("png")
+
+def _chave_entrada(tamanho_entrada: Optional[int]) -> Dict:
+    """
+    Modo e lado da entrada do modelo para a chave de cache; vazio na
+    configuração original (esticada em 320x320), que mantém as chaves antigas.
+    """
+    lado = tamanho_entrada or config.ENTRADA_TAMANHO
+    if config.ENTRADA_MODO == "esticar" and lado == TAMANHO_ENTRADA:
+        return {}
+    return {"entrada": f"{config.ENTRADA_MODO}/{lado}"}
+
+
+# Parâmetros do modo de alta resolução; entram na chave de cache quando ele é pedido
+CONFIG_ALTA_RESOLUCAO = (
+    f"{config.ALTA_RES_BLOCO}/{config.ALTA_RES_SOBREPOSICAO}/"
+    f"{config.ALTA_RES_MAX_BLOCOS}/{config.ALTA_RES_LADO}"
+)
+
+
+async def _chave_resultado(imagem_bytes: bytes, modelo: Optional[str], **opcoes) -> str:
+    """
+    Chave de cache (e ETag) do resultado: hash da imagem e das opções que alteram a saída.
+
+    Args:
+        opcoes: Opções específicas do endpoint (ex: saida="mascara", tamanho=...)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(
+        CacheResultados.gerar_chave,
+        imagem_bytes,
+        modelo=modelo or config.MODELO_PADRAO,
+        backend=config.U2NET_BACKEND,
+        filtro=config.MASCARA_FILTRO,
+        **opcoes,
+    ))
+
+
+async def _obter_resultado(chave: str, metodo: str, imagem_bytes: bytes, **kwargs):
+    """
+    Busca o resultado no cache (exceto nas requisições perfiladas); em caso de
+    falta, executa `metodo` do serviço no executor de inferência e guarda os
+    bytes gerados.
+
+    Returns:
+        (bytes do resultado ou None se o processamento falhar, origem "HIT" ou "MISS")
+    """
+    loop = asyncio.get_running_loop()
+
+    if cache_resultados.ativo and not perfil_pedido():
+        em_cache = await loop.run_in_executor(None, cache_resultados.obter, chave)
+        if em_cache is not None:
+            registrar(cache="HIT")
+            return em_cache, "HIT"
+
+    registrar(cache="MISS")
+    resultado = await executor_inferencia.executar(metodo, imagem_bytes, **kwargs)
+    if resultado is None:
+        return None, "MISS"
+
+    resultado_bytes = resultado.getvalue()
+    if cache_resultados.ativo:
+        await loop.run_in_executor(None, cache_resultados.guardar, chave, resultado_bytes)
+    return resultado_bytes, "MISS"
+
+
+def _tamanho_mascara(
+    imagem_bytes: bytes,
+    largura: Optional[int],
+    altura: Optional[int]
+) -> Optional[Tuple[int, int]]:
+    """
+    Resolve o tamanho pedido para a máscara.
+
+    Sem largura nem altura, mantém a resolução do modelo (None). Com apenas um
+    dos lados, o outro segue a proporção da imagem original, lida apenas do
+    cabeçalho (`Image.open` não decodifica os pixels).
+    """
+    if largura is None and altura is None:
+        return None
+    if largura is not None and altura is not None:
+        return largura, altura
+
+    largura_original, altura_original = Image.open(BytesIO(imagem_bytes)).size
+    if largura is not None:
+        return largura, max(1, round(altura_original * largura / largura_original))
+    return max(1, round(largura_original * altura / altura_original)), altura
+
+
+def _resposta_fila_cheia(conteudo: dict) -> JSONResponse:
+    """Resposta 503 indicando ao cliente quando tentar novamente."""
+    return JSONResponse(
+        status_code=503,
+        content=conteudo,
+        headers={"Retry-After": str(config.INFERENCIA_RETRY_AFTER)}
+    )
+
 
 @app.get("/")
 async def root():
@@ -42,16 +361,120 @@ async def root():
         "descricao": "API para remoção de fundo de imagens usando U²-Net",
         "endpoints": {
             "/remover-fundo/": "Remove fundo e retorna imagem PNG",
-            "/processar-imagem/": "Remove fundo e retorna JSON com base64",
+            "/remover-fundo/lote/": "Remove fundo de várias imagens (ou ZIP) e retorna um ZIP em streaming",
+            "/processar-imagem/": "Remove fundo e retorna JSON com base64, multipart/mixed ou PNG com metadados nos cabeçalhos",
+            "/mascara/": "Retorna apenas a máscara alfa (PNG em escala de cinza ou bytes uint8)",
+            "/jobs": "Submete uma remoção de fundo assíncrona e retorna o id da tarefa",
+            "/jobs/{id}": "Status da tarefa; o resultado fica em /jobs/{id}/resultado",
+            "/estatisticas/": "Métricas de fila, cache, latência por modelo e agrupamento em lotes",
+            "/metrics": "As mesmas métricas e os tempos por etapa no formato de texto do Prometheus",
+            "/health/live": "O processo está respondendo (não depende do modelo)",
+            "/health/ready": "Os modelos estão carregados e o servidor aceita requisições",
             "/docs": "Documentação interativa da API"
         }
     }
 
 
+@app.get("/health/live")
+async def health_live():
+    """Liveness: responde assim que a porta abre, sem depender do modelo."""
+    return {"status": "vivo"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """
+    Readiness: `200` quando os modelos estão carregados; `503` com o status
+    "aquecendo" durante a carga ou "erro" se ela falhou.
+    """
+    estado = executor_inferencia.estado
+    if executor_inferencia.pronto:
+        tempos = {
+            "carregamento_s": executor_inferencia.tempo_carregamento_s,
+            "aquecimento_s": executor_inferencia.tempo_aquecimento_s,
+        }
+        return {"status": estado, **{nome: round(t, 2) for nome, t in tempos.items() if t is not None}}
+
+    conteudo = {"status": estado}
+    if executor_inferencia.erro_carregamento is not None:
+        conteudo["erro"] = executor_inferencia.erro_carregamento
+    return JSONResponse(
+        status_code=503,
+        content=conteudo,
+        headers={"Retry-After": str(config.INFERENCIA_RETRY_AFTER)}
+    )
+
+
+@app.get("/estatisticas/")
+async def estatisticas():
+    """
+    Estatísticas de execução da inferência.
+
+    Inclui a ocupação do executor, os contadores do cache de resultados e,
+    para cada modelo carregado, os histogramas de latência e os de tamanho de
+    lote e tempo de espera na janela do agendador, usados para ajustar
+    `LOTE_JANELA_MS` e `LOTE_MAX`. No modo "process" o agendador fica
+    desligado (cada processo recebe uma requisição por vez).
+    """
+    loop = asyncio.get_running_loop()
+    # A fila SQLite faz uma consulta: fora do event loop
+    tarefas = await loop.run_in_executor(None, processador_tarefas.estatisticas)
+    servico = executor_inferencia.servico
+    return {
+        "inferencia": {
+            "executor": executor_inferencia.tipo,
+            "estado": executor_inferencia.estado,
+            "pendentes": executor_inferencia.pendentes,
+            "capacidade": executor_inferencia.capacidade
+        },
+        "cache": cache_resultados.estatisticas(),
+        "tarefas": tarefas,
+        "segmentador": servico.estatisticas() if servico is not None else None
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Métricas no formato de exposição do Prometheus.
+
+    Histogramas de duração de cada etapa (leitura do upload, decodificação,
+    pré-processamento, inferência, máscara, composição, codificação e envio da
+    resposta), contadores de requisições, erros e bytes por rota e medidores
+    da fila e das inferências em execução. No modo "process" as etapas do
+    pipeline ficam nos processos do pool e não aparecem aqui.
+    """
+    loop = asyncio.get_running_loop()
+    # A fila SQLite faz uma consulta: fora do event loop
+    tarefas = await loop.run_in_executor(None, processador_tarefas.fila.contagens)
+    servico = executor_inferencia.servico
+    texto = exportar_metricas(
+        metricas_http,
+        inferencia={
+            "pronto": executor_inferencia.pronto,
+            "em_execucao": executor_inferencia.em_execucao,
+            "na_fila": executor_inferencia.na_fila,
+            "capacidade": executor_inferencia.capacidade,
+        },
+        cache=cache_resultados.estatisticas(),
+        tarefas=tarefas,
+        segmentador=servico.estatisticas() if servico is not None else None,
+    )
+    return PlainTextResponse(texto, media_type=ExpositorPrometheus.TIPO_CONTEUDO)
+
+
 @app.post("/remover-fundo/")
 async def remover_fundo(
     file: UploadFile = File(...),
-    visualizar: bool = Query(False, description="Se True, exibe inline; se False, faz download")
+    visualizar: bool = Query(False, description="Se True, exibe inline; se False, faz download"),
+    modelo: Optional[NivelModelo] = Query(None, description=DESCRICAO_MODELO),
+    formato: Optional[FormatoSaida] = Query(None, description=DESCRICAO_FORMATO),
+    nivel: Optional[int] = Query(None, ge=0, le=100, description=DESCRICAO_NIVEL),
+    alta_resolucao: bool = Query(False, description="Refina as bordas com blocos sobrepostos (mais lento)"),
+    tamanho_entrada: Optional[int] = Query(
+        None, ge=64, le=640, multiple_of=MULTIPLO_ENTRADA, description=DESCRICAO_TAMANHO_ENTRADA),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     Remove o fundo de uma imagem e retorna o resultado.
@@ -60,13 +483,42 @@ async def remover_fundo(
 
     - **file**: Arquivo de imagem (JPEG, PNG, etc.)
     - **visualizar**: Se True, exibe inline no navegador; se False, faz download
+    - **modelo**: rapido (U2NETP) ou qualidade (U2NET); se omitido, usa o padrão
+    - **formato**: png, webp, webp_sem_perda ou rgba; se omitido, segue o `Accept`
+      (`image/png`, `image/webp`) e, por fim, PNG; `rgba` só com o parâmetro
+    - **nivel**: compress_level do PNG (0-9), qualidade do WebP ou esforço do WebP sem perdas (0-100)
+    - **alta_resolucao**: após a passada completa, refina as bordas incertas com até
+      `ALTA_RES_MAX_BLOCOS` blocos sobrepostos; indicado para fotos grandes ou largas
+    - **tamanho_entrada**: lado da entrada do modelo; 192 ou 256 dão prévias mais rápidas
+
+    A resposta traz um `ETag` derivado do conteúdo enviado e das opções de
+    saída; reenviar a mesma imagem com `If-None-Match` retorna `304`.
 
     Returns:
-        Imagem processada com fundo transparente (PNG)
+        Imagem processada com fundo transparente; no formato `rgba`, os bytes
+        RGBA pré-multiplicados com as dimensões em `X-Imagem-Largura` e `X-Imagem-Altura`
     """
     try:
-        imagem_bytes = await file.read()
-        resultado = remocao_service.remover_fundo(imagem_bytes, formato_saida="PNG")
+        imagem_bytes = await receber_imagem(file, UPLOAD_MAX_BYTES, config.UPLOAD_MAX_MEGAPIXELS)
+        nome_formato = formato or formato_por_accept(accept) or "png"
+        try:
+            saida = _opcoes_saida(nome_formato, nivel)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"erro": str(e)})
+
+        # Sem alta resolução a chave é a mesma dos demais endpoints que geram PNG
+        refinamento = {"alta_resolucao": CONFIG_ALTA_RESOLUCAO} if alta_resolucao else {}
+        chave = await _chave_resultado(
+            imagem_bytes, modelo, **saida, **refinamento, **_chave_entrada(tamanho_entrada))
+        etag = f'"{chave}"'
+        cabecalhos = {"ETag": etag, "Vary": "Accept"}
+
+        if _etag_corresponde(if_none_match, etag):
+            return Response(status_code=304, headers=cabecalhos)
+
+        resultado, origem = await _obter_resultado(
+            chave, "remover_fundo", imagem_bytes, modelo=modelo,
+            alta_resolucao=alta_resolucao, tamanho_entrada=tamanho_entrada, **saida)
 
         if resultado is None:
             return JSONResponse(
@@ -74,23 +526,204 @@ async def remover_fundo(
                 content={"erro": "Falha ao processar a imagem"}
             )
 
-        media_type = "image/png"
-        filename = "imagem_sem_fundo.png"
+        media_type, extensao = FORMATOS_SAIDA[nome_formato]
+        filename = f"imagem_sem_fundo{extensao}"
+        cabecalhos["X-Cache"] = origem
+        if nome_formato == "rgba":
+            largura, altura = verificar_dimensoes(imagem_bytes, config.UPLOAD_MAX_MEGAPIXELS)
+            cabecalhos.update({"X-Imagem-Largura": str(largura), "X-Imagem-Altura": str(altura)})
 
         if visualizar:
-            return StreamingResponse(
+            return Response(
                 resultado,
                 media_type=media_type,
-                headers={"Content-Disposition": f"inline; filename={filename}"}
+                headers={"Content-Disposition": f"inline; filename={filename}", **cabecalhos}
             )
         else:
-            return StreamingResponse(
+            return Response(
                 resultado,
                 media_type=media_type,
-                headers={"Content-Disposition": f"attachment; filename={filename}"}
+                headers={"Content-Disposition": f"attachment; filename={filename}", **cabecalhos}
             )
 
+    except ImagemMuitoGrande as e:
+        return JSONResponse(status_code=413, content={"erro": str(e)})
+
+    except ImagemInvalida as e:
+        return JSONResponse(status_code=400, content={"erro": str(e)})
+
+    except FilaCheia as e:
+        return _resposta_fila_cheia({"erro": str(e)})
+
+    except ModeloIndisponivel as e:
+        return JSONResponse(status_code=400, content={"erro": str(e)})
+
     except Exception as e:
+        logger.exception("Erro ao processar requisição")
+        return JSONResponse(
+            status_code=500,
+            content={"erro": f"Erro ao processar requisição: {str(e)}"}
+        )
+
+
+async def _executar_aguardando_vaga(metodo: str, *args, **kwargs):
+    """
+    Executa no executor de inferência, aguardando até `LOTE_ESPERA_VAGA_S`
+    segundos enquanto a fila estiver cheia.
+
+    Raises:
+        FilaCheia: se o prazo esgotar sem que surja uma vaga
+    """
+    loop = asyncio.get_running_loop()
+    prazo = loop.time() + config.LOTE_ESPERA_VAGA_S
+    while True:
+        try:
+            return await executor_inferencia.executar(metodo, *args, **kwargs)
+        except FilaCheia:
+            if loop.time() >= prazo:
+                raise
+            await asyncio.sleep(0.05)
+
+
+async def _processar_bloco(bloco: List[Entrada], modelo: Optional[str]) -> List[Tuple[str, Optional[bytes], str]]:
+    """
+    Lê, valida e processa um bloco do lote, consultando o cache por imagem.
+
+    Returns:
+        (nome original, PNG ou None, mensagem de erro) de cada entrada do bloco
+    """
+    loop = asyncio.get_running_loop()
+    resultados = {}
+    faltas = []
+
+    for indice, (nome, ler) in enumerate(bloco):
+        try:
+            dados = await loop.run_in_executor(None, ler)
+            verificar_dimensoes(dados, config.UPLOAD_MAX_MEGAPIXELS)
+        except (ImagemMuitoGrande, ImagemInvalida) as e:
+            resultados[indice] = (None, str(e))
+            continue
+
+        chave = await _chave_resultado(dados, modelo, **SAIDA_PNG, **_chave_entrada(None))
+        em_cache = None
+        if cache_resultados.ativo:
+            em_cache = await loop.run_in_executor(None, cache_resultados.obter, chave)
+        if em_cache is not None:
+            resultados[indice] = (em_cache, "")
+        else:
+            faltas.append((indice, chave, dados))
+
+    if faltas:
+        try:
+            processadas = await _executar_aguardando_vaga(
+                "remover_fundo_lote", [dados for _, _, dados in faltas], modelo=modelo, **SAIDA_PNG)
+        except FilaCheia as e:
+            # Os cabeçalhos já foram enviados: o bloco sai no manifesto para ser reenviado
+            logger.warning("Bloco do lote descartado: %s", e)
+            processadas = []
+            for indice, _, _ in faltas:
+                resultados[indice] = (None, f"{e}; reenvie a imagem")
+        for (indice, chave, _), resultado in zip(faltas, processadas):
+            if resultado is None:
+                resultados[indice] = (None, "Falha ao processar a imagem")
+                continue
+            resultado_bytes = resultado.getvalue()
+            if cache_resultados.ativo:
+                await loop.run_in_executor(None, cache_resultados.guardar, chave, resultado_bytes)
+            resultados[indice] = (resultado_bytes, "")
+
+    return [(nome,) + resultados[indice] for indice, (nome, _) in enumerate(bloco)]
+
+
+async def _gerar_zip_lote(entradas: List[Entrada], modelo: Optional[str]) -> AsyncIterator[bytes]:
+    """
+    Processa o lote em blocos de até `LOTE_MAX` imagens e envia cada PNG assim
+    que o seu bloco termina. O próximo bloco já é processado enquanto o
+    anterior é enviado. Ao final, `manifesto.json` lista o resultado de cada entrada.
+    """
+    fluxo = FluxoZip()
+    manifesto = []
+    tamanho_bloco = max(1, config.LOTE_MAX)
+    blocos = [entradas[i:i + tamanho_bloco] for i in range(0, len(entradas), tamanho_bloco)]
+
+    pendente: Optional[asyncio.Future] = None
+    try:
+        for bloco in blocos + [None]:
+            proximo = asyncio.ensure_future(_processar_bloco(bloco, modelo)) if bloco else None
+            if pendente is not None:
+                for nome, resultado, erro in await pendente:
+                    if resultado is None:
+                        manifesto.append({"arquivo": nome, "status": "erro", "mensagem": erro})
+                        continue
+                    saida = fluxo.nome_unico(nome, ".png")
+                    manifesto.append({"arquivo": nome, "status": "sucesso", "saida": saida})
+                    yield fluxo.adicionar(saida, resultado)
+            pendente = proximo
+    finally:
+        if pendente is not None:
+            pendente.cancel()
+
+    yield fluxo.adicionar("manifesto.json", json.dumps(manifesto, ensure_ascii=False, indent=2).encode(), comprimir=True)
+    yield fluxo.finalizar()
+
+
+@app.post(ROTA_LOTE)
+async def remover_fundo_lote(
+    arquivos: List[UploadFile] = File(..., description="Imagens e/ou arquivos ZIP com imagens"),
+    modelo: Optional[NivelModelo] = Query(None, description=DESCRICAO_MODELO)
+):
+    """
+    Remove o fundo de várias imagens em uma única requisição.
+
+    - **arquivos**: Várias imagens e/ou arquivos ZIP contendo imagens
+    - **modelo**: rapido (U2NETP) ou qualidade (U2NET); se omitido, usa o padrão
+
+    As imagens passam pelo modelo em forwards de até `LOTE_MAX` imagens e a
+    resposta é um ZIP enviado em streaming: cada PNG é transmitido assim que o
+    seu bloco termina, sem acumular o lote inteiro em memória. Imagens que
+    falham não interrompem o lote; o `manifesto.json` no final do ZIP indica
+    o status de cada entrada.
+
+    Returns:
+        ZIP com um PNG por imagem processada e o manifesto
+    """
+    try:
+        nome_modelo = modelo or config.MODELO_PADRAO
+        if nome_modelo not in config.MODELOS_HABILITADOS:
+            raise ModeloIndisponivel(nome_modelo, config.MODELOS_HABILITADOS)
+
+        entradas = listar_entradas(arquivos, UPLOAD_MAX_BYTES)
+        if not entradas:
+            return JSONResponse(status_code=400, content={"erro": "Nenhuma imagem enviada"})
+        if len(entradas) > config.LOTE_MAX_IMAGENS:
+            return JSONResponse(
+                status_code=413,
+                content={"erro": f"Lote de {len(entradas)} imagens excede o limite de {config.LOTE_MAX_IMAGENS}"}
+            )
+        # Depois do início do streaming já não é possível responder 503
+        if executor_inferencia.pendentes >= executor_inferencia.capacidade:
+            raise FilaCheia(executor_inferencia.capacidade)
+
+        return StreamingResponse(
+            _gerar_zip_lote(entradas, modelo),
+            media_type="application/zip",
+            headers={
+                "Content-Disposition": "attachment; filename=imagens_sem_fundo.zip",
+                "X-Lote-Imagens": str(len(entradas)),
+            }
+        )
+
+    except ImagemInvalida as e:
+        return JSONResponse(status_code=400, content={"erro": str(e)})
+
+    except FilaCheia as e:
+        return _resposta_fila_cheia({"erro": str(e)})
+
+    except ModeloIndisponivel as e:
+        return JSONResponse(status_code=400, content={"erro": str(e)})
+
+    except Exception as e:
+        logger.exception("Erro ao processar requisição")
         return JSONResponse(
             status_code=500,
             content={"erro": f"Erro ao processar requisição: {str(e)}"}
@@ -98,24 +731,56 @@ async def remover_fundo(
 
 
 @app.post("/processar-imagem/")
-async def processar_imagem(file: UploadFile = File(...)):
+async def processar_imagem(
+    file: UploadFile = File(...),
+    modelo: Optional[NivelModelo] = Query(None, description=DESCRICAO_MODELO),
+    formato_resposta: Optional[Literal["json", "multipart", "binario"]] = Query(
+        None, description="json (base64), multipart (multipart/mixed) ou binario (PNG + cabeçalhos); padrão pelo Accept"),
+    incluir_original: bool = Query(True, description="Se False, não devolve a imagem enviada"),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
     """
-    Remove o fundo e retorna JSON com imagens em base64.
+    Remove o fundo e retorna o resultado com metadados.
 
     **Não salva arquivos localmente - processa tudo em memória!**
 
     - **file**: Arquivo de imagem (JPEG, PNG, etc.)
+    - **modelo**: rapido (U2NETP) ou qualidade (U2NET); se omitido, usa o padrão
+    - **formato_resposta**: força o modo de resposta; sem ele, vale o `Accept`
+      (`multipart/mixed`, `image/png` ou `application/octet-stream`; o resto é JSON)
+    - **incluir_original**: devolve também a imagem enviada (JSON e multipart)
+
+    Os modos multipart e binário enviam os PNGs sem base64 (cerca de 33%
+    menores) e sem montar strings grandes em memória. A resposta traz um
+    `ETag` derivado do conteúdo enviado e das opções de saída; reenviar a
+    mesma imagem com `If-None-Match` retorna `304`.
 
     Returns:
-        JSON com imagem original e processada em base64
+        JSON com imagem original e processada em base64; `multipart/mixed` com
+        uma parte JSON de metadados, o PNG processado e a imagem original; ou
+        apenas o PNG, com os metadados nos cabeçalhos `X-*`
     """
     try:
-        imagem_bytes = await file.read()
+        imagem_bytes = await receber_imagem(file, UPLOAD_MAX_BYTES, config.UPLOAD_MAX_MEGAPIXELS)
         tamanho_original = len(imagem_bytes)
+        tipo_original = file.content_type or "image/jpeg"
+        modo = negociar_formato(accept, formato_resposta)
+        incluir_original = incluir_original and modo != FORMATO_BINARIO
 
-        resultado = remocao_service.remover_fundo(imagem_bytes, formato_saida="PNG")
+        chave = await _chave_resultado(imagem_bytes, modelo, **SAIDA_PNG, **_chave_entrada(None))
+        # Cada representação tem seu próprio ETag; o resultado em cache é o mesmo
+        etag = f'"{chave}-{modo}{"" if incluir_original else "-sem-original"}"'
+        cabecalhos = {"ETag": etag, "Vary": "Accept"}
 
-        if resultado is None:
+        if _etag_corresponde(if_none_match, etag):
+            return Response(status_code=304, headers=cabecalhos)
+
+        resultado_bytes, origem = await _obter_resultado(
+            chave, "remover_fundo", imagem_bytes, modelo=modelo, **SAIDA_PNG)
+        cabecalhos["X-Cache"] = origem
+
+        if resultado_bytes is None:
             return JSONResponse(
                 status_code=500,
                 content={
@@ -124,38 +789,286 @@ async def processar_imagem(file: UploadFile = File(...)):
                 }
             )
 
-        resultado_bytes = resultado.getvalue()
         tamanho_processado = len(resultado_bytes)
+        nome_modelo = modelo or config.MODELO_PADRAO
 
-        original_b64 = base64.b64encode(imagem_bytes).decode()
-        processado_b64 = base64.b64encode(resultado_bytes).decode()
+        if modo == FORMATO_BINARIO:
+            return Response(
+                resultado_bytes,
+                media_type="image/png",
+                headers={
+                    "Content-Disposition": "inline; filename=imagem_sem_fundo.png",
+                    "X-Algoritmo": "U2-Net",
+                    "X-Modelo": nome_modelo,
+                    "X-Tamanho-Original": str(tamanho_original),
+                    **cabecalhos
+                }
+            )
 
-        return JSONResponse(content={
+        metadados = {
             "status": "sucesso",
             "mensagem": "Fundo removido com sucesso!",
             "imagem_original": {
-                "data": f"data:image/jpeg;base64,{original_b64}",
                 "tamanho_bytes": tamanho_original,
-                "formato": file.content_type or "image/jpeg"
+                "formato": tipo_original,
+                "incluida": incluir_original
             },
             "imagem_processada": {
-                "data": f"data:image/png;base64,{processado_b64}",
                 "tamanho_bytes": tamanho_processado,
                 "formato": "PNG",
                 "transparencia": True
             },
             "info": {
                 "algoritmo": "U²-Net",
+                "modelo": nome_modelo,
                 "processamento_concluido": True,
                 "economia_armazenamento": "Nenhum arquivo salvo localmente"
             }
-        })
+        }
+
+        if modo == FORMATO_MULTIPART:
+            partes = [
+                parte_json(metadados),
+                parte_arquivo(resultado_bytes, "image/png", "imagem_sem_fundo.png"),
+            ]
+            if incluir_original:
+                partes.append(parte_arquivo(imagem_bytes, tipo_original, file.filename or "original"))
+            corpo, tipo = montar_multipart(partes)
+            return Response(corpo, media_type=tipo, headers=cabecalhos)
+
+        if incluir_original:
+            original_b64 = base64.b64encode(imagem_bytes).decode()
+            metadados["imagem_original"]["data"] = f"data:image/jpeg;base64,{original_b64}"
+        processado_b64 = base64.b64encode(resultado_bytes).decode()
+        metadados["imagem_processada"]["data"] = f"data:image/png;base64,{processado_b64}"
+
+        return JSONResponse(content=metadados, headers=cabecalhos)
+
+    except ImagemMuitoGrande as e:
+        return JSONResponse(
+            status_code=413,
+            content={"status": "erro", "mensagem": str(e)}
+        )
+
+    except ImagemInvalida as e:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "erro", "mensagem": str(e)}
+        )
+
+    except FilaCheia as e:
+        return _resposta_fila_cheia({"status": "erro", "mensagem": str(e)})
+
+    except ModeloIndisponivel as e:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "erro", "mensagem": str(e)}
+        )
 
     except Exception as e:
+        logger.exception("Erro ao processar requisição")
         return JSONResponse(
             status_code=500,
             content={
                 "status": "erro",
                 "mensagem": f"Erro ao processar requisição: {str(e)}"
             }
-        )
\ No newline at end of file
+        )
+
+
+@app.post("/mascara/")
+async def mascara(
+    file: UploadFile = File(...),
+    formato: Literal["png", "bruto"] = Query("png", description="png (escala de cinza) ou bruto (bytes uint8)"),
+    largura: Optional[int] = Query(None, ge=1, le=MAX_LADO_MASCARA, description="Largura da máscara"),
+    altura: Optional[int] = Query(None, ge=1, le=MAX_LADO_MASCARA, description="Altura da máscara"),
+    modelo: Optional[NivelModelo] = Query(None, description=DESCRICAO_MODELO),
+    tamanho_entrada: Optional[int] = Query(
+        None, ge=64, le=640, multiple_of=MULTIPLO_ENTRADA, description=DESCRICAO_TAMANHO_ENTRADA),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Retorna apenas a máscara alfa, para clientes que fazem a composição.
+
+    Não aplica a máscara nem codifica a imagem RGBA em resolução cheia, o que
+    torna a resposta muito menor e mais rápida que `/remover-fundo/`.
+
+    - **file**: Arquivo de imagem (JPEG, PNG, etc.)
+    - **formato**: png (PNG em escala de cinza) ou bruto (uint8 linha a linha, dimensões nos cabeçalhos)
+    - **largura** / **altura**: Tamanho da máscara; sem nenhum dos dois, usa a resolução do modelo
+      (320x320, ou a proporção original em `ENTRADA_MODO=letterbox`);
+      com apenas um, o outro segue a proporção da imagem original
+    - **modelo**: rapido (U2NETP) ou qualidade (U2NET); se omitido, usa o padrão
+    - **tamanho_entrada**: lado da entrada do modelo; 192 ou 256 dão prévias mais rápidas
+
+    Returns:
+        Máscara em PNG (image/png) ou bytes uint8 (application/octet-stream)
+    """
+    try:
+        imagem_bytes = await receber_imagem(file, UPLOAD_MAX_BYTES, config.UPLOAD_MAX_MEGAPIXELS)
+        tamanho = _tamanho_mascara(imagem_bytes, largura, altura)
+
+        chave = await _chave_resultado(
+            imagem_bytes, modelo, saida="mascara", formato=formato, tamanho=tamanho,
+            **_chave_entrada(tamanho_entrada))
+        etag = f'"{chave}"'
+
+        if _etag_corresponde(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        resultado, origem = await _obter_resultado(
+            chave, "gerar_mascara", imagem_bytes, tamanho=tamanho, formato=formato, modelo=modelo,
+            tamanho_entrada=tamanho_entrada)
+
+        if resultado is None:
+            return JSONResponse(
+                status_code=500,
+                content={"erro": "Falha ao gerar a máscara"}
+            )
+
+        # Sem tamanho pedido, o mesmo cálculo do serviço a partir das dimensões originais
+        largura_final, altura_final = tamanho or dimensoes_entrada(
+            verificar_dimensoes(imagem_bytes, config.UPLOAD_MAX_MEGAPIXELS),
+            tamanho_entrada or config.ENTRADA_TAMANHO,
+            config.ENTRADA_MODO == "letterbox",
+        )
+        cabecalhos = {
+            "ETag": etag,
+            "X-Cache": origem,
+            "X-Mascara-Largura": str(largura_final),
+            "X-Mascara-Altura": str(altura_final),
+        }
+
+        if formato == "bruto":
+            return Response(resultado, media_type="application/octet-stream", headers=cabecalhos)
+        return Response(resultado, media_type="image/png", headers=cabecalhos)
+
+    except ImagemMuitoGrande as e:
+        return JSONResponse(status_code=413, content={"erro": str(e)})
+
+    except ImagemInvalida as e:
+        return JSONResponse(status_code=400, content={"erro": str(e)})
+
+    except FilaCheia as e:
+        return _resposta_fila_cheia({"erro": str(e)})
+
+    except ModeloIndisponivel as e:
+        return JSONResponse(status_code=400, content={"erro": str(e)})
+
+    except Exception as e:
+        logger.exception("Erro ao processar requisição")
+        return JSONResponse(
+            status_code=500,
+            content={"erro": f"Erro ao processar requisição: {str(e)}"}
+        )
+
+
+@app.post("/jobs", status_code=202)
+async def criar_tarefa(
+    file: UploadFile = File(...),
+    modelo: Optional[NivelModelo] = Query(None, description=DESCRICAO_MODELO),
+    prioridade: Literal["alta", "normal", "baixa"] = Query("normal", description="Ordem de atendimento na fila"),
+    formato: Literal["png", "webp", "webp_sem_perda"] = Query("png", description="Formato do resultado")
+):
+    """
+    Submete uma remoção de fundo para processamento assíncrono.
+
+    Indicado para imagens grandes e cargas em massa: a resposta volta
+    imediatamente com o id da tarefa, sem o cliente precisar manter a conexão
+    aberta durante o processamento. As tarefas só usam o modelo quando há
+    capacidade ociosa, e as de prioridade `alta` são atendidas primeiro.
+
+    - **file**: Arquivo de imagem (JPEG, PNG, etc.)
+    - **modelo**: rapido (U2NETP) ou qualidade (U2NET); se omitido, usa o padrão
+    - **prioridade**: alta, normal ou baixa
+    - **formato**: png, webp ou webp_sem_perda (com o nível padrão configurado)
+
+    Returns:
+        202 com o id e o status da tarefa; o cabeçalho `Location` aponta para `/jobs/{id}`
+    """
+    try:
+        nome_modelo = modelo or config.MODELO_PADRAO
+        if nome_modelo not in config.MODELOS_HABILITADOS:
+            raise ModeloIndisponivel(nome_modelo, config.MODELOS_HABILITADOS)
+
+        imagem_bytes = await receber_imagem(file, UPLOAD_MAX_BYTES, config.UPLOAD_MAX_MEGAPIXELS)
+        tarefa = await processador_tarefas.submeter(
+            imagem_bytes, formato_saida=formato, modelo=modelo, prioridade=PRIORIDADES[prioridade])
+
+        return JSONResponse(
+            status_code=202,
+            content=tarefa.para_dict(),
+            headers={"Location": f"/jobs/{tarefa.id}"}
+        )
+
+    except ImagemMuitoGrande as e:
+        return JSONResponse(status_code=413, content={"erro": str(e)})
+
+    except ImagemInvalida as e:
+        return JSONResponse(status_code=400, content={"erro": str(e)})
+
+    except FilaCheia as e:
+        return _resposta_fila_cheia({"erro": str(e)})
+
+    except ModeloIndisponivel as e:
+        return JSONResponse(status_code=400, content={"erro": str(e)})
+
+    except Exception as e:
+        logger.exception("Erro ao processar requisição")
+        return JSONResponse(
+            status_code=500,
+            content={"erro": f"Erro ao processar requisição: {str(e)}"}
+        )
+
+
+@app.get("/jobs/{identificador}")
+async def consultar_tarefa(identificador: str):
+    """
+    Status de uma tarefa assíncrona.
+
+    Returns:
+        JSON com status (pendente, processando, concluida ou erro), datas e,
+        quando concluída, o caminho do resultado
+    """
+    try:
+        tarefa = await processador_tarefas.obter(identificador)
+    except TarefaNaoEncontrada as e:
+        return JSONResponse(status_code=404, content={"erro": str(e)})
+
+    conteudo = tarefa.para_dict()
+    if tarefa.status == CONCLUIDA:
+        conteudo["resultado"] = f"/jobs/{tarefa.id}/resultado"
+    return conteudo
+
+
+@app.get("/jobs/{identificador}/resultado")
+async def resultado_tarefa(
+    identificador: str,
+    visualizar: bool = Query(False, description="Se True, exibe inline; se False, faz download")
+):
+    """
+    Baixa o resultado de uma tarefa concluída.
+
+    Returns:
+        Imagem com fundo transparente no formato pedido na submissão; 409 se a
+        tarefa ainda não terminou ou falhou, 404 se não existir ou tiver expirado
+    """
+    try:
+        tarefa = await processador_tarefas.obter(identificador)
+        resultado = await processador_tarefas.resultado(identificador)
+    except TarefaNaoEncontrada as e:
+        return JSONResponse(status_code=404, content={"erro": str(e)})
+
+    if resultado is None:
+        return JSONResponse(
+            status_code=409,
+            content={"erro": f"Tarefa sem resultado disponível (status: {tarefa.status})", "status": tarefa.status}
+        )
+
+    media_type, extensao = FORMATOS_SAIDA[normalizar_formato(tarefa.formato_saida)]
+    disposicao = "inline" if visualizar else "attachment"
+    return Response(
+        resultado,
+        media_type=media_type,
+        headers={"Content-Disposition": f"{disposicao}; filename=imagem_sem_fundo_{identificador}{extensao}"}
+    )
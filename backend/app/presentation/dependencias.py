@@ -0,0 +1,77 @@
+from app import config
+from app.application.registro import RegistroModelos
+from app.application.services import RemocaoFundoService
+from app.infrastructure.cpu import configurar_threads
+from app.infrastructure.filas import FilaTarefas, criar_fila
+from app.infrastructure.logs import configurar_logs
+from app.infrastructure.segmentation.u2net_service import U2NetService
+
+
+# Variante do U²-Net e caminhos configurados para cada nível de modelo
+NIVEIS_MODELO = {
+    "qualidade": ("u2net", config.U2NET_CAMINHO_MODELO, config.U2NET_CAMINHO_ARTEFATO),
+    "rapido": ("u2netp", config.U2NETP_CAMINHO_MODELO, config.U2NETP_CAMINHO_ARTEFATO),
+}
+
+
+def criar_servico_remocao() -> RemocaoFundoService:
+    """
+    Monta o serviço de aplicação com um segmentador U2Net por modelo habilitado.
+
+    Função de módulo para poder ser chamada tanto no processo principal
+    quanto em cada processo do pool de inferência.
+    """
+    if config.ENTRADA_MODO not in ("esticar", "letterbox"):
+        raise ValueError(f"ENTRADA_MODO inválido: {config.ENTRADA_MODO} (use 'esticar' ou 'letterbox')")
+
+    segmentadores = {}
+    for nome in config.MODELOS_HABILITADOS:
+        if nome not in NIVEIS_MODELO:
+            raise ValueError(f"Modelo desconhecido em MODELOS_HABILITADOS: {nome}")
+
+        variante, caminho_modelo, caminho_artefato = NIVEIS_MODELO[nome]
+        segmentadores[nome] = U2NetService(
+            max_lote=config.LOTE_MAX,
+            janela_lote_ms=config.LOTE_JANELA_MS,
+            max_lote_agendador=config.LOTE_AGENDADOR,
+            backend=config.U2NET_BACKEND,
+            variante=variante,
+            caminho_modelo=caminho_modelo,
+            caminho_artefato=caminho_artefato,
+            filtro_mascara=config.MASCARA_FILTRO,
+            nivel_png=config.PNG_NIVEL_COMPRESSAO,
+            qualidade_webp=config.WEBP_QUALIDADE,
+            alta_res_bloco=config.ALTA_RES_BLOCO,
+            alta_res_sobreposicao=config.ALTA_RES_SOBREPOSICAO,
+            alta_res_max_blocos=config.ALTA_RES_MAX_BLOCOS,
+            alta_res_lado=config.ALTA_RES_LADO,
+            entrada_letterbox=config.ENTRADA_MODO == "letterbox",
+            tamanho_entrada=config.ENTRADA_TAMANHO,
+        )
+
+    registro = RegistroModelos(segmentadores, padrao=config.MODELO_PADRAO)
+    return RemocaoFundoService(registro=registro)
+
+
+def preparar_processo_inferencia(intra_op: int, inter_op: int = 0) -> None:
+    """
+    Prepara cada processo do pool no modo "process": logs em JSON e threads do PyTorch.
+
+    Função de módulo para poder ser enviada aos processos criados com spawn.
+    """
+    configurar_logs(config.LOG_NIVEL, config.LOG_AMOSTRAGEM)
+    configurar_threads(intra_op, inter_op)
+
+
+def aquecer_servico(servico: RemocaoFundoService) -> None:
+    """
+    Aquece os modelos com a configuração AQUECIMENTO_*.
+
+    Função de módulo para poder ser usada também no pool de processos.
+    """
+    servico.aquecer(config.AQUECIMENTO_TAMANHOS, config.AQUECIMENTO_LOTES, config.AQUECIMENTO_REPETICOES)
+
+
+def criar_fila_tarefas() -> FilaTarefas:
+    """Fila das tarefas assíncronas configurada em TAREFAS_FILA."""
+    return criar_fila(config.TAREFAS_FILA, config.TAREFAS_SQLITE_CAMINHO)
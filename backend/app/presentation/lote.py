@@ -0,0 +1,135 @@
+import zipfile
+from pathlib import PurePosixPath
+from typing import Callable, List, Set, Tuple
+
+from fastapi import UploadFile
+
+from app.domain.excecoes import ImagemInvalida, ImagemMuitoGrande
+
+
+# Tipos enviados pelos navegadores e clientes HTTP para arquivos ZIP
+TIPOS_ZIP = {"application/zip", "application/x-zip-compressed", "application/x-zip"}
+
+# Entrada do lote: nome original e função que lê os bytes quando chegar a vez dela
+Entrada = Tuple[str, Callable[[], bytes]]
+
+
+def eh_zip(arquivo: UploadFile) -> bool:
+    """Se o arquivo enviado é um ZIP (pelo tipo ou pela extensão)."""
+    return arquivo.content_type in TIPOS_ZIP or (arquivo.filename or "").lower().endswith(".zip")
+
+
+def listar_entradas(arquivos: List[UploadFile], max_bytes: int) -> List[Entrada]:
+    """
+    Lista as imagens do lote sem lê-las: arquivos avulsos e membros de ZIPs.
+
+    Os arquivos ficam no disco temporário do servidor e cada imagem só é lida
+    quando for processada.
+
+    Raises:
+        ImagemInvalida: se um arquivo marcado como ZIP estiver corrompido
+    """
+    entradas: List[Entrada] = []
+    for indice, arquivo in enumerate(arquivos):
+        nome = arquivo.filename or f"imagem_{indice}"
+        if eh_zip(arquivo):
+            entradas.extend(_entradas_zip(arquivo, nome, max_bytes))
+        else:
+            entradas.append((nome, _leitor_arquivo(arquivo, max_bytes)))
+    return entradas
+
+
+def _leitor_arquivo(arquivo: UploadFile, max_bytes: int) -> Callable[[], bytes]:
+    def ler() -> bytes:
+        arquivo.file.seek(0)
+        dados = arquivo.file.read(max_bytes + 1)
+        if len(dados) > max_bytes:
+            raise ImagemMuitoGrande(f"Arquivo excede o limite de {max_bytes / 1024 / 1024:g} MB")
+        return dados
+    return ler
+
+
+def _entradas_zip(arquivo: UploadFile, nome: str, max_bytes: int) -> List[Entrada]:
+    try:
+        pacote = zipfile.ZipFile(arquivo.file)
+    except zipfile.BadZipFile as e:
+        raise ImagemInvalida(f"ZIP inválido: {nome}") from e
+
+    entradas: List[Entrada] = []
+    for info in pacote.infolist():
+        caminho = PurePosixPath(info.filename)
+        if info.is_dir() or caminho.name.startswith(".") or "__MACOSX" in caminho.parts:
+            continue
+        entradas.append((info.filename, _leitor_membro(pacote, info, max_bytes)))
+    return entradas
+
+
+def _leitor_membro(pacote: zipfile.ZipFile, info: zipfile.ZipInfo, max_bytes: int) -> Callable[[], bytes]:
+    def ler() -> bytes:
+        # O tamanho declarado evita descompactar membros enormes (bombas ZIP)
+        if info.file_size > max_bytes:
+            raise ImagemMuitoGrande(f"Arquivo excede o limite de {max_bytes / 1024 / 1024:g} MB")
+        with pacote.open(info) as membro:
+            dados = membro.read(max_bytes + 1)
+        if len(dados) > max_bytes:
+            raise ImagemMuitoGrande(f"Arquivo excede o limite de {max_bytes / 1024 / 1024:g} MB")
+        return dados
+    return ler
+
+
+class _SaidaZip:
+    """Destino só de escrita do ZipFile; acumula os bytes até serem enviados."""
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+
+    def write(self, dados: bytes) -> int:
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self) -> None:
+        pass
+
+    def retirar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+class FluxoZip:
+    """
+    Monta um ZIP incrementalmente para ser enviado em streaming.
+
+    Cada `adicionar` devolve os bytes da nova entrada, prontos para enviar;
+    `finalizar` devolve o diretório central. Só a entrada atual fica em memória.
+    """
+
+    def __init__(self):
+        self._saida = _SaidaZip()
+        # Sem seek, o zipfile grava descritores de dados após cada entrada
+        self._zip = zipfile.ZipFile(self._saida, mode="w")
+        self._nomes: Set[str] = set()
+
+    def nome_unico(self, original: str, extensao: str) -> str:
+        """Nome da entrada de saída a partir do nome enviado, sem repetições."""
+        base = PurePosixPath(original).stem or "imagem"
+        nome = f"{base}{extensao}"
+        contador = 2
+        while nome in self._nomes:
+            nome = f"{base}_{contador}{extensao}"
+            contador += 1
+        self._nomes.add(nome)
+        return nome
+
+    def adicionar(self, nome: str, dados: bytes, comprimir: bool = False) -> bytes:
+        """Grava uma entrada (PNGs já são comprimidos e vão sem compressão)."""
+        compressao = zipfile.ZIP_DEFLATED if comprimir else zipfile.ZIP_STORED
+        self._zip.writestr(nome, dados, compress_type=compressao)
+        return self._saida.retirar()
+
+    def finalizar(self) -> bytes:
+        self._zip.close()
+        return self._saida.retirar()
+
+
+__all__ = ["Entrada", "eh_zip", "listar_entradas", "FluxoZip"]
@@ -0,0 +1,270 @@
+import logging
+import re
+import time
+import uuid
+from typing import Dict, Optional
+
+from starlette.routing import Match
+
+from app.infrastructure.logs import (
+    amostrar,
+    encerrar_requisicao,
+    iniciar_requisicao,
+    linhas_descartadas,
+    requisicao_atual,
+)
+from app.infrastructure.metricas import Contador, ExpositorPrometheus, FamiliaHistogramas
+
+
+logger = logging.getLogger(__name__)
+
+
+# Prefixo de todas as métricas expostas em /metrics
+PREFIXO = "bemasnap_"
+
+# Histogramas internos em milissegundos; o Prometheus espera segundos
+MS_PARA_S = 0.001
+
+# Rótulo das requisições que não correspondem a nenhuma rota
+ROTA_DESCONHECIDA = "desconhecida"
+
+# Sondas da plataforma e do Prometheus: sem linha de log por requisição
+ROTAS_SEM_LOG = {"/health/live", "/health/ready", "/metrics"}
+
+# Id enviado pelo cliente ou pelo proxy em X-Request-ID; outros valores são substituídos
+ID_REQUISICAO_VALIDO = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+def _rota(scope: Dict) -> str:
+    """
+    Caminho da rota (ex: "/jobs/{identificador}"), para manter poucas séries.
+
+    O roteador registra a rota no scope; requisições rejeitadas antes dele
+    (ex: 413 pelo Content-Length) são associadas comparando o caminho.
+    """
+    rota = scope.get("route")
+    if rota is None and "app" in scope:
+        for candidata in scope["app"].router.routes:
+            if candidata.matches(scope)[0] != Match.NONE:
+                rota = candidata
+                break
+    return getattr(rota, "path", ROTA_DESCONHECIDA)
+
+
+def _id_requisicao(scope: Dict) -> str:
+    """Reaproveita o X-Request-ID recebido (se válido) para correlacionar com o proxy; senão gera um."""
+    for nome, valor in scope["headers"]:
+        if nome == b"x-request-id":
+            valor = valor.decode("latin-1")
+            if ID_REQUISICAO_VALIDO.match(valor):
+                return valor
+            break
+    return uuid.uuid4().hex
+
+
+class MetricasHttp:
+    """Contadores e histogramas das requisições HTTP, por rota."""
+
+    def __init__(self):
+        self.requisicoes = Contador()
+        self.erros = Contador()
+        self.bytes_recebidos = Contador()
+        self.bytes_enviados = Contador()
+        # upload: do início da requisição ao último bloco do corpo; resposta: do
+        # envio dos cabeçalhos ao último bloco (no ZIP em streaming, inclui o processamento)
+        self.etapas_ms = FamiliaHistogramas([1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000])
+
+
+class MedidorHttp:
+    """
+    Middleware ASGI que alimenta `MetricasHttp` e escreve uma linha de log
+    JSON por requisição, sem ler nem copiar os corpos: só conta o tamanho dos
+    blocos recebidos e enviados.
+
+    A linha traz o id da requisição (também devolvido em `X-Request-ID`), rota,
+    status, bytes, a duração de cada etapa (upload, as do pipeline registradas
+    pelo serviço e envio da resposta) e as dimensões da imagem. Requisições
+    bem-sucedidas são amostradas (`LOG_AMOSTRAGEM`); erros 5xx e exceções,
+    sempre registrados. As sondas (`ROTAS_SEM_LOG`) só geram linha em exceções.
+    """
+
+    def __init__(self, app, metricas: MetricasHttp):
+        self.app = app
+        self.metricas = metricas
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metricas = self.metricas
+        inicio = time.perf_counter()
+        recebidos = 0
+        enviados = 0
+        status = 500
+        inicio_resposta: Optional[float] = None
+        identificador = _id_requisicao(scope)
+        token = iniciar_requisicao(identificador)
+        registro = requisicao_atual()
+
+        async def receber():
+            nonlocal recebidos
+            mensagem = await receive()
+            if mensagem["type"] == "http.request":
+                recebidos += len(mensagem.get("body", b""))
+                if recebidos and not mensagem.get("more_body", False):
+                    duracao_ms = (time.perf_counter() - inicio) * 1000.0
+                    metricas.etapas_ms.rotulado(etapa="upload", rota=_rota(scope)).observar(duracao_ms)
+                    registro.etapas_ms["upload"] = duracao_ms
+            return mensagem
+
+        async def enviar(mensagem):
+            nonlocal enviados, status, inicio_resposta
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                inicio_resposta = time.perf_counter()
+                cabecalhos = list(mensagem.get("headers", []))
+                cabecalhos.append((b"x-request-id", identificador.encode()))
+                mensagem = {**mensagem, "headers": cabecalhos}
+            elif mensagem["type"] == "http.response.body":
+                enviados += len(mensagem.get("body", b""))
+            await send(mensagem)
+            if (mensagem["type"] == "http.response.body" and not mensagem.get("more_body", False)
+                    and inicio_resposta is not None):
+                duracao_ms = (time.perf_counter() - inicio_resposta) * 1000.0
+                metricas.etapas_ms.rotulado(etapa="resposta", rota=_rota(scope)).observar(duracao_ms)
+                registro.etapas_ms["resposta"] = duracao_ms
+
+        excecao: Optional[Exception] = None
+        try:
+            await self.app(scope, receber, enviar)
+        except Exception as e:
+            excecao = e
+            raise
+        finally:
+            encerrar_requisicao(token)
+            rota = _rota(scope)
+            metricas.requisicoes.incrementar(rota=rota, metodo=scope["method"], status=str(status))
+            if excecao is not None:
+                metricas.erros.incrementar(rota=rota, tipo="excecao")
+            elif status >= 500:
+                metricas.erros.incrementar(rota=rota, tipo="servidor")
+            elif status >= 400:
+                metricas.erros.incrementar(rota=rota, tipo="cliente")
+            if recebidos:
+                metricas.bytes_recebidos.incrementar(recebidos, rota=rota)
+            if enviados:
+                metricas.bytes_enviados.incrementar(enviados, rota=rota)
+
+            # Nas sondas, 503 é só "aquecendo": apenas exceções geram linha
+            erro = excecao is not None or (status >= 500 and rota not in ROTAS_SEM_LOG)
+            nivel = logging.ERROR if erro else logging.INFO
+            if logger.isEnabledFor(nivel) and (erro or (rota not in ROTAS_SEM_LOG and amostrar())):
+                campos = {
+                    "metodo": scope["method"],
+                    "rota": rota,
+                    "status": status,
+                    "duracao_ms": round((time.perf_counter() - inicio) * 1000.0, 2),
+                    "bytes_recebidos": recebidos,
+                    "bytes_enviados": enviados,
+                    **registro.campos,
+                }
+                if registro.etapas_ms:
+                    campos["etapas_ms"] = {etapa: round(ms, 2) for etapa, ms in registro.etapas_ms.items()}
+                logger.log(
+                    nivel, "requisicao", exc_info=excecao, extra={"requisicao": identificador, "campos": campos})
+
+
+def exportar_metricas(
+    http: MetricasHttp,
+    inferencia: Dict,
+    cache: Dict,
+    tarefas: Dict[str, int],
+    segmentador: Optional[Dict]
+) -> str:
+    """
+    Texto de /metrics no formato do Prometheus.
+
+    Args:
+        http: Métricas do middleware
+        inferencia: Estado do executor ("pronto", "em_execucao", "na_fila", "capacidade")
+        cache: `CacheResultados.estatisticas()`
+        tarefas: Número de tarefas por status
+        segmentador: `RemocaoFundoService.estatisticas()` (por modelo), ou None
+            no modo "process" e antes da carga
+    """
+    expositor = ExpositorPrometheus(PREFIXO)
+
+    expositor.contador(
+        "http_requisicoes_total", "Requisições HTTP respondidas, por rota, método e status.",
+        http.requisicoes.amostras())
+    expositor.contador(
+        "http_erros_total", "Respostas 4xx (cliente), 5xx (servidor) e exceções não tratadas, por rota.",
+        http.erros.amostras())
+    expositor.contador(
+        "http_recebidos_bytes_total", "Bytes do corpo das requisições, por rota.",
+        http.bytes_recebidos.amostras())
+    expositor.contador(
+        "http_enviados_bytes_total", "Bytes do corpo das respostas, por rota.",
+        http.bytes_enviados.amostras())
+    expositor.contador(
+        "logs_descartados_total", "Linhas de log descartadas com a fila de escrita cheia.",
+        [({}, linhas_descartadas())])
+    expositor.histograma(
+        "http_etapa_duracao_segundos", "Leitura do upload e envio da resposta, por rota.",
+        http.etapas_ms.amostras(), escala=MS_PARA_S)
+
+    expositor.medidor(
+        "inferencia_pronta", "1 quando os modelos estão carregados e aquecidos.",
+        [({}, int(inferencia["pronto"]))])
+    expositor.medidor(
+        "inferencia_em_execucao", "Pipelines em execução no pool de inferência.",
+        [({}, inferencia["em_execucao"])])
+    expositor.medidor(
+        "inferencia_fila", "Requisições aguardando uma vaga no pool de inferência.",
+        [({}, inferencia["na_fila"])])
+    expositor.medidor(
+        "inferencia_capacidade", "Requisições aceitas antes de responder 503 (execução + fila).",
+        [({}, inferencia["capacidade"])])
+
+    expositor.medidor(
+        "tarefas", "Tarefas assíncronas por status.",
+        [({"status": status}, total) for status, total in tarefas.items()])
+
+    expositor.contador(
+        "cache_eventos_total", "Acertos, faltas e remoções do cache de resultados.",
+        [({"evento": evento}, cache[evento]) for evento in
+         ("acertos_memoria", "acertos_disco", "faltas", "remocoes_memoria", "remocoes_disco")])
+    expositor.medidor(
+        "cache_bytes", "Bytes ocupados por camada do cache de resultados.",
+        [({"camada": "memoria"}, cache["bytes_memoria"]), ({"camada": "disco"}, cache["bytes_disco"])])
+
+    modelos = (segmentador or {}).get("modelos", {}).items()
+    expositor.histograma(
+        "pipeline_duracao_segundos", "Duração do pipeline completo, por modelo.",
+        [({"modelo": modelo}, estatisticas["latencia_ms"]) for modelo, estatisticas in modelos],
+        escala=MS_PARA_S)
+    expositor.histograma(
+        "pipeline_etapa_duracao_segundos",
+        "Duração de cada etapa do pipeline (decodificação, pré-processamento, inferência, "
+        "refinamento, máscara, composição e codificação), por modelo.",
+        [({"modelo": modelo, "etapa": etapa}, resumo)
+         for modelo, estatisticas in modelos for etapa, resumo in estatisticas["etapas_ms"].items()],
+        escala=MS_PARA_S)
+    expositor.histograma(
+        "forward_duracao_segundos", "Duração de cada forward do modelo (um por lote), por modelo.",
+        [({"modelo": modelo}, estatisticas["inferencia_ms"]) for modelo, estatisticas in modelos],
+        escala=MS_PARA_S)
+
+    lotes = [(modelo, estatisticas["lote"]) for modelo, estatisticas in modelos if estatisticas["lote"]]
+    expositor.medidor(
+        "lote_fila", "Itens aguardando o próximo lote do agendador, por modelo.",
+        [({"modelo": modelo}, lote["fila"]) for modelo, lote in lotes])
+    expositor.histograma(
+        "lote_tamanho", "Imagens por forward do agendador de lotes, por modelo.",
+        [({"modelo": modelo}, lote["tamanho_lote"]) for modelo, lote in lotes])
+
+    return expositor.texto()
+
+
+__all__ = ["MetricasHttp", "MedidorHttp", "exportar_metricas"]
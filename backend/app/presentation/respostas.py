@@ -0,0 +1,122 @@
+import json
+import uuid
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+
+# Modos de resposta de /processar-imagem/
+FORMATO_JSON = "json"
+FORMATO_MULTIPART = "multipart"
+FORMATO_BINARIO = "binario"
+
+# Tipo de mídia do Accept -> modo de resposta (o primeiro que aparecer vence)
+TIPOS_ACEITOS = {
+    "multipart/mixed": FORMATO_MULTIPART,
+    "image/png": FORMATO_BINARIO,
+    "application/octet-stream": FORMATO_BINARIO,
+    "application/json": FORMATO_JSON,
+}
+
+# Tipo de mídia do Accept -> formato da imagem de saída de /remover-fundo/. O
+# RGBA bruto só sai com `formato=rgba`: muitos clientes enviam
+# `application/octet-stream` como padrão genérico e esperam uma imagem
+FORMATOS_IMAGEM_ACEITOS = {
+    "image/png": "png",
+    "image/webp": "webp",
+}
+
+# Parte de um multipart: cabeçalhos e corpo
+Parte = Tuple[Dict[str, str], bytes]
+
+
+def negociar_formato(accept: Optional[str], explicito: Optional[str] = None) -> str:
+    """
+    Escolhe o modo de resposta: o parâmetro explícito tem precedência sobre o `Accept`.
+
+    Sem nenhum dos dois (ou com `*/*`), mantém o JSON com base64.
+    """
+    if explicito:
+        return explicito
+    for item in (accept or "").split(","):
+        tipo = item.split(";")[0].strip().lower()
+        if tipo in TIPOS_ACEITOS:
+            return TIPOS_ACEITOS[tipo]
+    return FORMATO_JSON
+
+
+def formato_por_accept(accept: Optional[str]) -> Optional[str]:
+    """
+    Formato da imagem pedido no `Accept`, ou None para usar o padrão.
+
+    Só o primeiro tipo listado conta: navegadores anunciam `image/webp` em
+    toda navegação, depois de `text/html`, e continuam recebendo PNG.
+    """
+    primeiro = (accept or "").split(",")[0].split(";")[0].strip().lower()
+    return FORMATOS_IMAGEM_ACEITOS.get(primeiro)
+
+
+def parte_json(conteudo: Dict) -> Parte:
+    """Parte com metadados em JSON."""
+    return (
+        {"Content-Type": "application/json; charset=utf-8"},
+        json.dumps(conteudo, ensure_ascii=False).encode(),
+    )
+
+
+def _disposicao_anexo(nome: str) -> str:
+    """
+    `Content-Disposition` de um anexo cujo nome pode vir do cliente.
+
+    Aspas, barras invertidas e caracteres de controle (CR/LF inclusive) são
+    descartados; `filename` leva só ASCII e, se o nome tiver outros
+    caracteres, o nome completo segue em `filename*` (RFC 6266).
+    """
+    nome = "".join(c for c in nome if c.isprintable() and c not in '"\\') or "arquivo"
+    nome_ascii = "".join(c if c.isascii() else "_" for c in nome)
+    disposicao = f'attachment; filename="{nome_ascii}"'
+    if nome_ascii != nome:
+        disposicao += f"; filename*=UTF-8''{quote(nome, safe='')}"
+    return disposicao
+
+
+def parte_arquivo(dados: bytes, tipo: str, nome: str) -> Parte:
+    """Parte com um arquivo binário (sem base64)."""
+    return (
+        {"Content-Type": tipo, "Content-Disposition": _disposicao_anexo(nome)},
+        dados,
+    )
+
+
+def montar_multipart(partes: List[Parte]) -> Tuple[bytes, str]:
+    """
+    Monta um corpo `multipart/mixed` (RFC 2046).
+
+    Returns:
+        (corpo, valor do cabeçalho Content-Type com o boundary)
+    """
+    boundary = uuid.uuid4().hex
+    delimitador = f"--{boundary}\r\n".encode()
+
+    blocos: List[bytes] = []
+    for cabecalhos, corpo in partes:
+        blocos.append(delimitador)
+        for nome, valor in cabecalhos.items():
+            blocos.append(f"{nome}: {valor}\r\n".encode())
+        blocos.append(f"Content-Length: {len(corpo)}\r\n\r\n".encode())
+        blocos.append(corpo)
+        blocos.append(b"\r\n")
+    blocos.append(f"--{boundary}--\r\n".encode())
+
+    return b"".join(blocos), f"multipart/mixed; boundary={boundary}"
+
+
+__all__ = [
+    "FORMATO_JSON",
+    "FORMATO_MULTIPART",
+    "FORMATO_BINARIO",
+    "negociar_formato",
+    "formato_por_accept",
+    "parte_json",
+    "parte_arquivo",
+    "montar_multipart",
+]
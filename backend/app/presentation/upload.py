@@ -0,0 +1,153 @@
+from io import BytesIO
+from typing import Dict, Tuple
+
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+from PIL import Image, UnidentifiedImageError
+
+from app.domain.excecoes import ImagemInvalida, ImagemMuitoGrande
+
+
+# Tamanho de cada leitura do arquivo enviado
+TAMANHO_BLOCO = 1024 * 1024
+
+# Folga para os cabeçalhos e delimitadores do multipart no limite da requisição
+FOLGA_MULTIPART = 64 * 1024
+
+
+class LimitadorCorpo:
+    """
+    Middleware ASGI que recusa com 413 requisições POST cujo corpo passa do limite.
+
+    Com Content-Length acima do limite, a recusa acontece antes de ler o
+    corpo. Sem ele (transferência chunked), os bytes são contados à medida que
+    chegam e a leitura é interrompida ao passar do limite: o Starlette grava
+    o multipart inteiro antes de chamar o endpoint, então a leitura em blocos
+    de `ler_upload` não bastaria.
+    """
+
+    def __init__(self, app, limite_mb: float, limites_mb_por_rota: Dict[str, float]):
+        self.app = app
+        self.limite_mb = limite_mb
+        self.limites_mb_por_rota = limites_mb_por_rota
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        limite_mb = self.limites_mb_por_rota.get(scope["path"], self.limite_mb)
+        limite = int(limite_mb * 1024 * 1024) + FOLGA_MULTIPART
+        erro = f"Requisição excede o limite de {limite_mb:g} MB"
+        recusa = JSONResponse(status_code=413, content={"erro": erro})
+
+        tamanho = dict(scope["headers"]).get(b"content-length", b"")
+        if tamanho.isdigit() and int(tamanho) > limite:
+            await recusa(scope, receive, send)
+            return
+
+        recebidos = 0
+        excedeu = False
+        respondida = False
+
+        async def receber():
+            nonlocal recebidos, excedeu
+            mensagem = await receive()
+            if mensagem["type"] == "http.request":
+                recebidos += len(mensagem.get("body", b""))
+                if recebidos > limite:
+                    excedeu = True
+                    raise ImagemMuitoGrande(erro)
+            return mensagem
+
+        async def enviar(mensagem):
+            nonlocal respondida
+            if excedeu:
+                # A resposta de erro do parser do multipart dá lugar ao 413
+                if not respondida:
+                    respondida = True
+                    await recusa(scope, receive, send)
+                return
+            respondida = True
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receber, enviar)
+        except ImagemMuitoGrande:
+            if not excedeu or respondida:
+                raise
+            await recusa(scope, receive, send)
+
+
+async def ler_upload(file: UploadFile, max_bytes: int) -> bytes:
+    """
+    Lê o arquivo enviado em blocos, abortando assim que passar do limite.
+
+    Args:
+        file: Arquivo recebido pelo FastAPI
+        max_bytes: Tamanho máximo aceito
+
+    Raises:
+        ImagemMuitoGrande: se o arquivo tiver mais de `max_bytes`
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise ImagemMuitoGrande(_mensagem_bytes(file.size, max_bytes))
+
+    blocos = []
+    total = 0
+    while True:
+        bloco = await file.read(TAMANHO_BLOCO)
+        if not bloco:
+            break
+        total += len(bloco)
+        if total > max_bytes:
+            raise ImagemMuitoGrande(_mensagem_bytes(total, max_bytes))
+        blocos.append(bloco)
+
+    return b"".join(blocos)
+
+
+def verificar_dimensoes(imagem_bytes: bytes, max_megapixels: float) -> Tuple[int, int]:
+    """
+    Lê apenas o cabeçalho da imagem e rejeita resoluções acima do limite.
+
+    `Image.open` é preguiçoso: identifica o formato e as dimensões sem
+    decodificar os pixels, então o custo não depende da resolução.
+
+    Returns:
+        (largura, altura) da imagem
+
+    Raises:
+        ImagemInvalida: se o conteúdo não for uma imagem reconhecida ou o cabeçalho estiver truncado
+        ImagemMuitoGrande: se a imagem tiver mais de `max_megapixels`
+    """
+    try:
+        with Image.open(BytesIO(imagem_bytes)) as imagem:
+            largura, altura = imagem.size
+    except Image.DecompressionBombError as e:
+        raise ImagemMuitoGrande(str(e)) from e
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        # Cabeçalho truncado ou corrompido: o PIL levanta OSError ("Truncated
+        # File Read") ou SyntaxError, conforme o formato
+        raise ImagemInvalida("Arquivo enviado não é uma imagem válida") from e
+
+    megapixels = largura * altura / 1_000_000
+    if megapixels > max_megapixels:
+        raise ImagemMuitoGrande(
+            f"Imagem de {largura}x{altura} ({megapixels:.1f} MP) excede o limite de {max_megapixels:g} MP")
+
+    return largura, altura
+
+
+async def receber_imagem(file: UploadFile, max_bytes: int, max_megapixels: float) -> bytes:
+    """Lê o upload com limite de bytes e valida as dimensões antes de qualquer decodificação."""
+    imagem_bytes = await ler_upload(file, max_bytes)
+    verificar_dimensoes(imagem_bytes, max_megapixels)
+    return imagem_bytes
+
+
+def _mensagem_bytes(tamanho: int, max_bytes: int) -> str:
+    return f"Arquivo de {tamanho / 1024 / 1024:.1f} MB excede o limite de {max_bytes / 1024 / 1024:g} MB"
+
+
+__all__ = ["LimitadorCorpo", "ler_upload", "verificar_dimensoes", "receber_imagem"]
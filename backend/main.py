@@ -1,16 +1,72 @@
 import os
-from app.presentation.api import app
+
+from app import config
+from app.infrastructure.cpu import (
+    configurar_threads,
+    fixar_afinidade,
+    forwards_simultaneos,
+    plano_afinidade,
+    threads_intra_op,
+)
+from app.infrastructure.logs import configurar_logs
+from app.infrastructure.servidor import executar_prefork, preparar_processo_pai
+
+# Antes de tudo, para que os avisos do ajuste de threads já saiam em JSON
+configurar_logs(config.LOG_NIVEL, config.LOG_AMOSTRAGEM)
+
+# Núcleos e threads do PyTorch de cada worker; com afinidade, os núcleos do
+# worker são exclusivos dele e as threads se dividem só entre os seus forwards
+afinidade = plano_afinidade(config.CPU_AFINIDADE, config.SERVIDOR_WORKERS)
+forwards = forwards_simultaneos(
+    config.INFERENCIA_MAX_CONCORRENCIA, config.LOTE_AGENDADOR, len(config.MODELOS_HABILITADOS))
+threads = [
+    threads_intra_op(1 if nucleos else config.SERVIDOR_WORKERS, forwards, config.TORCH_NUM_THREADS, nucleos)
+    for nucleos in afinidade
+]
+
+if config.SERVIDOR_WORKERS > 1:
+    if config.INFERENCIA_EXECUTOR != "thread" or config.U2NET_BACKEND == "onnx":
+        raise ValueError(
+            "SERVIDOR_WORKERS > 1 exige INFERENCIA_EXECUTOR=thread e um backend PyTorch "
+            "(a sessão do ONNX Runtime cria threads que não sobrevivem ao fork)")
+    if config.TAREFAS_FILA != "sqlite":
+        raise ValueError(
+            "SERVIDOR_WORKERS > 1 exige TAREFAS_FILA=sqlite "
+            "(a fila em memória de /jobs não é compartilhada entre os workers)")
+    preparar_processo_pai()
+else:
+    fixar_afinidade(afinidade[0])
+    configurar_threads(threads[0], config.TORCH_INTEROP_THREADS)
+
+from app.presentation.api import app, executor_inferencia  # noqa: E402
+
+# Com vários workers, o modelo é carregado aqui, antes do fork, e compartilhado;
+# cada worker aquece as próprias threads ao iniciar. Com um só, a carga
+# acontece em segundo plano depois que a porta abre
+if config.SERVIDOR_WORKERS > 1:
+    executor_inferencia.carregar(aquecer=False)
 
 if __name__ == "__main__":
     import uvicorn
-    
+
     # Pega a porta do ambiente (Render usa PORT)
     port = int(os.environ.get("PORT", 8000))
-    
-    uvicorn.run(
-        "app.presentation.api:app",
-        host="0.0.0.0",  # ← CRUCIAL PARA O RENDER
-        port=port,
-        reload=False,    # ← Desabilita reload em produção
-        workers=1
-    )
\ No newline at end of file
+
+    if config.SERVIDOR_WORKERS > 1:
+        executar_prefork(
+            "app.presentation.api:app",
+            host="0.0.0.0",
+            porta=port,
+            threads_intra_op=threads,
+            threads_inter_op=config.TORCH_INTEROP_THREADS,
+            afinidade=afinidade,
+        )
+    else:
+        uvicorn.run(
+            "app.presentation.api:app",
+            host="0.0.0.0",  # ← CRUCIAL PARA O RENDER
+            port=port,
+            reload=False,    # ← Desabilita reload em produção
+            workers=1,
+            access_log=False  # a linha JSON por requisição substitui o log de acesso
+        )
@@ -4,10 +4,26 @@ Testa os endpoints sem salvar arquivos localmente
 """
 import requests
 import base64
+import json
+import os
+import time
+import zipfile
+from io import BytesIO
 from pathlib import Path
 
 API_URL = "http://127.0.0.1:8000"
 
+def test_health():
+    """Testa as verificações de saúde (liveness e readiness)"""
+    print("🧪 Testando /health/live e /health/ready...")
+    
+    vivo = requests.get(f"{API_URL}/health/live")
+    pronto = requests.get(f"{API_URL}/health/ready")
+    print(f"Live: {vivo.status_code} {vivo.json()}")
+    print(f"Ready: {pronto.status_code} {pronto.json()}\n")
+    
+    return vivo.status_code == 200 and pronto.status_code == 200 and pronto.json()["status"] == "pronto"
+
 def test_root():
     """Testa o endpoint raiz"""
     print("🧪 Testando endpoint raiz...")
@@ -92,6 +108,285 @@ def test_processar_imagem_json(image_path: str):
         print(f"❌ Erro: {response.text}\n")
         return False
 
+def test_processar_imagem_binario(image_path: str):
+    """Testa os modos multipart e binário de /processar-imagem/ (sem base64)"""
+    print("🧪 Testando /processar-imagem/ (multipart e binário)...")
+    
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    
+    files = {"file": ("test.jpg", image_bytes)}
+    multipart = requests.post(
+        f"{API_URL}/processar-imagem/", files=files, headers={"Accept": "multipart/mixed"})
+    binario = requests.post(
+        f"{API_URL}/processar-imagem/", files=files, params={"formato_resposta": "binario"})
+    
+    print(f"Multipart: {multipart.status_code} ({len(multipart.content)} bytes)")
+    print(f"Binário: {binario.status_code} ({len(binario.content)} bytes) - Modelo: {binario.headers.get('X-Modelo')}\n")
+    
+    return (
+        multipart.status_code == 200
+        and multipart.headers.get("content-type", "").startswith("multipart/mixed")
+        and binario.status_code == 200
+        and binario.headers.get("content-type") == "image/png"
+    )
+
+def test_formatos_saida(image_path: str):
+    """Testa a escolha do formato de saída por parâmetro e pelo Accept"""
+    print("🧪 Testando formatos de saída (PNG, WebP e RGBA)...")
+    
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    
+    files = {"file": ("test.jpg", image_bytes)}
+    webp = requests.post(f"{API_URL}/remover-fundo/", files=files, headers={"Accept": "image/webp"})
+    rgba = requests.post(f"{API_URL}/remover-fundo/", files=files, params={"formato": "rgba"})
+    png = requests.post(f"{API_URL}/remover-fundo/", files=files, params={"formato": "png", "nivel": 9})
+    
+    largura = int(rgba.headers.get("X-Imagem-Largura", 0))
+    altura = int(rgba.headers.get("X-Imagem-Altura", 0))
+    print(f"WebP: {webp.status_code} ({len(webp.content)} bytes)")
+    print(f"RGBA: {rgba.status_code} ({largura}x{altura}, {len(rgba.content)} bytes)")
+    print(f"PNG nível 9: {png.status_code} ({len(png.content)} bytes)\n")
+    
+    return (
+        webp.headers.get("content-type") == "image/webp"
+        and len(rgba.content) == largura * altura * 4
+        and png.headers.get("content-type") == "image/png"
+    )
+
+def test_alta_resolucao(image_path: str):
+    """Testa o modo de alta resolução (refinamento das bordas por blocos)"""
+    print("🧪 Testando /remover-fundo/ (alta resolução)...")
+    
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    
+    files = {"file": ("test.jpg", image_bytes)}
+    normal = requests.post(f"{API_URL}/remover-fundo/", files=files)
+    alta = requests.post(f"{API_URL}/remover-fundo/", files=files, params={"alta_resolucao": "true"})
+    print(f"Status: {alta.status_code} ({len(alta.content)} bytes)")
+    print(f"ETag distinto do modo normal: {alta.headers.get('ETag') != normal.headers.get('ETag')}\n")
+    
+    return (
+        alta.status_code == 200
+        and alta.headers.get("content-type") == "image/png"
+        and alta.headers.get("ETag") != normal.headers.get("ETag")
+    )
+
+def test_tamanho_entrada(image_path: str):
+    """Testa a entrada reduzida do modelo (prévia rápida)"""
+    print("🧪 Testando /mascara/ (tamanho_entrada=192)...")
+    
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    
+    files = {"file": ("test.jpg", image_bytes)}
+    previa = requests.post(f"{API_URL}/mascara/", files=files, params={"tamanho_entrada": 192, "formato": "bruto"})
+    invalido = requests.post(f"{API_URL}/mascara/", files=files, params={"tamanho_entrada": 200})
+    largura = int(previa.headers.get("X-Mascara-Largura", 0))
+    altura = int(previa.headers.get("X-Mascara-Altura", 0))
+    print(f"Prévia: {previa.status_code} {largura}x{altura} ({len(previa.content)} bytes)")
+    print(f"Tamanho fora do múltiplo de 32: {invalido.status_code}\n")
+    
+    return (
+        previa.status_code == 200
+        and max(largura, altura) == 192
+        and len(previa.content) == largura * altura
+        and invalido.status_code == 422
+    )
+
+def test_mascara(image_path: str):
+    """Testa a saída apenas com a máscara (PNG e bytes brutos)"""
+    print("🧪 Testando /mascara/...")
+    
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    
+    files = {"file": ("test.jpg", image_bytes)}
+    png = requests.post(f"{API_URL}/mascara/", files=files)
+    bruto = requests.post(f"{API_URL}/mascara/", files=files, params={"formato": "bruto", "largura": 160})
+    
+    print(f"PNG: {png.status_code} {len(png.content)} bytes")
+    largura = int(bruto.headers.get("X-Mascara-Largura", 0))
+    altura = int(bruto.headers.get("X-Mascara-Altura", 0))
+    print(f"Bruto: {bruto.status_code} {largura}x{altura} ({len(bruto.content)} bytes)\n")
+    
+    return (
+        png.status_code == 200
+        and png.headers.get("content-type") == "image/png"
+        and bruto.status_code == 200
+        and largura == 160
+        and len(bruto.content) == largura * altura
+    )
+
+def test_cache_etag(image_path: str):
+    """Testa o cache de resultados e a revalidação com ETag / If-None-Match"""
+    print("🧪 Testando cache de resultados (ETag)...")
+    
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    
+    files = {"file": ("test.jpg", image_bytes)}
+    primeira = requests.post(f"{API_URL}/remover-fundo/", files=files)
+    segunda = requests.post(f"{API_URL}/remover-fundo/", files=files)
+    
+    etag = primeira.headers.get("ETag")
+    print(f"ETag: {etag}")
+    print(f"X-Cache: {primeira.headers.get('X-Cache')} -> {segunda.headers.get('X-Cache')}")
+    
+    revalidacao = requests.post(
+        f"{API_URL}/remover-fundo/", files=files, headers={"If-None-Match": etag})
+    print(f"Status com If-None-Match: {revalidacao.status_code}\n")
+    
+    return (
+        primeira.status_code == 200
+        and segunda.content == primeira.content
+        and segunda.headers.get("ETag") == etag
+        and revalidacao.status_code == 304
+    )
+
+def test_remover_fundo_lote(image_path: str, quantidade: int = 3):
+    """Testa remoção de fundo em lote com resposta ZIP"""
+    print("🧪 Testando /remover-fundo/lote/...")
+    
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    
+    files = [("arquivos", (f"foto_{i}.jpg", image_bytes)) for i in range(quantidade)]
+    response = requests.post(f"{API_URL}/remover-fundo/lote/", files=files)
+    print(f"Status: {response.status_code}")
+    
+    if response.status_code != 200:
+        print(f"Erro: {response.text}\n")
+        return False
+    
+    pacote = zipfile.ZipFile(BytesIO(response.content))
+    manifesto = json.loads(pacote.read("manifesto.json"))
+    print(f"Arquivos no ZIP: {pacote.namelist()}\n")
+    
+    return len(manifesto) == quantidade and all(item["status"] == "sucesso" for item in manifesto)
+
+def test_jobs(image_path: str, tempo_limite: float = 60.0):
+    """Testa o fluxo assíncrono: submissão, consulta de status e download do resultado"""
+    print("🧪 Testando /jobs...")
+    
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    
+    files = {"file": ("test.jpg", image_bytes)}
+    response = requests.post(f"{API_URL}/jobs", files=files, params={"prioridade": "alta"})
+    print(f"Status: {response.status_code} - Location: {response.headers.get('Location')}")
+    
+    if response.status_code != 202:
+        print(f"Erro: {response.text}\n")
+        return False
+    
+    identificador = response.json()["id"]
+    inicio = time.time()
+    while time.time() - inicio < tempo_limite:
+        tarefa = requests.get(f"{API_URL}/jobs/{identificador}").json()
+        if tarefa["status"] in ("concluida", "erro"):
+            break
+        time.sleep(0.5)
+    
+    resultado = requests.get(f"{API_URL}/jobs/{identificador}/resultado")
+    print(f"Tarefa: {tarefa['status']} - Resultado: {resultado.status_code} ({len(resultado.content)} bytes)\n")
+    
+    return (
+        tarefa["status"] == "concluida"
+        and resultado.status_code == 200
+        and resultado.headers.get("content-type") == "image/png"
+    )
+
+def test_limite_upload():
+    """Testa a rejeição de imagens acima do limite de megapixels (413) e de arquivos inválidos ou truncados (400)"""
+    print("🧪 Testando limites de upload...")
+    
+    # 100 MP em PNG de 1 bit: poucos KB no upload, rejeitado pelo cabeçalho
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new("1", (10000, 10000)).save(buffer, "PNG")
+    
+    grande = requests.post(
+        f"{API_URL}/remover-fundo/", files={"file": ("grande.png", buffer.getvalue())})
+    invalido = requests.post(
+        f"{API_URL}/remover-fundo/", files={"file": ("texto.txt", b"nao e uma imagem")})
+    
+    # JPEG com o cabeçalho cortado e JPEG com o cabeçalho íntegro e metade dos pixels
+    jpeg = BytesIO()
+    Image.effect_noise((400, 300), 64).convert("RGB").save(jpeg, "JPEG")
+    truncado = requests.post(
+        f"{API_URL}/remover-fundo/", files={"file": ("truncado.jpg", jpeg.getvalue()[:200])})
+    corpo_truncado = requests.post(
+        f"{API_URL}/remover-fundo/", files={"file": ("metade.jpg", jpeg.getvalue()[:len(jpeg.getvalue()) // 2])})
+    
+    print(f"Status 100 MP: {grande.status_code} - {grande.json()}")
+    print(f"Status inválido: {invalido.status_code}")
+    print(f"Status truncado: {truncado.status_code}")
+    print(f"Status corpo truncado: {corpo_truncado.status_code}\n")
+    
+    return (
+        grande.status_code == 413
+        and invalido.status_code == 400
+        and truncado.status_code == 400
+        and corpo_truncado.status_code == 400
+    )
+
+def test_metrics():
+    """Testa /metrics no formato do Prometheus"""
+    print("🧪 Testando /metrics...")
+    
+    response = requests.get(f"{API_URL}/metrics")
+    linhas = response.text.splitlines()
+    etapas = [l for l in linhas if l.startswith("bemasnap_pipeline_etapa_duracao_segundos_count")]
+    
+    print(f"Status: {response.status_code} - {response.headers.get('content-type')}")
+    print(f"Séries: {sum(1 for l in linhas if not l.startswith('#'))}")
+    for linha in etapas:
+        print(f"  {linha}")
+    print()
+    
+    return (
+        response.status_code == 200
+        and response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        and any(l.startswith("bemasnap_http_requisicoes_total{") for l in linhas)
+        and bool(etapas)
+    )
+
+def test_request_id():
+    """Testa a devolução do X-Request-ID enviado e a geração de um novo"""
+    print("🧪 Testando X-Request-ID...")
+    
+    enviado = requests.get(f"{API_URL}/", headers={"X-Request-ID": "teste-123"})
+    gerado = requests.get(f"{API_URL}/")
+    
+    print(f"Enviado: {enviado.headers.get('X-Request-ID')}")
+    print(f"Gerado: {gerado.headers.get('X-Request-ID')}\n")
+    
+    return enviado.headers.get("X-Request-ID") == "teste-123" and bool(gerado.headers.get("X-Request-ID"))
+
+def test_perfil(image_path: str):
+    """Testa o perfil por requisição (X-Perfil); sem PERFIL_TOKEN, só confere que o cabeçalho é ignorado"""
+    print("🧪 Testando perfil por requisição (X-Perfil)...")
+    
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    
+    token = os.environ.get("PERFIL_TOKEN", "")
+    files = {"file": ("test.jpg", image_bytes)}
+    invalido = requests.post(f"{API_URL}/mascara/", files=files, headers={"X-Perfil": token + "-invalido"})
+    print(f"Token inválido: {invalido.status_code} X-Perfil={invalido.headers.get('X-Perfil')}")
+    ok = invalido.status_code == 200 and "X-Perfil" not in invalido.headers
+    
+    if token:
+        perfilada = requests.post(f"{API_URL}/mascara/", files=files, headers={"X-Perfil": token})
+        print(f"Token válido: {perfilada.status_code} X-Perfil={perfilada.headers.get('X-Perfil')}")
+        ok = ok and perfilada.status_code == 200 and bool(perfilada.headers.get("X-Perfil"))
+    print()
+    
+    return ok
+
 def test_performance(image_path: str, num_requests: int = 5):
     """Testa performance com múltiplas requisições"""
     print(f"🧪 Testando performance ({num_requests} requisições)...")
@@ -119,7 +414,7 @@ def test_performance(image_path: str, num_requests: int = 5):
     
     avg_time = sum(times) / len(times)
     print(f"\n📊 Tempo médio: {avg_time:.2f}s")
-    print(f"📊 Primeira requisição: {times[0]:.2f}s (com carregamento do modelo)")
+    print(f"📊 Primeira requisição: {times[0]:.2f}s (modelo já aquecido antes de /health/ready)")
     if len(times) > 1:
         avg_subsequent = sum(times[1:]) / len(times[1:])
         print(f"📊 Requisições subsequentes: {avg_subsequent:.2f}s (apenas inferência)\n")
@@ -142,10 +437,23 @@ def main():
     print()
     
     tests = [
+        ("Health", lambda: test_health()),
         ("Root Endpoint", lambda: test_root()),
         ("Download", lambda: test_remover_fundo_download(image_path)),
         ("Visualização Inline", lambda: test_remover_fundo_visualizar(image_path)),
         ("JSON com Base64", lambda: test_processar_imagem_json(image_path)),
+        ("Multipart e Binário", lambda: test_processar_imagem_binario(image_path)),
+        ("Formatos de Saída", lambda: test_formatos_saida(image_path)),
+        ("Alta Resolução", lambda: test_alta_resolucao(image_path)),
+        ("Máscara", lambda: test_mascara(image_path)),
+        ("Tamanho de entrada", lambda: test_tamanho_entrada(image_path)),
+        ("Cache e ETag", lambda: test_cache_etag(image_path)),
+        ("Lote (ZIP)", lambda: test_remover_fundo_lote(image_path)),
+        ("Tarefas Assíncronas", lambda: test_jobs(image_path)),
+        ("Limites de Upload", lambda: test_limite_upload()),
+        ("Métricas (Prometheus)", lambda: test_metrics()),
+        ("Request ID", lambda: test_request_id()),
+        ("Perfil por Requisição", lambda: test_perfil(image_path)),
         ("Performance", lambda: test_performance(image_path, 3))
     ]
     